@@ -1,4 +1,9 @@
 import abc
+import logging
+
+from decision_log import DecisionLog
+
+logger = logging.getLogger(__name__)
 
 
 class BaseAlgorithm:
@@ -6,18 +11,28 @@ class BaseAlgorithm:
     实验算法基类
     所有实验算法都需要继承自该类
     所有实验算法都需要实现process方法
+    如需一次性计算整个回合的结果（例如先计算军团级别的统计数据，再分发给每个人），可以重写process_round方法
     experiment_devices和sub_rounds在实验过程中会进行更新，需要在process方法中使用
 
+    decision_log是与submit_logs同步维护的列式决策日志，适合做按组别/角色/决策的向量化统计
+
     Attributes:
         experiment_devices (dict[str, str]): 实验设备信息
         sub_rounds (list[dict[str, str]]): 实验回合信息
+        decision_log (DecisionLog): 列式决策日志，未由实验管理器注入时为None
+        string_table (tuple[str, ...]): 返回结果中反复出现的信息标签和取值，
+            加入压缩传输编码（deflate / msgpack）的字符串表，见 transport 模块
     """
 
+    string_table: tuple[str, ...] = ()
+
     def __init__(self):
         # 实验设备信息
         self.experiment_devices = {}
         # 实验回合信息
         self.sub_rounds = []
+        # 列式决策日志
+        self.decision_log: DecisionLog = None
 
     @abc.abstractmethod
     def process(
@@ -34,4 +49,31 @@ class BaseAlgorithm:
             }
         """
 
-        print("===================开始进行当前实验回合数据处理====================")
+        logger.debug("开始进行当前实验回合数据处理")
+
+    def process_round(
+        self, uuids, submit_logs, cur_main_round, cur_sub_round
+    ) -> dict[str, dict[str, str]]:
+        """
+        批量处理实验数据，一次计算当前回合所有参与者的结果
+        默认逐个调用process方法
+
+        Args:
+            uuids (Iterable[str]): 当前回合参与者的uuid
+            submit_logs (list[dict]): 全部提交日志
+            cur_main_round (int): 当前大回合
+            cur_sub_round (int): 当前小回合
+
+        Returns:
+            dict[str, dict[str, str]]: 每个参与者的处理结果 {uuid: process结果}
+        """
+
+        return {
+            uuid: self.process(
+                uuid=uuid,
+                submit_logs=submit_logs,
+                cur_main_round=cur_main_round,
+                cur_sub_round=cur_sub_round,
+            )
+            for uuid in uuids
+        }
@@ -1,8 +1,281 @@
+import logging
+
+from decision_log import DecisionLog
+
 from .base_algo import BaseAlgorithm
 
+logger = logging.getLogger(__name__)
+
+TEAMS = ("A", "B")
+BATTLEFIELDS = ("战场1", "战场2")
+
+
+class CorpsFightState:
+    """
+    军团对战算法的增量计分状态
+
+    每条提交日志只会被处理一次：小回合结束时统计战场人数，
+    大回合的最后一个小回合结束时更新连胜数、军团得分、统帅得分和参谋得分。
+    process 方法只读取该状态，回合推进的开销与已进行的回合数无关。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        清空计分状态
+        """
+
+        self.consumed = 0
+        """已处理的提交日志条数"""
+
+        self.battle_counts = []
+        """每个小回合(展平后)各军团各战场人数 [{team: {battle: num}}]"""
+
+        self.streak_counts = {team: {b: 0 for b in BATTLEFIELDS} for team in TEAMS}
+        """当前各军团各战场连胜数"""
+
+        self.army_scores = {team: 0 for team in TEAMS}
+        """各军团累计得分"""
+
+        self.round_base_scores = []
+        """每个大回合各军团各战场的基础得分（不含连胜加成） [{team: {battle: score}}]"""
+
+        self.round_army_scores = []
+        """每个大回合的军团得分（含连胜加成） [{team: score}]"""
+
+        self.tongshuai_per_round = {}
+        """每个大回合每个统帅的得分 {round: {user_id: score}}"""
+
+        self.tongshuai_cumulative = {}
+        """每个统帅的累计得分 {user_id: total_score}"""
+
+        self.canmou_per_round = {}
+        """每个大回合每个参谋的得分 {round: {user_id: score}}"""
+
+        self.canmou_cumulative = {}
+        """每个参谋的累计得分 {user_id: total_score}"""
+
+        self.purchase_records = {}
+        """购买记录 {round: {team: "购买" or "不购买"}}"""
+
+        self._canmou_members = {}
+        """尚未结算大回合的参谋 {round: [(user_id, team)]}"""
+
+    def sync(self, submit_logs, num_sub_rounds, decision_log: DecisionLog = None):
+        """
+        处理新增的提交日志
+
+        Args:
+            submit_logs (list[dict]): 全部提交日志
+            num_sub_rounds (int): 每个大回合的小回合数
+            decision_log (DecisionLog, optional): 与submit_logs同步的列式决策日志，
+                提供时战场人数由其向量化统计. Defaults to None.
+        """
+
+        if len(submit_logs) < self.consumed:
+            # 提交日志被重置（新的一次实验），重新计算
+            self.reset()
+        for idx in range(self.consumed, len(submit_logs)):
+            if decision_log is not None and idx < decision_log.num_rounds:
+                counts = self._count_from_decision_log(decision_log, idx)
+            else:
+                counts = self._count_from_round_log(submit_logs[idx])
+            self._consume(idx, submit_logs[idx], counts, num_sub_rounds)
+        self.consumed = len(submit_logs)
+
+    def count_battle(self, idx, team, battle_name) -> int:
+        """
+        获取指定小回合(展平后)某军团某战场人数
+
+        Args:
+            idx (int): 展平后的小回合下标
+            team (str): 军团
+            battle_name (str): 战场
+
+        Returns:
+            int: 人数，小回合尚未结束时为 0
+        """
+
+        if idx < 0 or idx >= len(self.battle_counts):
+            return 0
+        return self.battle_counts[idx].get(team, {}).get(battle_name, 0)
+
+    def round_score(self, main_round, streak_counts) -> dict[str, int]:
+        """
+        计算军团单个大回合得分（含连胜加成）
+
+        Args:
+            main_round (int): 大回合
+            streak_counts (dict): 计算所使用的连胜数
+
+        Returns:
+            dict[str, int]: 各军团得分，大回合尚未结束时为 0
+        """
+
+        if main_round < 0 or main_round >= len(self.round_base_scores):
+            return {team: 0 for team in TEAMS}
+        base_scores = self.round_base_scores[main_round]
+        return {
+            team: sum(
+                base_scores[team][b] * streak_counts[team][b] for b in BATTLEFIELDS
+            )
+            for team in TEAMS
+        }
+
+    def _count_from_round_log(self, round_log) -> dict[str, dict[str, int]]:
+        counts = {team: {b: 0 for b in BATTLEFIELDS} for team in TEAMS}
+        for info in round_log.values():
+            team_counts = counts.get(info["role"][0])
+            if team_counts is not None and info["decision"] in team_counts:
+                team_counts[info["decision"]] += 1
+        return counts
+
+    def _count_from_decision_log(
+        self, decision_log: DecisionLog, idx
+    ) -> dict[str, dict[str, int]]:
+        table = decision_log.group_decision_counts(idx)
+        counts = {team: {b: 0 for b in BATTLEFIELDS} for team in TEAMS}
+        for team in TEAMS:
+            group_code = decision_log.groups.code(team)
+            if group_code < 0:
+                continue
+            for b in BATTLEFIELDS:
+                decision_code = decision_log.decisions.code(b)
+                if decision_code >= 0:
+                    counts[team][b] = int(table[group_code, decision_code])
+        return counts
+
+    def _consume(self, idx, round_log, counts, num_sub_rounds):
+        self.battle_counts.append(counts)
+
+        main_round, sub_round = divmod(idx, num_sub_rounds)
+        if sub_round == 1:
+            # 记录各军团参谋是否购买信息
+            records = {team: "" for team in TEAMS}
+            for info in round_log.values():
+                role = info.get("role", ("", ""))
+                if role[1] == "参谋":
+                    records[role[0]] = info.get("decision", "")
+            self.purchase_records[main_round] = records
+            self._canmou_members[main_round] = [
+                (user_id, info["role"][0])
+                for user_id, info in round_log.items()
+                if info.get("role", ("", ""))[1] == "参谋"
+            ]
+        if sub_round == num_sub_rounds - 1:
+            self._close_main_round(main_round, round_log, counts)
+
+    def _close_main_round(self, main_round, round_log, counts):
+        # 更新连胜数，计算基础得分
+        base_scores = {team: {b: 0 for b in BATTLEFIELDS} for team in TEAMS}
+        for b in BATTLEFIELDS:
+            num_A, num_B = counts["A"][b], counts["B"][b]
+            if num_A > num_B:
+                self.streak_counts["A"][b] += 1
+                self.streak_counts["B"][b] = 0
+                base_scores["A"][b] = (num_A - num_B) * 2 + num_A
+            elif num_A < num_B:
+                self.streak_counts["B"][b] += 1
+                self.streak_counts["A"][b] = 0
+                base_scores["B"][b] = (num_B - num_A) * 2 + num_B
+            else:  # 平局
+                self.streak_counts["A"][b] = 0
+                self.streak_counts["B"][b] = 0
+        self.round_base_scores.append(base_scores)
+
+        # 计算当前回合的军团得分（使用当前的连胜数）
+        round_score = self.round_score(main_round, self.streak_counts)
+        self.round_army_scores.append(round_score)
+        for team in TEAMS:
+            self.army_scores[team] += round_score[team]
+        logger.debug(
+            "回合 %d 当前连胜数: A=%s, B=%s, 军团回合得分: A=%s, B=%s",
+            main_round,
+            self.streak_counts["A"],
+            self.streak_counts["B"],
+            round_score["A"],
+            round_score["B"],
+        )
+
+        # 计算统帅得分
+        tongshuai_scores = {}
+        for user_id, info in round_log.items():
+            role = info.get("role", ("", ""))
+            if role[1] != "统帅":
+                continue
+            decision = info.get("decision", "")
+            score = 0
+            if decision in BATTLEFIELDS:
+                my_team, enemy_team = ("A", "B") if role[0] == "A" else ("B", "A")
+                my_num = counts[my_team][decision]
+                enemy_num = counts[enemy_team][decision]
+                if my_num > enemy_num:
+                    score = 3
+                elif my_num == enemy_num:
+                    score = 1
+            tongshuai_scores[user_id] = score
+            self.tongshuai_cumulative[user_id] = (
+                self.tongshuai_cumulative.get(user_id, 0) + score
+            )
+        self.tongshuai_per_round[main_round] = tongshuai_scores
+
+        # 计算参谋得分 = 军团该回合得分 - 购买成本
+        records = self.purchase_records.get(main_round)
+        if records is None:
+            return
+        canmou_scores = {}
+        for user_id, team in self._canmou_members.pop(main_round, []):
+            cost = 1 if records[team] == "购买" else 0
+            score = round_score[team] - cost
+            canmou_scores[user_id] = score
+            self.canmou_cumulative[user_id] = (
+                self.canmou_cumulative.get(user_id, 0) + score
+            )
+        self.canmou_per_round[main_round] = canmou_scores
+
 
 class CorpsFightAlgorithm(BaseAlgorithm):
     # todo 增加最后一轮计算方式
+
+    string_table = (
+        "历史信息",
+        "统计信息",
+        "前一个大回合我军得分",
+        "前一个大回合我军战场1人数",
+        "前一个大回合我军战场2人数",
+        "前一个大回合敌军战场1人数",
+        "前一个大回合敌军战场2人数",
+        "前一个大回合本统帅得分",
+        "前一个大回合本统帅最终选择",
+        "前一个大回合本参谋得分",
+        "前一个大回合本参谋选择",
+        "当前我军战场1连胜数",
+        "当前我军战场2连胜数",
+        "我军累计得分",
+        "本统帅累计得分",
+        "本参谋累计得分",
+        "本大回合中小回合1我军战场1人数",
+        "本大回合中小回合1我军战场2人数",
+        "本大回合中小回合1敌军战场1人数",
+        "本大回合中小回合1敌军战场2人数",
+        "本大回合中小回合1本统帅选择",
+        "未购买",
+        "购买",
+        "不购买",
+        *BATTLEFIELDS,
+        "0",
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.state = CorpsFightState()
+
+    def _num_sub_rounds(self) -> int:
+        # 获取小回合总数
+        return len(self.sub_rounds) if hasattr(self, "sub_rounds") else 3
+
     def process(
         self, uuid, submit_logs, cur_main_round, cur_sub_round
     ) -> dict[str, str]:
@@ -10,17 +283,42 @@ class CorpsFightAlgorithm(BaseAlgorithm):
         if uuid is None:
             return {}
 
+        # 增量更新计分状态
+        self.state.sync(submit_logs, self._num_sub_rounds(), self.decision_log)
+        return self._user_view(uuid, submit_logs, cur_main_round, cur_sub_round)
+
+    def process_round(
+        self, uuids, submit_logs, cur_main_round, cur_sub_round
+    ) -> dict[str, dict[str, str]]:
+        super().process(None, submit_logs, cur_main_round, cur_sub_round)
+
+        # 整个回合只更新一次计分状态，再为每个参与者生成界面数据
+        self.state.sync(submit_logs, self._num_sub_rounds(), self.decision_log)
+        return {
+            uuid: self._user_view(uuid, submit_logs, cur_main_round, cur_sub_round)
+            for uuid in uuids
+        }
+
+    def _user_view(
+        self, uuid, submit_logs, cur_main_round, cur_sub_round
+    ) -> dict[str, str]:
+        """
+        根据计分状态生成单个参与者的界面数据
+        """
+
         # 获取自己的组别和角色
         my_team, my_role = self.experiment_devices[uuid]["role"]
         enemy_team = "B" if my_team == "A" else "A"
 
-        # 获取所有uuid的组别
-        uuid_group_map = {
-            u: info["role"][0] for u, info in self.experiment_devices.items()
-        }
-
-        # 获取小回合总数
-        num_sub_rounds = len(self.sub_rounds) if hasattr(self, "sub_rounds") else 3
+        num_sub_rounds = self._num_sub_rounds()
+        state = self.state
+        streak_counts = state.streak_counts
+        cumulative_scores = state.army_scores
+        tongshuai_per_round = state.tongshuai_per_round
+        tongshuai_cumulative = state.tongshuai_cumulative
+        canmou_per_round = state.canmou_per_round
+        canmou_cumulative = state.canmou_cumulative
+        purchase_records = state.purchase_records
 
         # 查找统帅小回合1选择
         def find_tongshuai_choice(uuid, main_round, sub_round_offset=0):
@@ -30,249 +328,28 @@ class CorpsFightAlgorithm(BaseAlgorithm):
             target_round = submit_logs[target_idx]
             return target_round.get(uuid, {}).get("decision", "")
 
-        # 统计战场人数
-        def count_battle(round_log, team, battle_name):
-            return sum(
-                1
-                for u, info in round_log.items()
-                if uuid_group_map.get(u) == team and info["decision"] == battle_name
-            )
-
-        # 计算军团单个大回和得分（含连胜加成）
-        def calculate_round_score(main_round, streak_counts):
-            last_sub_idx = (main_round + 1) * num_sub_rounds - 1
-            if last_sub_idx >= len(submit_logs):
-                return {"A": 0, "B": 0}
-            round_log = submit_logs[last_sub_idx]
-            # 统计统帅的选择
-            battle1_A = count_battle(round_log, "A", "战场1")
-            battle1_B = count_battle(round_log, "B", "战场1")
-            battle2_A = count_battle(round_log, "A", "战场2")
-            battle2_B = count_battle(round_log, "B", "战场2")
-            # 基础得分计算
-            score_A = score_B = 0
-            # 战场1计算
-            if battle1_A > battle1_B:
-                base_score = (battle1_A - battle1_B) * 2 + battle1_A
-                score_A += base_score * (streak_counts["A"]["战场1"])
-                score_B += 0
-            elif battle1_A < battle1_B:
-                base_score = (battle1_B - battle1_A) * 2 + battle1_B
-                score_B += base_score * (streak_counts["B"]["战场1"])
-                score_A += 0
-            # 战场2计算
-            if battle2_A > battle2_B:
-                base_score = (battle2_A - battle2_B) * 2 + battle2_A
-                score_A += base_score * (streak_counts["A"]["战场2"])
-                score_B += 0
-            elif battle2_A < battle2_B:
-                base_score = (battle2_B - battle2_A) * 2 + battle2_B
-                score_B += base_score * (streak_counts["B"]["战场2"])
-                score_A += 0
-            return {"A": score_A, "B": score_B}
-
-        # 更新连胜计数
-        def update_streak_counts(main_round, current_streak_counts):
-            last_sub_idx = (main_round + 1) * num_sub_rounds - 1
-            if last_sub_idx >= len(submit_logs):
-                return current_streak_counts
-            round_log = submit_logs[last_sub_idx]
-            # 统计各战场人数
-            battle1_A = count_battle(round_log, "A", "战场1")
-            battle1_B = count_battle(round_log, "B", "战场1")
-            battle2_A = count_battle(round_log, "A", "战场2")
-            battle2_B = count_battle(round_log, "B", "战场2")
-            new_streak_counts = {
-                "A": {
-                    "战场1": current_streak_counts["A"]["战场1"],
-                    "战场2": current_streak_counts["A"]["战场2"],
-                },
-                "B": {
-                    "战场1": current_streak_counts["B"]["战场1"],
-                    "战场2": current_streak_counts["B"]["战场2"],
-                },
-            }
-            # 更新战场1的连胜
-            if battle1_A > battle1_B:
-                new_streak_counts["A"]["战场1"] += 1
-                new_streak_counts["B"]["战场1"] = 0
-            elif battle1_A < battle1_B:
-                new_streak_counts["B"]["战场1"] += 1
-                new_streak_counts["A"]["战场1"] = 0
-            else:  # 平局
-                new_streak_counts["A"]["战场1"] = 0
-                new_streak_counts["B"]["战场1"] = 0
-            # 更新战场2的连胜
-            if battle2_A > battle2_B:
-                new_streak_counts["A"]["战场2"] += 1
-                new_streak_counts["B"]["战场2"] = 0
-            elif battle2_A < battle2_B:
-                new_streak_counts["B"]["战场2"] += 1
-                new_streak_counts["A"]["战场2"] = 0
-            else:  # 平局
-                new_streak_counts["A"]["战场2"] = 0
-                new_streak_counts["B"]["战场2"] = 0
-            return new_streak_counts
-
-        # 计算总分
-        def count_cumulative_scores():
-            army_scores = {"A": 0, "B": 0}
-            streak_counts = {
-                "A": {"战场1": 0, "战场2": 0},
-                "B": {"战场1": 0, "战场2": 0},
-            }
-            for main_round in range(cur_main_round + 1):
-                # 更新连胜数
-                streak_counts = update_streak_counts(main_round, streak_counts)
-                # 计算当前回合的得分（使用当前的连胜数）
-                round_score = calculate_round_score(main_round, streak_counts)
-                print(f"--- 回合 {main_round} ---")
-                print(f"当前连胜数: A={streak_counts['A']}, B={streak_counts['B']}")
-                print(f"军团回合得分: A={round_score['A']}, B={round_score['B']}")
-                army_scores["A"] += round_score["A"]
-                army_scores["B"] += round_score["B"]
-            return army_scores, streak_counts
-
-        # 计算所有统帅的得分
-        def calculate_tongshuai_scores():
-            """
-            计算所有统帅的得分（支持多个统帅）
-            返回:
-            - per_round_scores: 每个回合每个统帅的得分 {round: {user_id: score}}
-            - cumulative_scores: 每个统帅的累计得分 {user_id: total_score}
-            """
-            per_round_scores = {}
-            cumulative_scores = {}
-            for main_round in range(cur_main_round + 1):
-                last_sub_idx = (main_round + 1) * num_sub_rounds - 1
-                if last_sub_idx >= len(submit_logs):
-                    continue
-                round_log = submit_logs[last_sub_idx]
-                per_round_scores[main_round] = {}
-                # 统计各战场人数
-                battle1_A = count_battle(round_log, "A", "战场1")
-                battle1_B = count_battle(round_log, "B", "战场1")
-                battle2_A = count_battle(round_log, "A", "战场2")
-                battle2_B = count_battle(round_log, "B", "战场2")
-                # 找出所有统帅及其选择
-                for user_id, info in round_log.items():
-                    role = info.get("role", ("", ""))
-                    if role[1] == "统帅":
-                        decision = info.get("decision", "")
-                        score = 0
-                        # 计算该统帅得分
-                        if decision == "战场1":
-                            if role[0] == "A":
-                                if battle1_A > battle1_B:
-                                    score = 3
-                                elif battle1_A == battle1_B:
-                                    score = 1
-                            else:  # B队
-                                if battle1_B > battle1_A:
-                                    score = 3
-                                elif battle1_B == battle1_A:
-                                    score = 1
-                        elif decision == "战场2":
-                            if role[0] == "A":
-                                if battle2_A > battle2_B:
-                                    score = 3
-                                elif battle2_A == battle2_B:
-                                    score = 1
-                            else:  # B队
-                                if battle2_B > battle2_A:
-                                    score = 3
-                                elif battle2_B == battle2_A:
-                                    score = 1
-                        per_round_scores[main_round][user_id] = score
-                        cumulative_scores[user_id] = (
-                            cumulative_scores.get(user_id, 0) + score
-                        )
-            return per_round_scores, cumulative_scores
-
-        tongshuai_per_round, tongshuai_cumulative = calculate_tongshuai_scores()
-
-        # 计算所有参谋的得分
-        def calculate_canmou_scores():
-            """
-            计算所有参谋的得分（支持多个参谋）
-            返回:
-            - per_round_scores: 每个回合每个参谋的得分 {round: {user_id: score}}
-            - cumulative_scores: 每个参谋的累计得分 {user_id: total_score}
-            - purchase_records: 购买记录 {round: {team: "购买" or "不购买"}}
-            """
-            per_round_scores = {}
-            cumulative_scores = {}
-            purchase_records = {}
-            # 先计算每个大回合的军团得分
-            round_army_scores = {}
-            streak_counts = {
-                "A": {"战场1": 0, "战场2": 0},
-                "B": {"战场1": 0, "战场2": 0},
-            }
-            for main_round in range(cur_main_round + 1):
-                streak_counts = update_streak_counts(main_round, streak_counts)
-                round_score = calculate_round_score(main_round, streak_counts)
-                round_army_scores[main_round] = round_score
-            for main_round in range(cur_main_round + 1):
-                sub_round_idx = main_round * num_sub_rounds + 1
-                if sub_round_idx >= len(submit_logs):
-                    continue
-                round_log = submit_logs[sub_round_idx]
-                per_round_scores[main_round] = {}
-                purchase_records[main_round] = {"A": "", "B": ""}
-                # 先记录各军团是否购买信息
-                for user_id, info in round_log.items():
-                    role = info.get("role", ("", ""))
-                    if role[1] == "参谋":
-                        team = role[0]
-                        purchas_state = info.get("decision", "")
-                        purchase_records[main_round][team] = purchas_state
-                # 计算每个参谋得分
-                for user_id, info in round_log.items():
-                    role = info.get("role", ("", ""))
-                    if role[1] == "参谋":
-                        team = role[0]
-                        purchased = purchase_records[main_round][team] == "购买"
-                        # 得分 = 军团该回合得分 - 购买成本
-                        army_score = round_army_scores[main_round][team]
-                        cost = 1 if purchased else 0
-                        score = army_score - cost
-                        per_round_scores[main_round][user_id] = score
-                        cumulative_scores[user_id] = (
-                            cumulative_scores.get(user_id, 0) + score
-                        )
-            return per_round_scores, cumulative_scores, purchase_records
-
-        # 计算各类得分
-        cumulative_scores, streak_counts = count_cumulative_scores()
-        tongshuai_per_round, tongshuai_cumulative = calculate_tongshuai_scores()
-        canmou_per_round, canmou_cumulative, purchase_records = (
-            calculate_canmou_scores()
-        )
-
         result = {}
         # 小回合1（统帅决策）
         if cur_sub_round == 0 and my_role == "统帅":
             if cur_main_round > 0:
                 idx3 = cur_main_round * num_sub_rounds - 1
-                round3 = submit_logs[idx3] if idx3 < len(submit_logs) else {}
-                current_score = calculate_round_score(cur_main_round - 1, streak_counts)
+                current_score = state.round_score(cur_main_round - 1, streak_counts)
                 result["#info_group"] = "历史信息"
                 result["前一个大回合我军得分"] = str(current_score[my_team])
                 result["前一个大回合本统帅得分"] = str(
                     tongshuai_per_round.get(cur_main_round - 1, {}).get(uuid, 0)
                 )
                 result["前一个大回合我军战场1人数"] = str(
-                    count_battle(round3, my_team, "战场1")
+                    state.count_battle(idx3, my_team, "战场1")
                 )
                 result["前一个大回合我军战场2人数"] = str(
-                    count_battle(round3, my_team, "战场2")
+                    state.count_battle(idx3, my_team, "战场2")
                 )
                 result["前一个大回合敌军战场1人数"] = str(
-                    count_battle(round3, enemy_team, "战场1")
+                    state.count_battle(idx3, enemy_team, "战场1")
                 )
                 result["前一个大回合敌军战场2人数"] = str(
-                    count_battle(round3, enemy_team, "战场2")
+                    state.count_battle(idx3, enemy_team, "战场2")
                 )
                 result["前一个大回合本统帅最终选择"] = find_tongshuai_choice(
                     uuid, cur_main_round - 1, 2
@@ -294,14 +371,13 @@ class CorpsFightAlgorithm(BaseAlgorithm):
         elif cur_sub_round == 1 and my_role == "参谋":
 
             idx1 = cur_main_round * num_sub_rounds
-            round1 = submit_logs[idx1] if idx1 < len(submit_logs) else {}
 
             if cur_main_round > 0:
                 idx2 = (cur_main_round - 1) * num_sub_rounds + 1
                 advisor_decision = (
                     submit_logs[idx2].get(uuid, {}).get("decision", "")
                 )  # 前一个大回和参谋决策
-                last_score = calculate_round_score(cur_main_round - 1, streak_counts)
+                last_score = state.round_score(cur_main_round - 1, streak_counts)
                 result["#info_group"] = "历史信息"
                 result["前一个大回合我军得分"] = str(last_score[my_team])
                 result["前一个大回合本参谋得分"] = str(
@@ -320,10 +396,10 @@ class CorpsFightAlgorithm(BaseAlgorithm):
                 result["本参谋累计得分"] = "0"
 
             result["本大回合中小回合1我军战场1人数"] = str(
-                count_battle(round1, my_team, "战场1")
+                state.count_battle(idx1, my_team, "战场1")
             )
             result["本大回合中小回合1我军战场2人数"] = str(
-                count_battle(round1, my_team, "战场2")
+                state.count_battle(idx1, my_team, "战场2")
             )
             result["当前我军战场1连胜数"] = str(streak_counts[my_team]["战场1"])
             result["当前我军战场2连胜数"] = str(streak_counts[my_team]["战场2"])
@@ -331,12 +407,11 @@ class CorpsFightAlgorithm(BaseAlgorithm):
         # 小回合3（统帅决策）
         elif cur_sub_round == 2 and my_role == "统帅":
             last_round_score = (
-                calculate_round_score(cur_main_round - 1, streak_counts)
+                state.round_score(cur_main_round - 1, streak_counts)
                 if cur_main_round > 0
                 else {"A": 0, "B": 0}
             )
             idx1 = cur_main_round * num_sub_rounds
-            round1 = submit_logs[idx1] if idx1 < len(submit_logs) else {}
             result["#info_group"] = "历史信息"
             if cur_main_round == 0:
                 result["前一个大回合我军得分"] = "0"
@@ -353,20 +428,20 @@ class CorpsFightAlgorithm(BaseAlgorithm):
                 uuid, cur_main_round, 0
             )
             result["本大回合中小回合1我军战场1人数"] = str(
-                count_battle(round1, my_team, "战场1")
+                state.count_battle(idx1, my_team, "战场1")
             )
             result["本大回合中小回合1我军战场2人数"] = str(
-                count_battle(round1, my_team, "战场2")
+                state.count_battle(idx1, my_team, "战场2")
             )
 
             # 第二回合本军参谋是否购买信息
             buy = purchase_records.get(cur_main_round, {}).get(my_team, "")
             if buy == "购买":
                 result["本大回合中小回合1敌军战场1人数"] = str(
-                    count_battle(round1, enemy_team, "战场1")
+                    state.count_battle(idx1, enemy_team, "战场1")
                 )
                 result["本大回合中小回合1敌军战场2人数"] = str(
-                    count_battle(round1, enemy_team, "战场2")
+                    state.count_battle(idx1, enemy_team, "战场2")
                 )
             elif buy == "不购买":
                 result["本大回合中小回合1敌军战场1人数"] = "未购买"
@@ -375,8 +450,13 @@ class CorpsFightAlgorithm(BaseAlgorithm):
             result["当前我军战场1连胜数"] = str(streak_counts[my_team]["战场1"])
             result["当前我军战场2连胜数"] = str(streak_counts[my_team]["战场2"])
 
-        print(
-            f"本轮主回合:{cur_main_round},\n本轮小回合: {cur_sub_round}, \n本轮轮策者: {my_role}, \n当前队伍: {my_team}, \n信息界面：{result}\n"
+        logger.debug(
+            "本轮主回合: %s, 本轮小回合: %s, 本轮轮策者: %s, 当前队伍: %s, 信息界面: %s",
+            cur_main_round,
+            cur_sub_round,
+            my_role,
+            my_team,
+            result,
         )
         # print(f"实验日志：{submit_logs}")
 
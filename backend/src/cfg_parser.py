@@ -1,4 +1,5 @@
 import importlib
+import logging
 from pathlib import Path
 import pprint
 
@@ -8,6 +9,8 @@ from algorithm.base_algo import BaseAlgorithm
 
 from model.cfg import AlgorithmConfig, AppConfig, LabExpConfig
 
+logger = logging.getLogger(__name__)
+
 
 def load_lab_exp_config(config_path: str) -> LabExpConfig:
     """加载并解析实验配置文件
@@ -30,8 +33,8 @@ def load_lab_exp_config(config_path: str) -> LabExpConfig:
 
     with open(config_path, "r", encoding="utf-8") as f:
         lab_exp_config = yaml.safe_load(f)
-        print("成功加载实验配置:")
-        pprint.pprint(lab_exp_config)
+        logger.info("成功加载实验配置: %s", cfg_path)
+        logger.debug("实验配置内容:\n%s", pprint.pformat(lab_exp_config))
     return LabExpConfig(**lab_exp_config)
 
 
@@ -52,8 +55,8 @@ def load_app_config() -> AppConfig:
 
     with open(config_path, "r") as f:
         config_data = yaml.safe_load(f)
-        print("成功加载应用配置:")
-        pprint.pprint(config_data)
+        logger.info("成功加载应用配置: %s", config_path)
+        logger.debug("应用配置内容:\n%s", pprint.pformat(config_data))
 
     return AppConfig(**config_data)
 
@@ -0,0 +1,152 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import shutil
+import typing
+from pathlib import Path
+
+from pydantic_core import to_json
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.json"
+"""最近一次的完整状态快照"""
+
+JOURNAL_FILE = "journal.jsonl"
+"""快照之后的提交记录，每次提交追加一行"""
+
+
+class Checkpoint:
+    """
+    实验状态检查点
+
+    回合结束、新设备加入时保存完整快照（先写临时文件再原子替换，并 fsync）；
+    两次快照之间的每次提交追加到提交日志（每行都 fsync，机器崩溃、休眠断电也不丢失）。
+    恢复时读取快照并按顺序重放提交日志。
+
+    状态在事件循环中编码，文件写入和 fsync 由一个专用线程按调用顺序执行，不阻塞事件循环；
+    较早的快照不会覆盖较新的快照，快照之后追加的提交记录也不会被该快照清空。
+    """
+
+    def __init__(self, checkpoint_dir: Path):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.snapshot_path = self.checkpoint_dir / SNAPSHOT_FILE
+        self.journal_path = self.checkpoint_dir / JOURNAL_FILE
+        self._journal: typing.TextIO = None
+        self._executor: concurrent.futures.ThreadPoolExecutor = None
+        self._last: asyncio.Future = None
+        """最后提交的文件操作"""
+
+    def save_snapshot(self, state: dict) -> asyncio.Future:
+        """
+        保存快照，并清空提交日志（仅编码并提交写入，不等待磁盘）
+
+        Args:
+            state (dict): 可 JSON 序列化的实验状态
+
+        Returns:
+            asyncio.Future: 写入完成（或失败）时完成
+        """
+
+        return self._submit(self._write_snapshot, to_json(state))
+
+    def append_journal(self, entry: dict) -> asyncio.Future:
+        """
+        追加一条提交记录（仅编码并提交写入，不等待磁盘）
+
+        Args:
+            entry (dict): 可 JSON 序列化的提交记录
+
+        Returns:
+            asyncio.Future: 写入并 fsync 完成（或失败）时完成
+        """
+
+        return self._submit(self._append, to_json(entry).decode() + "\n")
+
+    async def flush(self):
+        """
+        等待已提交的文件操作全部完成
+        """
+
+        if self._last is not None:
+            await asyncio.wait([self._last])
+
+    def load(self) -> tuple[dict, list[dict]]:
+        """
+        读取快照和提交日志
+
+        Returns:
+            tuple[dict, list[dict]]: (快照，没有快照时为 None, 提交记录列表)
+        """
+
+        if not self.snapshot_path.is_file():
+            return None, []
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        journal = []
+        if self.journal_path.is_file():
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        journal.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # 崩溃时写了一半的最后一行
+                        break
+        return state, journal
+
+    def clear(self) -> asyncio.Future:
+        """
+        删除检查点（实验正常结束后调用），在已提交的写入之后执行
+
+        Returns:
+            asyncio.Future: 删除完成时完成
+        """
+
+        return self._submit(self._remove)
+
+    def _submit(self, function: typing.Callable, *args) -> asyncio.Future:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="checkpoint"
+            )
+        future = asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        future.add_done_callback(self._report)
+        self._last = future
+        return future
+
+    def _report(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("检查点写入失败: %s, %r", self.checkpoint_dir, future.exception())
+
+    def _write_snapshot(self, data: bytes):
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._close_journal()
+        self.journal_path.unlink(missing_ok=True)
+
+    def _append(self, line: str):
+        if self._journal is None:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _remove(self):
+        self._close_journal()
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+__all__ = ["Checkpoint", "JOURNAL_FILE", "SNAPSHOT_FILE"]
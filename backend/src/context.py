@@ -1,21 +1,38 @@
+import logging
 import socket
 
-from cfg_parser import load_algorithm, load_app_config, load_lab_exp_config
-from manager import ConnectionManager, ExperimentManager
-from model.cfg import LabExpConfig
+from cfg_parser import load_app_config
+from event_log import setup_logging
+from session import (
+    DEFAULT_SESSION_ID,
+    ExperimentSession,
+    SessionRegistry,
+    configured_sessions,
+    worker_sessions,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class Context:
     def __init__(self):
-        self.connection_manager = ConnectionManager()
         self.port = 8000  # 在这里修改端口号
-        self.exp_config: LabExpConfig = None
+        self.sessions: SessionRegistry = None
 
     def _initConfig(self):
         # 加载配置
         self.app_config = load_app_config()
-        self.exp_config = load_lab_exp_config(self.app_config.lab_cfg_path)
-        self._algorithm = load_algorithm(self.exp_config.algorithm)
+        setup_logging(self.app_config.log_level, self.app_config.log_levels)
+        # 加载应用配置时日志尚未配置，在这里补记一次
+        logger.info("应用配置: %r", self.app_config)
+
+    def _initSessions(self):
+        # 创建默认实验场次以及配置的其他实验场次，多进程部署时只创建本进程负责的场次
+        self.sessions = SessionRegistry(self.local_ip, self.port)
+        owned = worker_sessions()
+        for session_id, cfg_path in configured_sessions(self.app_config).items():
+            if owned is None or session_id in owned:
+                self.sessions.create(session_id, cfg_path)
 
     def _get_local_ip(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -29,18 +46,25 @@ class Context:
             s.close()
         return ip
 
+    @property
+    def default_session(self) -> ExperimentSession:
+        return self.sessions.get(DEFAULT_SESSION_ID)
+
+    async def resume(self):
+        # 从检查点恢复服务重启前正在进行的实验
+        for session in self.sessions.sessions.values():
+            await session.experiment_manager.resume()
+
     def init(self):
         self._initConfig()
         # 获取并打印IP地址
 
         self.local_ip = self._get_local_ip()
-        print(f"后端服务已启动，局域网访问地址: http://{self.local_ip}:{self.port}")
-        print(f"请在客户端使用此IP和端口连接服务")
-
-        self.experiment_manager = ExperimentManager(
-            self.exp_config,
-            self.connection_manager,
-            self._algorithm,
-            self.local_ip,
-            self.port,
-        )
+        logger.info("后端服务已启动，局域网访问地址: http://%s:%s", self.local_ip, self.port)
+        logger.info("请在客户端使用此IP和端口连接服务")
+
+        self._initSessions()
+        if len(self.sessions) > 1:
+            logger.info(
+                "实验场次: %s，客户端通过 /ws?session=场次id 连接", list(self.sessions.sessions)
+            )
@@ -0,0 +1,236 @@
+import numpy as np
+
+from model.cfg import LabExpConfig
+
+
+class Codebook:
+    """
+    名称与整数编码的双向映射
+    编码按名称首次出现的顺序分配，从 0 开始
+    """
+
+    def __init__(self, names: list[str] = None):
+        self.names: list[str] = []
+        self._codes: dict[str, int] = {}
+        for name in names or []:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str) -> int:
+        """
+        获取名称的编码，名称不存在时分配新编码
+
+        Args:
+            name (str): 名称
+
+        Returns:
+            int: 编码
+        """
+
+        code = self._codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self._codes[name] = code
+            self.names.append(name)
+        return code
+
+    def code(self, name: str) -> int:
+        """
+        获取名称的编码
+
+        Args:
+            name (str): 名称
+
+        Returns:
+            int: 编码，名称不存在时返回 -1
+        """
+
+        return self._codes.get(name, -1)
+
+
+class DecisionLog:
+    """
+    列式决策日志
+
+    与 ExperimentManager.submit_logs 同步维护，每条提交记录按行追加，
+    每行保存 (小回合下标, 设备编号, 组别编码, 角色编码, 决策编码) 五个整数，
+    使“某回合 A 组选择战场1的人数”、“整个实验各组的决策统计”等查询变成一次向量化运算。
+
+    小回合下标为展平后的下标，与 submit_logs 的下标一致。
+    """
+
+    COLUMNS = ("round", "device", "group", "role", "decision")
+
+    def __init__(self, exp_cfg: LabExpConfig = None):
+        self.devices = Codebook()
+        """设备uuid编码"""
+
+        self.groups = Codebook()
+        """组别编码"""
+
+        self.roles = Codebook()
+        """角色编码"""
+
+        self.decisions = Codebook()
+        """决策编码"""
+
+        if exp_cfg is not None:
+            for group in exp_cfg.groups:
+                self.groups.add(group.name)
+                for role in group.roles:
+                    self.roles.add(role.name)
+            for main_round in exp_cfg.main_rounds:
+                for sub_round in main_round.sub_rounds:
+                    for option in sub_round.decision.options:
+                        self.decisions.add(option)
+
+        self._data = np.empty((len(self.COLUMNS), 64), dtype=np.int32)
+        self._size = 0
+        self._offsets = [0]
+
+    @property
+    def num_rounds(self) -> int:
+        """已记录的小回合数"""
+        return len(self._offsets) - 1
+
+    @property
+    def size(self) -> int:
+        """已记录的提交条数"""
+        return self._size
+
+    def append_round(self, round_log: dict) -> int:
+        """
+        追加一个小回合的提交日志
+
+        Args:
+            round_log (dict): 小回合提交日志，结构与 submit_logs 中的元素一致
+                {uuid: {"role": (str, str), "decision": str}}
+
+        Returns:
+            int: 该小回合的下标
+        """
+
+        round_idx = self.num_rounds
+        rows = len(round_log)
+        self._reserve(self._size + rows)
+        block = self._data[:, self._size : self._size + rows]
+        block[0] = round_idx
+        for i, (uuid, info) in enumerate(round_log.items()):
+            block[1, i] = self.devices.add(uuid)
+            block[2, i] = self.groups.add(info["role"][0])
+            block[3, i] = self.roles.add(info["role"][1])
+            block[4, i] = self.decisions.add(info["decision"])
+        self._size += rows
+        self._offsets.append(self._size)
+        return round_idx
+
+    def column(self, name: str, round_idx: int = None) -> np.ndarray:
+        """
+        获取某一列的只读视图
+
+        Args:
+            name (str): 列名，见 COLUMNS
+            round_idx (int, optional): 小回合下标，为 None 时返回全部记录. Defaults to None.
+
+        Returns:
+            np.ndarray: 列数据
+        """
+
+        start, end = self._bounds(round_idx)
+        view = self._data[self.COLUMNS.index(name), start:end]
+        view.flags.writeable = False
+        return view
+
+    def count(
+        self,
+        round_idx: int = None,
+        group: str = None,
+        role: str = None,
+        decision: str = None,
+    ) -> int:
+        """
+        统计满足条件的提交条数
+
+        Args:
+            round_idx (int, optional): 小回合下标，为 None 时统计全部记录. Defaults to None.
+            group (str, optional): 组别. Defaults to None.
+            role (str, optional): 角色. Defaults to None.
+            decision (str, optional): 决策. Defaults to None.
+
+        Returns:
+            int: 提交条数
+        """
+
+        start, end = self._bounds(round_idx)
+        return int(np.count_nonzero(self._mask(start, end, group, role, decision)))
+
+    def counts_per_round(
+        self, group: str = None, role: str = None, decision: str = None
+    ) -> np.ndarray:
+        """
+        统计每个小回合满足条件的提交条数
+
+        Args:
+            group (str, optional): 组别. Defaults to None.
+            role (str, optional): 角色. Defaults to None.
+            decision (str, optional): 决策. Defaults to None.
+
+        Returns:
+            np.ndarray: 长度为 num_rounds 的数组
+        """
+
+        mask = self._mask(0, self._size, group, role, decision)
+        return np.bincount(
+            self._data[0, : self._size][mask], minlength=self.num_rounds
+        )
+
+    def group_decision_counts(self, round_idx: int = None) -> np.ndarray:
+        """
+        统计各组别各决策的提交条数
+
+        Args:
+            round_idx (int, optional): 小回合下标，为 None 时统计全部记录. Defaults to None.
+
+        Returns:
+            np.ndarray: 形状为 (组别数, 决策数) 的数组，下标为 groups / decisions 的编码
+        """
+
+        start, end = self._bounds(round_idx)
+        num_decisions = len(self.decisions)
+        flat = self._data[2, start:end] * num_decisions + self._data[4, start:end]
+        return np.bincount(
+            flat, minlength=len(self.groups) * num_decisions
+        ).reshape(len(self.groups), num_decisions)
+
+    def _bounds(self, round_idx: int = None) -> tuple[int, int]:
+        if round_idx is None:
+            return 0, self._size
+        if round_idx < 0 or round_idx >= self.num_rounds:
+            return 0, 0
+        return self._offsets[round_idx], self._offsets[round_idx + 1]
+
+    def _mask(
+        self, start: int, end: int, group: str, role: str, decision: str
+    ) -> np.ndarray:
+        mask = np.ones(end - start, dtype=bool)
+        for row, codebook, name in (
+            (2, self.groups, group),
+            (3, self.roles, role),
+            (4, self.decisions, decision),
+        ):
+            if name is not None:
+                mask &= self._data[row, start:end] == codebook.code(name)
+        return mask
+
+    def _reserve(self, capacity: int):
+        if capacity <= self._data.shape[1]:
+            return
+        new_capacity = max(capacity, self._data.shape[1] * 2)
+        data = np.empty((len(self.COLUMNS), new_capacity), dtype=np.int32)
+        data[:, : self._size] = self._data[:, : self._size]
+        self._data = data
+
+
+__all__ = ["Codebook", "DecisionLog"]
@@ -0,0 +1,187 @@
+"""
+增量更新（协议v3）
+
+每个不同内容的实验信息帧有一个状态版本号，服务端为每台设备记录最后发送给它的 (帧, 版本)：
+
+- 没有记录（新连接、重连、客户端请求同步、上次发送失败）时发送完整快照:
+  {"cmd": "UPDATE_EXPERIMENT_INFO", "data": {...实验信息, "version": 版本}}
+- 否则只发送与上次状态相比变化的部分:
+  {"cmd": "PATCH_EXPERIMENT_INFO", "data": {"base": 上次版本, "version": 版本, "infos": {"length": n, "set": [[下标, 条目], ...]}, ...}}
+
+客户端收到 base 与自己的版本不一致的增量时发送 SYNC_EXPERIMENT_INFO 请求完整快照。
+等待和结束状态的增量只修改 expStatus，客户端保留上一回合的 infos / images / options 但不显示，
+下一回合的增量相对上一回合计算，只包含变化的信息。
+相同 (上次版本, 版本) 的增量对所有设备相同，只计算和编码一次。
+"""
+
+import itertools
+
+from pydantic_core import to_json
+
+from model.message import CMD, ExperimentStatus
+from protocol import PROTOCOL_V2, Frame
+
+State = tuple[Frame, int]
+"""设备的状态 (最后发送的帧, 版本)"""
+
+
+def diff_list(old: list, new: list) -> dict | None:
+    """
+    计算列表的增量，按下标比较
+
+    Args:
+        old (list): 旧列表
+        new (list): 新列表
+
+    Returns:
+        dict | None: {"length": 新长度, "set": [[下标, 条目], ...]}，没有变化时返回 None
+    """
+
+    changed = [
+        [i, item]
+        for i, item in enumerate(new)
+        if i >= len(old) or (old[i] is not item and old[i] != item)
+    ]
+    if not changed and len(old) == len(new):
+        return None
+    return {"length": len(new), "set": changed}
+
+
+def diff_data(old: dict, new: dict) -> dict:
+    """
+    计算实验信息的增量，列表字段按下标比较，其他字段有变化时整体替换
+
+    Args:
+        old (dict): 旧的实验信息
+        new (dict): 新的实验信息
+
+    Returns:
+        dict: 变化的字段
+    """
+
+    patch = {}
+    for key, value in new.items():
+        base = old.get(key)
+        if isinstance(value, list) and isinstance(base, list):
+            changes = diff_list(base, value)
+            if changes is not None:
+                patch[key] = changes
+        elif base is not value and to_json(base) != to_json(value):
+            patch[key] = value
+    return patch
+
+
+class DeltaEncoder:
+    """
+    增量消息编码器
+
+    帧的版本号和编码结果按回合缓存，回合开始时与帧缓存一起清空；设备的状态由调用方保存。
+    """
+
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self._versions: dict[int, State] = {}
+        """id(帧) -> (帧, 版本)，保留帧的引用以免 id 被复用"""
+
+        self._encoded: dict[tuple[int, int], str] = {}
+        """(上次版本, 版本) -> 编码结果，快照的上次版本为 0"""
+
+        self._status_frames: dict[tuple[int, int], Frame] = {}
+        """(上次版本, id(状态帧)) -> 保留上次内容、只修改 expStatus 的帧"""
+
+        self.snapshots = 0
+        """编码的快照数"""
+
+        self.patches = 0
+        """编码的增量数"""
+
+    def version(self, frame: Frame) -> int:
+        """
+        获取帧的状态版本号
+        """
+
+        state = self._versions.get(id(frame))
+        if state is None:
+            state = self._versions[id(frame)] = (frame, next(self._counter))
+        return state[1]
+
+    def snapshot(self, frame: Frame) -> tuple[str, State]:
+        """
+        编码完整快照
+
+        Args:
+            frame (Frame): 实验信息帧
+
+        Returns:
+            tuple[str, State]: (编码结果, 发送后设备的状态)
+        """
+
+        version = self.version(frame)
+        encoded = self._encoded.get((0, version))
+        if encoded is None:
+            # 在 v2 编码的 data 对象末尾加上版本号
+            encoded = frame.encode(PROTOCOL_V2)[:-2] + f',"version":{version}}}}}'
+            self._encoded[(0, version)] = encoded
+            self.snapshots += 1
+        return encoded, (frame, version)
+
+    def patch(self, state: State, frame: Frame) -> tuple[str, State]:
+        """
+        编码从设备当前状态到新帧的增量
+
+        Args:
+            state (State): 设备当前的状态
+            frame (Frame): 新的实验信息帧
+
+        Returns:
+            tuple[str, State]: (编码结果, 发送后设备的状态)
+        """
+
+        base, base_version = state
+        status = frame.data.get("expStatus")
+        if status != ExperimentStatus.RUNNING and base.data.get("expStatus") is not None:
+            # 等待/结束状态只修改 expStatus，保留上次的内容供下一回合计算增量
+            key = (base_version, id(frame))
+            overlay = self._status_frames.get(key)
+            if overlay is None:
+                overlay = self._status_frames[key] = Frame(
+                    frame.cmd, {**base.data, "expStatus": status}
+                )
+            frame = overlay
+        version = self.version(frame)
+        encoded = self._encoded.get((base_version, version))
+        if encoded is None:
+            data = {"base": base_version, "version": version}
+            data.update(diff_data(base.data, frame.data))
+            encoded = to_json({"cmd": CMD.PATCH_EXPERIMENT_INFO, "data": data}).decode()
+            self._encoded[(base_version, version)] = encoded
+            self.patches += 1
+        return encoded, (frame, version)
+
+    def encode(self, state: State | None, frame: Frame) -> tuple[str, State]:
+        """
+        编码发给设备的消息，没有状态时发送快照
+
+        Args:
+            state (State | None): 设备当前的状态
+            frame (Frame): 新的实验信息帧
+
+        Returns:
+            tuple[str, State]: (编码结果, 发送后设备的状态)
+        """
+
+        if state is None:
+            return self.snapshot(frame)
+        return self.patch(state, frame)
+
+    def clear(self):
+        """
+        清空版本号和编码缓存（设备保存的状态不受影响）
+        """
+
+        self._versions.clear()
+        self._encoded.clear()
+        self._status_frames.clear()
+
+
+__all__ = ["DeltaEncoder", "State", "diff_data", "diff_list"]
@@ -0,0 +1,68 @@
+"""
+运行日志
+
+各模块用标准库 logging 记录事件:
+
+    logger = logging.getLogger(__name__)
+    logger.debug("收到消息: %s", message)
+
+参数用 %s 占位传入，级别未启用时不会格式化；需要额外计算的内容先用 logger.isEnabledFor 判断。
+setup_logging 把根 logger 的输出换成 QueueHandler，由后台线程中的 QueueListener 写到控制台，
+事件循环中记录日志只是格式化消息并入队，不会等待控制台输出。
+每个模块的级别可以在 app_cfg.yml 的 log_levels 中单独设置。
+"""
+
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+"""控制台输出格式"""
+
+_listener: logging.handlers.QueueListener = None
+
+
+def setup_logging(level: str = "INFO", levels: dict[str, str] = None):
+    """
+    配置日志：根 logger 只入队，后台线程写到控制台
+
+    可以重复调用，新的配置替换旧的配置
+
+    Args:
+        level (str, optional): 根 logger 级别. Defaults to "INFO".
+        levels (dict[str, str], optional): 模块名 -> 级别，如 {"manager": "DEBUG"}. Defaults to None.
+    """
+
+    global _listener
+    shutdown_logging()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, console, respect_handler_level=True
+    )
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level.upper())
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(module_level.upper())
+
+
+def shutdown_logging():
+    """
+    写出队列中剩余的日志并停止后台线程
+    """
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+__all__ = ["LOG_FORMAT", "setup_logging", "shutdown_logging"]
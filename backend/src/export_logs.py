@@ -0,0 +1,269 @@
+"""
+实验 log 导出工具
+
+把一个或多个实验 log 目录（包含 exp_log_decision.json 和 exp_log_message.json）导出为长表，便于分析：
+
+- decisions: 每个 (实验, 回合, 设备) 一行，包含组别、角色和决策
+- infos: 每个 (实验, 回合, 设备, 提示信息) 一行，即每个回合展示给每个参与者的信息
+
+每张表输出为 CSV 和 NumPy 压缩列式文件（.npz，np.load 后按列名取列，字符串列为字典编码，见 TableWriter.close），
+安装了 pyarrow 时同时输出 Parquet。多个实验 log 目录在多个进程中并行解析，
+CSV 和 Parquet 按目录逐个写出，.npz 在内存中只保留字典下标，不需要把全部行的字符串放在内存中。
+
+用法: python export_logs.py [log目录，默认 ../log] [-o 输出目录，默认 ../export] [-j 进程数]
+"""
+
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from round_log import DECISION_LOG_FILE, MESSAGE_LOG_FILE
+from utils.json_to_file import get_all_json_files
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # 未安装 pyarrow 时不输出 Parquet
+    pyarrow = None
+
+DECISION_COLUMNS = (
+    "run",
+    "round",
+    "main_round",
+    "sub_round",
+    "uuid",
+    "group",
+    "role",
+    "decision",
+)
+"""决策表的列，回合序号均从0开始"""
+
+INFO_COLUMNS = (
+    "run",
+    "round",
+    "main_round",
+    "sub_round",
+    "uuid",
+    "section",
+    "hint",
+    "value",
+)
+"""提示信息表的列，section 为信息所在的分组（#info_group）"""
+
+INT_COLUMNS = {"round", "main_round", "sub_round"}
+
+
+def find_runs(log_dir: Path) -> list[Path]:
+    """
+    查找 log 目录下的全部实验 log 目录
+
+    Args:
+        log_dir (Path): log 根目录
+
+    Returns:
+        list[Path]: 包含 exp_log_decision.json 的目录，按路径排序
+    """
+
+    return sorted(
+        Path(path).parent
+        for path in get_all_json_files(str(log_dir))
+        if Path(path).name == DECISION_LOG_FILE
+    )
+
+
+def _round_index(infos: list[dict], hint: str) -> int:
+    # 基本信息中的 "实验轮数"/"当前回合数" 形如 "3/10"
+    for info in infos:
+        if info["hint"] == hint:
+            return int(str(info["value"]).split("/")[0]) - 1
+    return -1
+
+
+def read_run(run_dir: Path, run: str) -> tuple[list[tuple], list[tuple]]:
+    """
+    解析一个实验 log 目录
+
+    Args:
+        run_dir (Path): 实验 log 目录
+        run (str): 实验标识，写入 run 列
+
+    Returns:
+        tuple[list[tuple], list[tuple]]: (决策表的行, 提示信息表的行)
+    """
+
+    with open(run_dir / DECISION_LOG_FILE, "r", encoding="utf-8") as f:
+        submit_logs = json.load(f)
+    message_logs = []
+    if (run_dir / MESSAGE_LOG_FILE).is_file():
+        with open(run_dir / MESSAGE_LOG_FILE, "r", encoding="utf-8") as f:
+            message_logs = json.load(f)
+
+    # 每个回合的 (大回合, 小回合) 从该回合下发的消息中获取
+    cursors = []
+    info_rows = []
+    for round_idx, message_log in enumerate(message_logs):
+        cursor = (-1, -1)
+        for uuid, msg in message_log.items():
+            data = msg["message"]["data"]
+            if isinstance(data, str):
+                data = json.loads(data)
+            infos = data.get("infos", [])
+            cursor = (_round_index(infos, "实验轮数"), _round_index(infos, "当前回合数"))
+            section = ""
+            for info in infos:
+                if info["hint"] == "#info_group":
+                    section = info["value"]
+                    continue
+                info_rows.append(
+                    (run, round_idx, *cursor, uuid, section, info["hint"], str(info["value"]))
+                )
+        cursors.append(cursor)
+
+    decision_rows = []
+    for round_idx, submit_log in enumerate(submit_logs):
+        cursor = cursors[round_idx] if round_idx < len(cursors) else (-1, -1)
+        for uuid, value in submit_log.items():
+            group, role = value["role"]
+            decision_rows.append(
+                (run, round_idx, *cursor, uuid, group, role, value["decision"])
+            )
+    return decision_rows, info_rows
+
+
+def _read_run_task(args: tuple[Path, str]) -> tuple[str, list[tuple], list[tuple]]:
+    run_dir, run = args
+    try:
+        return run, *read_run(run_dir, run)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"解析实验 log 失败: {run_dir}, {e}")
+        return run, [], []
+
+
+class TableWriter:
+    """
+    长表写出器：CSV 和 Parquet 逐批追加（每个实验 log 目录一个 row group），
+    .npz 中的字符串列按字典编码为 int32 下标，内存中只保留下标和去重后的字符串
+    """
+
+    def __init__(self, out_dir: Path, name: str, columns: tuple[str, ...]):
+        self.out_dir = out_dir
+        self.name = name
+        self.columns = columns
+        self.num_rows = 0
+        self._csv_file = open(out_dir / f"{name}.csv", "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._csv_file)
+        self._csv.writerow(columns)
+        self._codes: list[list[np.ndarray]] = [[] for _ in columns]
+        """每列的各批数据，字符串列为字典下标"""
+
+        self._categories: list[dict[str, int]] = [{} for _ in columns]
+        """字符串列的字典：字符串 -> 下标"""
+
+        self._parquet = None
+        if pyarrow is not None:
+            self._schema = pyarrow.schema(
+                (column, pyarrow.int32() if column in INT_COLUMNS else pyarrow.string())
+                for column in columns
+            )
+            self._parquet = pyarrow.parquet.ParquetWriter(
+                out_dir / f"{name}.parquet", self._schema, compression="zstd"
+            )
+
+    def write(self, rows: list[tuple]):
+        """
+        追加一批行
+
+        Args:
+            rows (list[tuple]): 行，字段顺序与 columns 一致
+        """
+
+        if not rows:
+            return
+        self._csv.writerows(rows)
+        self.num_rows += len(rows)
+        batch = {}
+        for column, values, codes, categories in zip(
+            self.columns, zip(*rows), self._codes, self._categories
+        ):
+            if column in INT_COLUMNS:
+                batch[column] = list(values)
+                codes.append(np.asarray(values, dtype=np.int32))
+                continue
+            batch[column] = values = [str(value) for value in values]
+            codes.append(
+                np.fromiter(
+                    (categories.setdefault(value, len(categories)) for value in values),
+                    dtype=np.int32,
+                    count=len(values),
+                )
+            )
+        if self._parquet is not None:
+            self._parquet.write_table(pyarrow.table(batch, schema=self._schema))
+
+    def close(self):
+        """
+        关闭 CSV 和 Parquet，写出 .npz
+
+        .npz 中整数列按列名保存；字符串列按列名保存 int32 下标，
+        字典保存为 "{列名}_categories"，还原为字符串: arrays[f"{列名}_categories"][arrays[列名]]
+        """
+
+        self._csv_file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+        arrays = {}
+        for column, codes, categories in zip(self.columns, self._codes, self._categories):
+            arrays[column] = np.concatenate(codes) if codes else np.empty(0, np.int32)
+            if column not in INT_COLUMNS:
+                arrays[f"{column}_categories"] = np.asarray(list(categories), dtype=np.str_)
+        np.savez_compressed(self.out_dir / f"{self.name}.npz", **arrays)
+        print(f"已导出 {self.name}: {self.num_rows} 行 -> {self.out_dir}")
+
+
+def export_logs(log_dir: Path, out_dir: Path, workers: int = None) -> int:
+    """
+    导出 log 目录下的全部实验 log
+
+    Args:
+        log_dir (Path): log 根目录
+        out_dir (Path): 输出目录
+        workers (int, optional): 并行进程数，默认为 CPU 核数. Defaults to None.
+
+    Returns:
+        int: 导出的实验 log 目录数
+    """
+
+    log_dir = Path(log_dir)
+    runs = find_runs(log_dir)
+    if not runs:
+        print(f"没有找到实验 log: {log_dir}")
+        return 0
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    decisions = TableWriter(out_dir, "decisions", DECISION_COLUMNS)
+    infos = TableWriter(out_dir, "infos", INFO_COLUMNS)
+    tasks = [(run_dir, run_dir.relative_to(log_dir).as_posix()) for run_dir in runs]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map 按提交顺序返回结果，输出顺序与目录顺序一致
+        for run, decision_rows, info_rows in executor.map(_read_run_task, tasks):
+            decisions.write(decision_rows)
+            infos.write(info_rows)
+    decisions.close()
+    infos.close()
+    return len(runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把实验 log 导出为 CSV 和列式长表")
+    parser.add_argument("log_dir", nargs="?", default="../log", help="log 根目录")
+    parser.add_argument("-o", "--out", default="../export", help="输出目录")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数")
+    args = parser.parse_args()
+    export_logs(Path(args.log_dir), Path(args.out), args.jobs)
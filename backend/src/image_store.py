@@ -0,0 +1,152 @@
+import hashlib
+import logging
+from pathlib import Path
+
+from image_variants import PILImage, ImageVariant, build_variants, select_variant
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "svg": "image/svg+xml",
+}
+"""支持的图片格式"""
+
+
+class StoredImage:
+    """
+    预加载到内存中的图片
+    """
+
+    __slots__ = ("name", "content", "media_type", "digest", "etag", "mtime_ns", "variants")
+
+    def __init__(self, name: str, content: bytes, media_type: str, mtime_ns: int = 0):
+        self.name = name
+        self.content = content
+        self.media_type = media_type
+        self.digest = hashlib.sha256(content).hexdigest()[:16]
+        """内容哈希，用于图片URL和ETag"""
+        self.etag = f'"{self.digest}"'
+        self.mtime_ns = mtime_ns
+        """原图修改时间"""
+        self.variants: list[ImageVariant] = []
+        """预生成的缩放/重新编码版本"""
+
+    def select(self, width: int = None, accept: str = None) -> "StoredImage | ImageVariant":
+        """
+        根据客户端请求的宽度和 Accept 头选择要返回的版本
+
+        Args:
+            width (int, optional): 客户端请求的宽度. Defaults to None.
+            accept (str, optional): 客户端 Accept 头. Defaults to None.
+
+        Returns:
+            StoredImage | ImageVariant: 选中的版本，没有更合适的版本时返回原图
+        """
+
+        variant = select_variant(self.variants, width, accept)
+        return variant if variant is not None else self
+
+
+class ImageStore:
+    """
+    提示图片内存缓存
+
+    启动时把图片目录中的全部图片读入内存，请求时不再访问磁盘；
+    图片URL带上内容哈希，客户端可以长期缓存，内容变化后URL随之变化。
+    指定 cache_dir 时还会为每张图片生成缩放和 WebP 版本（需要 Pillow），按原图修改时间缓存在磁盘上。
+    缩放版本只在 load 中生成；启动后才加入目录的图片只提供原图，重新 load 后才有缩放版本。
+    """
+
+    def __init__(self, assets_dir: Path = None, cache_dir: Path = None):
+        self.assets_dir = assets_dir
+        self.cache_dir = cache_dir
+        self._images: dict[str, StoredImage] = {}
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def load(self):
+        """
+        预加载图片目录中的全部图片
+        """
+
+        self._images.clear()
+        if self.assets_dir is None or not self.assets_dir.is_dir():
+            return
+        for path in sorted(self.assets_dir.iterdir()):
+            if path.is_file() and self.media_type(path.name) is not None:
+                self._load_file(path)
+        logger.info("已预加载提示图片 %d 张: %s", len(self._images), self.assets_dir)
+        if self.cache_dir is not None and PILImage is None:
+            logger.warning("未安装 Pillow，不生成图片缩放版本")
+
+    def get(self, name: str) -> StoredImage:
+        """
+        获取图片，未预加载的图片会尝试从图片目录中读取原图并缓存（不生成缩放版本，
+        调用方在事件循环中，不能做图片缩放和编码）
+
+        Args:
+            name (str): 图片名称
+
+        Returns:
+            StoredImage: 图片，不存在时返回 None
+        """
+
+        image = self._images.get(name)
+        if image is not None or self.assets_dir is None:
+            return image
+        path = self.assets_dir / name
+        if path.parent != self.assets_dir or not path.is_file():
+            return None
+        if self.media_type(name) is None:
+            return None
+        return self._load_file(path, variants=False)
+
+    def digest(self, name: str) -> str:
+        """
+        获取图片内容哈希
+
+        Args:
+            name (str): 图片名称
+
+        Returns:
+            str: 内容哈希，图片不存在时返回 None
+        """
+
+        image = self.get(name)
+        return image.digest if image is not None else None
+
+    @staticmethod
+    def media_type(name: str) -> str:
+        """
+        根据扩展名获取媒体类型
+
+        Args:
+            name (str): 图片名称
+
+        Returns:
+            str: 媒体类型，不支持的格式返回 None
+        """
+
+        return MEDIA_TYPES.get(name.lower().split(".")[-1])
+
+    def _load_file(self, path: Path, variants: bool = True) -> StoredImage:
+        image = StoredImage(
+            path.name,
+            path.read_bytes(),
+            self.media_type(path.name),
+            path.stat().st_mtime_ns,
+        )
+        if variants and self.cache_dir is not None:
+            image.variants = build_variants(
+                image.name, image.content, image.mtime_ns, self.cache_dir
+            )
+        self._images[path.name] = image
+        return image
+
+
+__all__ = ["ImageStore", "StoredImage", "MEDIA_TYPES"]
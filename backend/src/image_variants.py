@@ -0,0 +1,148 @@
+import glob
+import hashlib
+import io
+import logging
+import re
+from pathlib import Path
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # 未安装 Pillow 时只提供原图
+    PILImage = None
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (360, 720, 1080)
+"""预生成的图片宽度（像素），不超过原图宽度"""
+
+VARIANT_FORMATS = {
+    "image/webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "image/png": ("PNG", "png", {"optimize": True}),
+}
+"""预生成的编码格式: 媒体类型 -> (Pillow格式, 扩展名, 编码参数)"""
+
+
+class ImageVariant:
+    """
+    图片的一个预生成版本（缩放和/或重新编码）
+    """
+
+    __slots__ = ("width", "media_type", "content", "digest", "etag")
+
+    def __init__(self, width: int, media_type: str, content: bytes):
+        self.width = width
+        self.media_type = media_type
+        self.content = content
+        self.digest = hashlib.sha256(content).hexdigest()[:16]
+        self.etag = f'"{self.digest}"'
+
+
+def build_variants(name: str, content: bytes, mtime_ns: int, cache_dir: Path):
+    """
+    生成图片的各个版本，结果按原图修改时间缓存在磁盘上
+
+    只保留比原图更小的版本；未安装 Pillow、原图格式不支持或无法解码时返回空列表（只提供原图）。
+    生成新的缓存文件时删除同一张图片其他修改时间的旧缓存。
+
+    Args:
+        name (str): 图片名称
+        content (bytes): 原图内容
+        mtime_ns (int): 原图修改时间，作为磁盘缓存键的一部分
+        cache_dir (Path): 磁盘缓存目录
+
+    Returns:
+        list[ImageVariant]: 图片版本列表
+    """
+
+    if PILImage is None:
+        return []
+    if not any(name.lower().endswith(f".{ext}") for ext in ("png", "jpg", "jpeg")):
+        return []
+    try:
+        source = PILImage.open(io.BytesIO(content))
+        source.load()
+    except (OSError, ValueError) as e:
+        logger.warning("无法解码图片，只提供原图: %s, %s", name, e)
+        return []
+    pruned = False
+    with source:
+        source_width, source_height = source.size
+        widths = [w for w in VARIANT_WIDTHS if w < source_width] + [source_width]
+        variants = []
+        for width in widths:
+            for media_type, (fmt, ext, params) in VARIANT_FORMATS.items():
+                cache_path = cache_dir / f"{name}.{mtime_ns}.{width}.{ext}"
+                if cache_path.is_file():
+                    data = cache_path.read_bytes()
+                else:
+                    try:
+                        data = _encode(
+                            source, width, source_width, source_height, fmt, params
+                        )
+                    except (OSError, ValueError) as e:
+                        logger.warning("生成图片版本失败: %s %s %s, %s", name, width, fmt, e)
+                        continue
+                    cache_dir.mkdir(parents=True, exist_ok=True)
+                    if not pruned:
+                        _prune_cache(cache_dir, name, mtime_ns)
+                        pruned = True
+                    cache_path.write_bytes(data)
+                if len(data) < len(content):
+                    variants.append(ImageVariant(width, media_type, data))
+    return variants
+
+
+def _prune_cache(cache_dir: Path, name: str, mtime_ns: int):
+    # 缓存文件名为 {name}.{mtime_ns}.{width}.{ext}，删除其他修改时间的版本
+    pattern = re.compile(re.escape(name) + r"\.(\d+)\.\d+\.\w+")
+    for path in cache_dir.glob(glob.escape(name) + ".*"):
+        match = pattern.fullmatch(path.name)
+        if match is not None and int(match.group(1)) != mtime_ns:
+            path.unlink(missing_ok=True)
+
+
+def select_variant(
+    variants: list[ImageVariant], width: int = None, accept: str = None
+) -> ImageVariant:
+    """
+    根据客户端请求的宽度和 Accept 头选择最合适的图片版本
+
+    优先选择不小于请求宽度的最小版本，客户端支持 WebP 时优先选择 WebP。
+
+    Args:
+        variants (list[ImageVariant]): 图片版本列表
+        width (int, optional): 客户端请求的宽度，为 None 时按原图宽度. Defaults to None.
+        accept (str, optional): 客户端 Accept 头. Defaults to None.
+
+    Returns:
+        ImageVariant: 选中的版本，没有合适的版本时返回 None（使用原图）
+    """
+
+    if not variants:
+        return None
+    accept_webp = accept is not None and "image/webp" in accept
+    candidates = [
+        v for v in variants if accept_webp or v.media_type != "image/webp"
+    ]
+    if not candidates:
+        return None
+    max_width = max(v.width for v in candidates)
+    target = max_width if width is None else min(width, max_width)
+    fitting = [v for v in candidates if v.width >= target]
+    best_width = min(v.width for v in fitting)
+    return min(
+        (v for v in fitting if v.width == best_width), key=lambda v: len(v.content)
+    )
+
+
+def _encode(source, width, source_width, source_height, fmt, params) -> bytes:
+    image = source
+    if width < source_width:
+        height = max(1, round(source_height * width / source_width))
+        image = source.resize((width, height), PILImage.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+__all__ = ["ImageVariant", "build_variants", "select_variant"]
@@ -0,0 +1,328 @@
+"""
+实验 log 索引
+
+把 log 目录下全部实验的决策和每回合得分写入一个 SQLite 数据库（默认 ../log/index.sqlite3），
+用于跨实验查询。实验结束时自动把本次实验加入索引，也可以从 log 目录增量更新或重建。
+
+用法:
+    python log_index.py update                       # 增量更新（只处理新增或变化的实验）
+    python log_index.py rebuild                      # 删除后重建
+    python log_index.py runs                         # 列出已索引的实验
+    python log_index.py rate --exp corps_fight --role 参谋 --decision 购买
+    python log_index.py sql "SELECT ..."             # 只读 SQL 查询
+"""
+
+import argparse
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+from export_logs import find_runs, read_run
+from event_log import LOG_FORMAT
+from round_log import DECISION_LOG_FILE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_DIR = Path("../log")
+INDEX_FILE = "index.sqlite3"
+
+MAX_QUERY_ROWS = 1000
+"""只读查询最多返回的行数"""
+
+QUERY_TIMEOUT = 5.0
+"""只读查询最长的执行时间（秒），超时后中止"""
+
+_PROGRESS_STEPS = 10000
+"""每执行多少条 SQLite 虚拟机指令检查一次是否超时"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run TEXT NOT NULL UNIQUE,
+    lab_exp_name TEXT NOT NULL,
+    started TEXT NOT NULL,
+    num_rounds INTEGER NOT NULL,
+    num_devices INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS decisions (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    round INTEGER NOT NULL,
+    main_round INTEGER NOT NULL,
+    sub_round INTEGER NOT NULL,
+    uuid TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    decision TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    round INTEGER NOT NULL,
+    main_round INTEGER NOT NULL,
+    sub_round INTEGER NOT NULL,
+    uuid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_exp ON runs(lab_exp_name);
+CREATE INDEX IF NOT EXISTS idx_decisions_run_round ON decisions(run_id, round);
+CREATE INDEX IF NOT EXISTS idx_decisions_group_role ON decisions(group_name, role);
+CREATE INDEX IF NOT EXISTS idx_scores_run_round ON scores(run_id, round);
+CREATE INDEX IF NOT EXISTS idx_scores_name ON scores(name);
+"""
+"""
+索引表结构
+
+- runs: 每个实验 log 目录一行，run 为相对于 log 根目录的路径（实验名/时间戳）
+- decisions: 每个 (实验, 回合, 设备) 的决策，回合序号从0开始
+- scores: 每回合展示给设备的数值信息（如得分），name 为提示文字中 # 之前的部分
+"""
+
+_READ_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+"""只读查询允许的操作"""
+
+
+def _score_name(hint: str) -> str:
+    # 提示文字可能带解释，如 "前一个大回合我军得分#[解释： ...]"
+    return hint.split("#", 1)[0].strip()
+
+
+def _to_number(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class LogIndex:
+    """
+    实验 log 的 SQLite 索引
+    """
+
+    def __init__(self, log_dir: Path = DEFAULT_LOG_DIR):
+        self.log_dir = Path(log_dir)
+        self.path = self.log_dir / INDEX_FILE
+
+    def _connect(self) -> sqlite3.Connection:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def index_run(self, run_dir: Path, conn: sqlite3.Connection = None) -> bool:
+        """
+        把一个实验 log 目录加入索引（已存在时替换）
+
+        Args:
+            run_dir (Path): 实验 log 目录
+            conn (sqlite3.Connection, optional): 已打开的连接. Defaults to None.
+
+        Returns:
+            bool: 是否成功
+        """
+
+        run_dir = Path(run_dir)
+        run = run_dir.resolve().relative_to(self.log_dir.resolve()).as_posix()
+        try:
+            decision_rows, info_rows = read_run(run_dir, run)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("解析实验 log 失败: %s, %s", run_dir, e)
+            return False
+
+        own_conn = conn is None
+        if own_conn:
+            conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM runs WHERE run = ?", (run,))
+                cursor = conn.execute(
+                    "INSERT INTO runs (run, lab_exp_name, started, num_rounds, num_devices,"
+                    " mtime_ns, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run,
+                        run_dir.parent.name,
+                        run_dir.name,
+                        len({row[1] for row in decision_rows}),
+                        len({row[4] for row in decision_rows}),
+                        (run_dir / DECISION_LOG_FILE).stat().st_mtime_ns,
+                        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+                    ),
+                )
+                run_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO decisions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((run_id, *row[1:]) for row in decision_rows),
+                )
+                conn.executemany(
+                    "INSERT INTO scores VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (run_id, *row[1:5], _score_name(row[6]), number)
+                        for row in info_rows
+                        if (number := _to_number(row[7])) is not None
+                    ),
+                )
+        finally:
+            if own_conn:
+                conn.close()
+        return True
+
+    def update(self, rebuild: bool = False) -> int:
+        """
+        从 log 目录更新索引，只处理新增或 exp_log_decision.json 有变化的实验
+
+        Args:
+            rebuild (bool, optional): 是否删除已有索引后重建. Defaults to False.
+
+        Returns:
+            int: 本次写入索引的实验数
+        """
+
+        if rebuild:
+            self.path.unlink(missing_ok=True)
+        conn = self._connect()
+        try:
+            indexed = dict(conn.execute("SELECT run, mtime_ns FROM runs"))
+            count = 0
+            for run_dir in find_runs(self.log_dir):
+                run = run_dir.relative_to(self.log_dir).as_posix()
+                mtime_ns = (run_dir / DECISION_LOG_FILE).stat().st_mtime_ns
+                if indexed.get(run) == mtime_ns:
+                    continue
+                if self.index_run(run_dir, conn):
+                    count += 1
+        finally:
+            conn.close()
+        logger.info("索引已更新: %d 个实验 -> %s", count, self.path)
+        return count
+
+    def query(
+        self, sql: str, params: tuple | dict = ()
+    ) -> tuple[list[str], list[tuple]]:
+        """
+        只读查询
+
+        以只读方式打开数据库，并且只允许读取操作，最多返回 MAX_QUERY_ROWS 行，
+        执行超过 QUERY_TIMEOUT 秒时中止
+
+        Args:
+            sql (str): SQL 语句
+            params (tuple | dict, optional): 参数. Defaults to ().
+
+        Returns:
+            tuple[list[str], list[tuple]]: (列名, 行)
+
+        Raises:
+            sqlite3.Error: SQL 错误、不允许的操作或查询超时
+        """
+
+        if not self.path.is_file():
+            return [], []
+        conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            conn.set_authorizer(
+                lambda action, *_: (
+                    sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY
+                )
+            )
+            deadline = time.monotonic() + QUERY_TIMEOUT
+            # 返回非0值时 SQLite 中止当前语句
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, _PROGRESS_STEPS)
+            try:
+                cursor = conn.execute(sql, params)
+                columns = [desc[0] for desc in cursor.description or ()]
+                return columns, cursor.fetchmany(MAX_QUERY_ROWS)
+            except sqlite3.OperationalError:
+                if time.monotonic() > deadline:
+                    raise sqlite3.OperationalError(f"查询超过 {QUERY_TIMEOUT} 秒，已中止")
+                raise
+        finally:
+            conn.close()
+
+    def runs(self) -> tuple[list[str], list[tuple]]:
+        """
+        列出已索引的实验
+        """
+
+        return self.query(
+            "SELECT run, lab_exp_name, started, num_rounds, num_devices, indexed_at"
+            " FROM runs ORDER BY lab_exp_name, started"
+        )
+
+    def decision_rate(
+        self, lab_exp_name: str = None, role: str = None, decision: str = None
+    ) -> tuple[list[str], list[tuple]]:
+        """
+        统计各实验、组别、角色的决策比例
+
+        Args:
+            lab_exp_name (str, optional): 只统计该实验. Defaults to None.
+            role (str, optional): 只统计该角色. Defaults to None.
+            decision (str, optional): 只返回该决策. Defaults to None.
+
+        Returns:
+            tuple[list[str], list[tuple]]: (列名, 行)
+        """
+
+        return self.query(
+            """
+            SELECT * FROM (
+                SELECT r.lab_exp_name, d.group_name, d.role, d.decision,
+                       COUNT(*) AS num,
+                       ROUND(1.0 * COUNT(*) / SUM(COUNT(*)) OVER (
+                           PARTITION BY r.lab_exp_name, d.group_name, d.role), 4) AS rate,
+                       COUNT(DISTINCT r.id) AS num_runs
+                FROM decisions d JOIN runs r ON r.id = d.run_id
+                WHERE (:exp IS NULL OR r.lab_exp_name = :exp)
+                  AND (:role IS NULL OR d.role = :role)
+                GROUP BY r.lab_exp_name, d.group_name, d.role, d.decision
+            )
+            WHERE :decision IS NULL OR decision = :decision
+            ORDER BY lab_exp_name, group_name, role, decision
+            """,
+            {"exp": lab_exp_name, "role": role, "decision": decision},
+        )
+
+
+def _print_table(columns: list[str], rows: list[tuple]):
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+
+
+__all__ = ["LogIndex", "INDEX_FILE", "MAX_QUERY_ROWS", "QUERY_TIMEOUT"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="实验 log 索引")
+    parser.add_argument("--log-dir", default=str(DEFAULT_LOG_DIR), help="log 根目录")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("update", help="增量更新索引")
+    sub.add_parser("rebuild", help="重建索引")
+    sub.add_parser("runs", help="列出已索引的实验")
+    rate = sub.add_parser("rate", help="决策比例")
+    rate.add_argument("--exp", help="实验名称")
+    rate.add_argument("--role", help="角色")
+    rate.add_argument("--decision", help="决策")
+    sql = sub.add_parser("sql", help="只读 SQL 查询")
+    sql.add_argument("sql")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    index = LogIndex(Path(args.log_dir))
+    match args.command:
+        case "update" | "rebuild":
+            index.update(rebuild=args.command == "rebuild")
+        case "runs":
+            _print_table(*index.runs())
+        case "rate":
+            _print_table(*index.decision_rate(args.exp, args.role, args.decision))
+        case "sql":
+            _print_table(*index.query(args.sql))
@@ -1,18 +1,30 @@
 from contextlib import asynccontextmanager
 import logging
-from pathlib import Path
-
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, HTMLResponse
+import sqlite3
+
+from fastapi import (
+    FastAPI,
+    Header,
+    HTTPException,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import HTMLResponse
 from pydantic import ValidationError
 
 from cfg_parser import *
 from context import Context
+from event_log import shutdown_logging
+from log_index import LogIndex
+from metrics import CONTENT_TYPE, REGISTRY, VALIDATION_ERRORS
 from model.cfg import *
-from model.message import SocketMessage
+from model.message import CMD, SocketMessage
+from protocol import parse_connect_session
+from session import ExperimentSession
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
+# 日志由 context.init 按应用配置设置
 logger = logging.getLogger(__name__)
 
 
@@ -24,12 +36,14 @@ async def lifespan(app: FastAPI):
     # 启动之前的工作
     try:
         context.init()
+        await context.resume()
     except Exception as e:
-        print(f"配置加载错误: {str(e)}")
+        logger.error("配置加载错误: %s", e)
         raise
     yield
     # 结束后的工作
-    print("应用关闭")
+    logger.info("应用关闭")
+    shutdown_logging()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -42,63 +56,134 @@ async def root():
     return HTMLResponse(html_content)
 
 
-@app.get("/images/{image_name}")
-async def get_image(image_name: str, t: str = None):
-    # 构建图片文件的绝对路径
-    logger.info(f"Image name: {image_name}")
-    assets_dir = (
-        Path(__file__).parent.parent / "assets" / context.exp_config.hint_pics_path
-    )
-    image_path = assets_dir / image_name
-    logger.info(f"Image path: {image_path}")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+"""带内容哈希的图片URL内容不会变化，客户端可长期缓存"""
 
-    # 检查文件是否存在
-    if not image_path.exists():
-        raise HTTPException(status_code=404, detail="图片文件不存在")
+REVALIDATE_CACHE_CONTROL = "no-cache"
+"""不带内容哈希（或哈希已过期）的请求，客户端需用ETag重新验证"""
 
-    # 检查是否是文件
-    if not image_path.is_file():
-        raise HTTPException(status_code=400, detail="路径不是有效的文件")
 
-    # 确定媒体类型
-    ext = image_name.lower().split(".")[-1]
-    media_types = {
-        "jpg": "image/jpeg",
-        "jpeg": "image/jpeg",
-        "png": "image/png",
-        "gif": "image/gif",
-        "svg": "image/svg+xml",
-    }
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
 
-    media_type = media_types.get(ext)
-    if not media_type:
+
+@app.get("/images/{image_name}")
+async def get_image(
+    image_name: str,
+    v: str = None,
+    t: str = None,
+    w: int = None,
+    session: str = None,
+    accept: str = Header(default=None),
+    if_none_match: str = Header(default=None),
+):
+    exp_session = context.sessions.get(session)
+    if exp_session is None:
+        raise HTTPException(status_code=404, detail=f"实验场次不存在: {session}")
+    image_store = exp_session.image_store
+
+    # 确定媒体类型
+    if image_store.media_type(image_name) is None:
+        ext = image_name.lower().split(".")[-1]
         raise HTTPException(status_code=400, detail=f"不支持的图片格式: {ext}")
 
-    return FileResponse(
-        str(image_path),
-        media_type=media_type,
-        headers={
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0",
-        },
+    # 图片在启动时已预加载到内存
+    image = image_store.get(image_name)
+    if image is None:
+        raise HTTPException(status_code=404, detail="图片文件不存在")
+
+    # 根据客户端请求的宽度(w)和Accept头选择预生成的缩放/WebP版本
+    selected = image.select(w, accept)
+    headers = {
+        "ETag": selected.etag,
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL if v == image.digest else REVALIDATE_CACHE_CONTROL
+        ),
+        "Vary": "Accept",
+    }
+    if _etag_matches(if_none_match, selected.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=selected.content, media_type=selected.media_type, headers=headers
     )
 
 
+def _index_result(columns: list[str], rows: list[tuple]) -> dict:
+    return {"columns": columns, "rows": rows}
+
+
+@app.get("/index/runs")
+def index_runs():
+    return _index_result(*LogIndex().runs())
+
+
+@app.get("/index/decision_rate")
+def index_decision_rate(exp: str = None, role: str = None, decision: str = None):
+    return _index_result(*LogIndex().decision_rate(exp, role, decision))
+
+
+@app.get("/index/query")
+def index_query(sql: str):
+    # 只读查询，写操作会被拒绝
+    try:
+        return _index_result(*LogIndex().query(sql))
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=400, detail=f"查询错误: {e}")
+
+
+@app.get("/metrics")
+async def metrics():
+    # 在事件循环线程中采集，与记录指标的代码不会并发
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await context.connection_manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, session: str = None):
+    exp_session = context.sessions.get(session)
+    if exp_session is None:
+        logger.warning("实验场次不存在: %s", session)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await exp_session.connection_manager.connect(websocket)
     try:
         while True:
             try:
                 json_data = await websocket.receive_text()
                 message = SocketMessage.model_validate_json(json_data)
-                await context.experiment_manager.parse_message(message, websocket)
+                if message.cmd == CMD.CONNECT:
+                    # CONNECT 消息中也可以指定实验场次
+                    exp_session = _switch_session(exp_session, message, websocket)
+                await exp_session.experiment_manager.parse_message(message, websocket)
             except ValidationError as e:
-                print(f"消息格式错误: {str(e)}")
+                logger.warning("消息格式错误: %s", e)
+                VALIDATION_ERRORS.labels(exp_session.session_id).inc()
                 continue
     except WebSocketDisconnect:
-        context.connection_manager.disconnect(websocket)
+        pass
+    finally:
+        # 任何原因退出都要停止发送任务，并让座位可以被标记为断开/回收
+        exp_session.connection_manager.disconnect(websocket)
+        exp_session.experiment_manager.handle_disconnect(websocket)
+
+
+def _switch_session(
+    exp_session: ExperimentSession, message: SocketMessage, websocket: WebSocket
+) -> ExperimentSession:
+    session_id = parse_connect_session(message.data)
+    if session_id is None or session_id == exp_session.session_id:
+        return exp_session
+    target = context.sessions.get(session_id)
+    if target is None:
+        logger.warning(
+            "实验场次不存在: %s，继续使用场次 %s", session_id, exp_session.session_id
+        )
+        return exp_session
+    exp_session.connection_manager.disconnect(websocket)
+    target.connection_manager.register(websocket)
+    return target
 
 
 if __name__ == "__main__":
@@ -1,48 +1,342 @@
+import asyncio
+import collections
 import copy
+import hashlib
 import json
+import logging
 import time
 import typing
 import uuid
+from pathlib import Path
 
 from fastapi import WebSocket
 
 from algorithm.base_algo import BaseAlgorithm
-from model.cfg import LabExpConfig, MainRoundConfig, SubRoundConfig
+from checkpoint import Checkpoint
+from decision_log import DecisionLog
+from delta import DeltaEncoder
+from image_store import ImageStore
+from log_index import LogIndex
+from metrics import (
+    ALGORITHM_PROCESS_SECONDS,
+    CONNECTED_SOCKETS,
+    DEFAULT_SESSION_LABEL,
+    DROPPED_FRAMES,
+    MESSAGE_LOG_ENTRIES,
+    PAYLOAD_BYTES,
+    PENDING_SUBMISSIONS,
+    RECONNECTS,
+    ROUND_TRANSITION_SECONDS,
+    SEND_SECONDS,
+    WIRE_BYTES,
+)
+from model.cfg import LabExpConfig
 from model.message import (
     CMD,
     DecisionMessage,
     ExperimentInfo,
     ExperimentStatus,
-    Image,
-    Info,
     Options,
     SocketMessage,
+    SyncMessage,
+)
+from protocol import (
+    PROTOCOL_V1,
+    PROTOCOL_V3,
+    EntryCache,
+    Frame,
+    FrameCache,
+    FrameTemplate,
+    parse_connect,
+    parse_connect_encoding,
+)
+from role_allocator import RoleAllocator
+from round_log import (
+    RoundLogWriter,
+    encode_round_record,
+    finalize_round_log,
+    repair_round_log,
 )
-from utils.json_to_file import save_str_to_json
+from schedule import RoundPlan, Schedule
+from transport import (
+    ENCODING_DEFLATE,
+    ENCODING_JSON,
+    ENCODING_MSGPACK,
+    PROTOCOL_STRINGS,
+    Codec,
+    StringTable,
+    make_codecs,
+    negotiate_encoding,
+)
+
+logger = logging.getLogger(__name__)
+
+_DROPPED_COALESCED = DROPPED_FRAMES.labels("coalesced")
+_DROPPED_OVERFLOW = DROPPED_FRAMES.labels("overflow")
+
+
+class Outbox:
+    """
+    单个连接的发送队列
+
+    队列有长度上限，由独立的发送任务按顺序写入 websocket，生产者只入队不等待网络 I/O。
+    可合并的帧（UPDATE_EXPERIMENT_INFO，只有最新的实验状态有意义）入队时会替换队列中尚未发送的旧帧。
+    设置了传输编码时消息在入队时编码（编码结果由所有连接共用），二进制结果以 binary 帧发送。
+    """
+
+    def __init__(self, websocket: WebSocket, max_depth: int, timeout: float):
+        self.websocket = websocket
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.queue: collections.deque[list] = collections.deque()
+        """待发送的帧 [编码后的消息, 是否可合并, 发送结果future, 编码前的 JSON 字节数]"""
+
+        self.codec: Codec = None
+        """协商的传输编码，None 时直接发送文本"""
+
+        self.payload_bytes = 0
+        """发送成功的消息编码前的 JSON 字节数（仅统计设置了传输编码之后的消息）"""
+
+        self.wire_bytes = 0
+        """发送成功的消息编码后的字节数（仅统计设置了传输编码之后的消息）"""
+
+        self.sent = 0
+        """发送成功帧数"""
+
+        self.failed = 0
+        """发送失败（超时或连接异常）帧数"""
+
+        self.dropped = 0
+        """被合并或因队列已满而丢弃的帧数"""
+
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._drain())
+
+    @property
+    def depth(self) -> int:
+        """当前队列长度"""
+        return len(self.queue)
+
+    def set_codec(self, codec: Codec):
+        """
+        设置传输编码，之后入队的消息按该编码发送
+
+        Args:
+            codec (Codec): 传输编码
+        """
+
+        self.codec = codec
+        self._payload_bytes = PAYLOAD_BYTES.labels(codec.name)
+        self._wire_bytes = WIRE_BYTES.labels(codec.name)
+
+    def put(self, message: str, coalesce: bool = False) -> asyncio.Future:
+        """
+        消息入队
+
+        Args:
+            message (str): 消息
+            coalesce (bool, optional): 是否可与队列中尚未发送的可合并帧合并. Defaults to False.
+
+        Returns:
+            asyncio.Future: 发送结果，发送成功为 True；被合并的帧与替换它的帧共用同一个 future
+        """
+
+        future = None
+        if coalesce:
+            for item in self.queue:
+                if item[1]:
+                    # 旧帧已过时，移除并沿用其 future
+                    self.queue.remove(item)
+                    future = item[2]
+                    self.dropped += 1
+                    _DROPPED_COALESCED.inc()
+                    break
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+        if len(self.queue) >= self.max_depth:
+            oldest = self.queue.popleft()[2]
+            self.dropped += 1
+            _DROPPED_OVERFLOW.inc()
+            if not oldest.done():
+                oldest.set_result(False)
+        if self.codec is None:
+            self.queue.append([message, coalesce, future, None])
+        else:
+            payload, size = self.codec.encode(message)
+            self.queue.append([payload, coalesce, future, size])
+        self._wakeup.set()
+        return future
+
+    def stats(self) -> dict[str, typing.Any]:
+        """
+        获取队列统计信息
+
+        Returns:
+            dict[str, Any]: 连接地址、队列长度、发送/失败/丢弃帧数、传输编码和编码前后的字节数
+        """
+
+        return {
+            "client": str(self.websocket.client),
+            "depth": self.depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "encoding": None if self.codec is None else self.codec.name,
+            "payload_bytes": self.payload_bytes,
+            "wire_bytes": self.wire_bytes,
+        }
+
+    def close(self):
+        """
+        停止发送任务，未发送的帧结果置为 False
+        """
+
+        self._task.cancel()
+        while self.queue:
+            future = self.queue.popleft()[2]
+            if not future.done():
+                future.set_result(False)
+
+    async def _drain(self):
+        while True:
+            while not self.queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            payload, _, future, size = self.queue.popleft()
+            binary = isinstance(payload, bytes)
+            ok = False
+            start = time.perf_counter()
+            try:
+                if binary:
+                    await asyncio.wait_for(self.websocket.send_bytes(payload), self.timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(payload), self.timeout)
+                ok = True
+                self.sent += 1
+                SEND_SECONDS.observe(time.perf_counter() - start)
+                if size is not None:
+                    wire = len(payload) if binary else size
+                    self.payload_bytes += size
+                    self.wire_bytes += wire
+                    self._payload_bytes.inc(size)
+                    self._wire_bytes.inc(wire)
+            except asyncio.TimeoutError:
+                self.failed += 1
+                logger.warning("消息发送超时: %s", self.websocket.client)
+            except asyncio.CancelledError:
+                future.set_result(False)
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning("消息发送失败: %s, %r", self.websocket.client, e)
+            if not future.done():
+                future.set_result(ok)
 
 
 class ConnectionManager:
+    SEND_TIMEOUT = 5.0
+    """单个连接发送消息的超时时间（秒）"""
+
+    MAX_QUEUE_DEPTH = 32
+    """单个连接发送队列的长度上限"""
+
     def __init__(self):
-        self.active_connections: set[WebSocket] = set()
+        self.active_connections: dict[WebSocket, Outbox] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.add(websocket)
+        self.register(websocket)
+
+    def register(self, websocket: WebSocket):
+        """
+        登记已建立的连接（例如从其他实验场次转移过来的连接）
+        """
+
+        self.active_connections[websocket] = Outbox(
+            websocket, self.MAX_QUEUE_DEPTH, self.SEND_TIMEOUT
+        )
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        outbox = self.active_connections.pop(websocket, None)
+        if outbox is not None:
+            outbox.close()
 
-    async def send_message(self, message: str, websocket: WebSocket):
-        if websocket in self.active_connections:
-            await websocket.send_text(message)
+    def set_codec(self, websocket: WebSocket, codec: Codec):
+        """
+        设置连接协商的传输编码，之后发送的消息按该编码发送
 
-    async def send_json(self, message: typing.Any, websocket: WebSocket):
-        if websocket in self.active_connections:
-            await websocket.send_json(message)
+        Args:
+            websocket (WebSocket): 连接
+            codec (Codec): 传输编码
+        """
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        outbox = self.active_connections.get(websocket)
+        if outbox is not None:
+            outbox.set_codec(codec)
+
+    def send_message(
+        self, message: str, websocket: WebSocket, coalesce: bool = False
+    ) -> asyncio.Future:
+        """
+        向单个连接发送消息（仅入队，不等待网络 I/O）
+
+        Args:
+            message (str): 消息
+            websocket (WebSocket): 连接
+            coalesce (bool, optional): 是否可与尚未发送的旧帧合并. Defaults to False.
+
+        Returns:
+            asyncio.Future: 发送结果，连接已断开时为 None
+        """
+
+        outbox = self.active_connections.get(websocket)
+        if outbox is None:
+            return None
+        return outbox.put(message, coalesce)
+
+    def send_json(self, message: typing.Any, websocket: WebSocket) -> asyncio.Future:
+        return self.send_message(
+            json.dumps(message, ensure_ascii=False, separators=(",", ":")), websocket
+        )
+
+    def broadcast(
+        self, message: str, coalesce: bool = False
+    ) -> dict[WebSocket, asyncio.Future]:
+        return self.fan_out(
+            {connection: (connection, message) for connection in self.active_connections},
+            coalesce,
+        )
+
+    def fan_out(
+        self,
+        messages: dict[typing.Hashable, tuple[WebSocket, str]],
+        coalesce: bool = False,
+    ) -> dict[typing.Hashable, asyncio.Future]:
+        """
+        向多个连接发送消息，每个连接由各自的发送任务并发写出，单独超时，互不阻塞
+
+        Args:
+            messages (dict[Hashable, tuple[WebSocket, str]]): 接收方标识 -> (连接, 消息)
+            coalesce (bool, optional): 是否可与尚未发送的旧帧合并. Defaults to False.
+
+        Returns:
+            dict[Hashable, asyncio.Future]: 接收方标识 -> 发送结果，连接已断开时为 None
+        """
+
+        return {
+            key: self.send_message(message, websocket, coalesce)
+            for key, (websocket, message) in messages.items()
+        }
+
+    def stats(self) -> list[dict[str, typing.Any]]:
+        """
+        获取所有连接的发送队列统计信息
+
+        Returns:
+            list[dict[str, Any]]: 每个连接的队列长度、发送/失败/丢弃帧数、传输编码和字节数
+        """
+
+        return [outbox.stats() for outbox in self.active_connections.values()]
 
 
 class ExperimentManager:
@@ -53,26 +347,45 @@ class ExperimentManager:
         algorithm: BaseAlgorithm,
         local_ip: str,
         port: int,
+        image_store: ImageStore = None,
+        session_id: str = None,
     ):
-        self._exp_pending_msg = SocketMessage(
-            cmd=CMD.UPDATE_EXPERIMENT_INFO,
-            data=ExperimentInfo(
+        self._exp_pending_msg = Frame(
+            CMD.UPDATE_EXPERIMENT_INFO,
+            ExperimentInfo(
                 infos=[],
                 images=[],
                 options=Options(options=[]),
                 expStatus=ExperimentStatus.PENDING,
-            ).model_dump_json(),
-        ).model_dump_json()
+            ).model_dump(mode="json"),
+        )
 
-        self._exp_end_msg = SocketMessage(
-            cmd=CMD.UPDATE_EXPERIMENT_INFO,
-            data=ExperimentInfo(
+        self._exp_end_msg = Frame(
+            CMD.UPDATE_EXPERIMENT_INFO,
+            ExperimentInfo(
                 infos=[],
                 images=[],
                 options=Options(options=[]),
                 expStatus=ExperimentStatus.END,
-            ).model_dump_json(),
-        ).model_dump_json()
+            ).model_dump(mode="json"),
+        )
+
+        self._frame_cache = FrameCache()
+        """当前回合的帧缓存，内容相同的消息只构造和编码一次"""
+
+        self._templates: dict[tuple, FrameTemplate] = {}
+        """当前回合每个组别角色的消息模板，与帧缓存同时清空"""
+
+        self._info_entries = EntryCache(lambda item: {"hint": item[0], "value": item[1]})
+        """当前回合算法返回的 (hint, value) -> 信息条目，与帧缓存同时清空"""
+
+        self._image_entries = EntryCache(
+            lambda name: {"imageUrl": self._generate_pic_url(name)}
+        )
+        """当前回合图片名称 -> 图片条目，与帧缓存同时清空"""
+
+        self._delta = DeltaEncoder()
+        """协议v3的增量编码器，与帧缓存同时清空"""
 
         self.connection_manager = connection_manager
         self.cur_main_round = 0
@@ -88,40 +401,31 @@ class ExperimentManager:
         value: 设备信息
         {
             "uuid": {
-                "cur_message": str, # 保存的本设备当前回合的消息
+                "cur_message": Frame, # 保存的本设备当前回合的消息
                 "role": (str, str), # 设备的角色 (组别, 角色)
                 "websocket": WebSocket, # 设备的websocket连接对象
+                "version": int, # 设备协商的通信协议版本
+                "state": (Frame, int), # 协议v3：最后发送给设备的 (帧, 状态版本)，None 时下次发送完整快照
+                "encoding": str, # 设备协商的传输编码
             },
         }
         """
 
-        self.exp_message_logs = []
+        self._cur_message_log = {}
         """
-        维护所有回合的消息日志
+        当前回合的消息日志，回合结束时与提交信息一起写入回合日志
 
-        列表结构
-        [
-            # 第1回合
-            {
-                "uuid1": {
-                    "message": str, # 保存的本设备当前回合的消息
-                },
-                "uuid2": {
-                    "message": str, # 保存的本设备当前回合的消息
-                },
-            },
-            # 第2回合
-            {
-                "uuid1": {
-                    "message": str, # 保存的本设备当前回合的消息
-                },
-                "uuid2": {
-                    "message": str, # 保存的本设备当前回合的消息
-                },
+        字典结构
+        {
+            "uuid1": {
+                "message": Frame, # 保存的本设备当前回合的消息
             },
-        ]
+        }
         """
 
+        self.round_log: RoundLogWriter = None
+        """回合日志写入器，第一个回合结束时创建"""
+
         self.submit_logs = []
         """
         维护所有回合的提交日志
@@ -154,9 +458,14 @@ class ExperimentManager:
         ]
         """
 
-        self.cur_round_participants = set[str]()
+        self.decision_log = DecisionLog(exp_cfg)
+        """
+        与 submit_logs 同步维护的列式决策日志，用于向量化统计
         """
-        维护当前回合的实验参与人员
+
+        self.cur_round_participants: frozenset[str] = frozenset()
+        """
+        维护当前回合的实验参与人员（与 schedule 预先算出的集合共用，不要修改）
             {uuid1, uuid2, ...}
         """
 
@@ -174,15 +483,70 @@ class ExperimentManager:
             },
         }
         """
-        self.main_rounds = self._flatten_main_rounds()
+        self.schedule = Schedule(exp_cfg)
+        """编译后的实验安排"""
+        self.main_rounds = self.schedule.main_rounds
+        self._round_participants: tuple[frozenset[str], ...] = None
+        """每个小回合的参与者，设备到齐后第一次开始回合时计算"""
+        self.allocator = RoleAllocator(
+            self.schedule.slots, exp_cfg.role_policy, exp_cfg.slot_reclaim_timeout
+        )
+        """角色座位表"""
+        self._device_sockets: dict[WebSocket, str] = {}
+        """连接 -> 设备uuid，用于处理断开"""
         self.algorithm = algorithm
         self.algorithm.experiment_devices = (
             self.experiment_devices
         )  # 让算法类能访问所有人的组别信息
+        self.algorithm.decision_log = self.decision_log
+        self.string_table = StringTable(self._table_strings())
+        """传输编码的字符串表"""
+        self._codecs = make_codecs(self.string_table)
+        """传输编码名称 -> 编码，编码缓存与帧缓存同时清空"""
         self._refresh_sub_rounds_list()
         self.local_ip = local_ip
         self.port = port
-        print(f"总实验人数: {self._total_participants_num()}")
+        self.image_store = image_store if image_store is not None else ImageStore()
+        self.session_id = session_id
+        """实验场次id，默认场次为 None"""
+        self.checkpoint = Checkpoint(self._checkpoint_dir())
+        """实验状态检查点，服务重启后用于恢复实验"""
+        self._finished = False
+        """实验是否已结束"""
+        self._init_metrics()
+        logger.info("总实验人数: %d", self._total_participants_num())
+
+    def _init_metrics(self):
+        """
+        绑定本场次的运行指标，Gauge 在采集时才读取当前状态
+        """
+
+        label = self.session_id if self.session_id is not None else DEFAULT_SESSION_LABEL
+        self._process_seconds = ALGORITHM_PROCESS_SECONDS.labels(label)
+        self._transition_seconds = ROUND_TRANSITION_SECONDS.labels(label)
+        self._reconnects = RECONNECTS.labels(label)
+        CONNECTED_SOCKETS.labels(label).set_function(
+            lambda: len(self.connection_manager.active_connections)
+        )
+        PENDING_SUBMISSIONS.labels(label).set_function(
+            lambda: 0
+            if self._finished
+            else len(self.cur_round_participants) - len(self.cur_round_submit_devices)
+        )
+        MESSAGE_LOG_ENTRIES.labels(label).set_function(lambda: len(self._cur_message_log))
+
+    def _table_strings(self) -> typing.Iterator[str]:
+        """
+        字符串表的内容：协议字段和状态、组别和角色名称、决策选项、算法声明的信息标签
+        """
+
+        yield from PROTOCOL_STRINGS
+        for slot in self.schedule.slots:
+            yield slot.group
+            yield slot.role
+        for plan in self.schedule.rounds:
+            yield from plan.options
+        yield from self.algorithm.string_table
 
     def _next_round(self) -> int:
         """
@@ -192,74 +556,54 @@ class ExperimentManager:
             int: 切换状态 0 成功，-1 已经是最后一个回合了
         """
 
-        self.cur_sub_round += 1
-        if self.cur_sub_round >= len(self.sub_rounds):
-            if self.cur_main_round + 1 >= len(self.main_rounds):
-                self.cur_sub_round -= 1  # 恢复子回合数，避免溢出
-                return -1
-            self.cur_sub_round = 0
-            self.cur_main_round += 1
+        index = self._cur_round().index + 1
+        if index >= len(self.schedule):
+            return -1
+        plan = self.schedule.rounds[index]
+        if plan.main_round != self.cur_main_round:
+            self.cur_main_round = plan.main_round
             self._refresh_sub_rounds_list()
+        self.cur_sub_round = plan.sub_round
         return 1
 
-    def _total_participants_num(self) -> int:
+    def _cur_round(self) -> RoundPlan:
         """
-        获取总实验人数
+        获取当前小回合
 
         Returns:
-            int: 总实验人数
+            RoundPlan: 当前小回合
         """
 
-        size = 0
-        for group in self.exp_cfg.groups:
-            for role in group.roles:
-                size += role.num
-        return size
+        return self.schedule.round(self.cur_main_round, self.cur_sub_round)
 
-    def _flatten_main_rounds(self) -> list[MainRoundConfig]:
+    def _total_participants_num(self) -> int:
         """
-        展平主回合列表
+        获取总实验人数
 
         Returns:
-            list[MainRoundConfig]: 展平后的主回合列表
+            int: 总实验人数
         """
 
-        main_rounds = []
-        for main_round in self.exp_cfg.main_rounds:
-            for _ in range(main_round.repeat):
-                main_rounds.append(main_round)
-        return main_rounds
+        return self.schedule.total_participants
 
     def _refresh_sub_rounds_list(self):
         """
         刷新当前大回合的小回合列表
         """
 
-        self.sub_rounds = list[SubRoundConfig]()
-        for sub_round in self.main_rounds[self.cur_main_round].sub_rounds:
-            for _ in range(sub_round.repeat):
-                self.sub_rounds.append(sub_round)
-
+        self.sub_rounds = self.schedule.sub_rounds(self.cur_main_round)
         self.algorithm.sub_rounds = self.sub_rounds
 
     def _init_cur_round_participants(self):
         """
         初始化当前回合的实验参与人员
 
+        设备到齐后角色不再变化，第一次调用时为全部小回合预先算出参与者，之后只按下标取出
         """
-        self.cur_round_participants.clear()
-        round = self.sub_rounds[self.cur_sub_round]
-        makers = round.decision.makers
-        # makers 为空，所有设备都参与
-        if makers is None:
-            self.cur_round_participants.update(self.experiment_devices.keys())
-            return
-        for uuid, value in self.experiment_devices.items():
-            for maker in makers:
-                if maker.groups is None or value["role"][0] in maker.groups:
-                    if maker.roles is None or value["role"][1] in maker.roles:
-                        self.cur_round_participants.add(uuid)
-        print(f"本回合参与人: {self.cur_round_participants}")
+        if self._round_participants is None:
+            self._round_participants = self.schedule.bind(self.experiment_devices)
+        self.cur_round_participants = self._round_participants[self._cur_round().index]
+        logger.debug("本回合参与人: %s", self.cur_round_participants)
 
     def _get_cur_participants_num(self) -> int:
         """
@@ -269,13 +613,7 @@ class ExperimentManager:
             int: 当前小回合的实验决策人数
         """
 
-        round = self.sub_rounds[self.cur_sub_round]
-        makers = round.decision.makers
-        num = 0
-        for maker in makers:
-            num += self._get_group_roles_num(groups=maker.groups, roles=maker.roles)
-
-        return num
+        return self._cur_round().num_participants
 
     def _get_group_roles_num(
         self, groups: list[str] = None, roles: list[str] = None
@@ -290,13 +628,7 @@ class ExperimentManager:
         Returns:
             int: 组别角色实验人数
         """
-        num = 0
-        for group in self.exp_cfg.groups:
-            if groups is None or group.name in groups:
-                for role in group.roles:
-                    if roles is None or role.name in roles:
-                        num += role.num
-        return num
+        return self.schedule.group_roles_num(groups, roles)
 
     def _generate_uuid(self) -> str:
         """
@@ -320,22 +652,75 @@ class ExperimentManager:
 
         return uuid in self.experiment_devices
 
-    def _assign_role(self) -> tuple[str, str]:
+    def _experiment_started(self) -> bool:
+        """
+        实验是否已开始（已有回合参与者）
+        """
+
+        return bool(self.cur_round_participants)
+
+    def _acquire_seat(self) -> int | None:
+        """
+        取出一个空座位（按 role_policy 的顺序）；座位已满且实验未开始时回收断开超时的设备的座位
+
+        Returns:
+            int | None: 座位号，没有可用座位时返回 None
+        """
+
+        seat = self.allocator.acquire()
+        if seat is None and not self._experiment_started():
+            ghost = next(self.allocator.reclaimable(), None)
+            if ghost is not None:
+                logger.info(
+                    "设备断开超过 %s 秒未重连, 回收其座位 uuid: %s, 角色: %s",
+                    self.allocator.reclaim_timeout,
+                    ghost,
+                    self.experiment_devices[ghost]["role"],
+                )
+                self.allocator.release(ghost)
+                del self.experiment_devices[ghost]
+                seat = self.allocator.acquire()
+        return seat
+
+    def handle_disconnect(self, websocket: WebSocket):
+        """
+        处理连接断开，实验开始前断开的设备在超时后可以被新设备替换
+
+        Args:
+            websocket (WebSocket): 断开的连接
+        """
+
+        uuid = self._device_sockets.pop(websocket, None)
+        if uuid is None:
+            return
+        device = self.experiment_devices.get(uuid)
+        if device is None or device["websocket"] is not websocket:
+            # 设备已经用新连接重连
+            return
+        if not self._experiment_started():
+            logger.info("实验开始前设备断开 uuid: %s", uuid)
+            self.allocator.mark_disconnected(uuid)
+
+    async def _start_if_ready(self) -> bool:
         """
-        分配角色（顺序分配）
+        座位全部分配且所有设备在线时开始实验
 
         Returns:
-            (str, str): 角色分组, 角色描述
+            bool: 是否开始了实验
         """
 
-        cur_devices_num = len(self.experiment_devices)
-        num = 0
-        for group in self.exp_cfg.groups:
-            for role in group.roles:
-                if num + role.num > cur_devices_num:
-                    return (group.name, role.name)
-                num += role.num
-        return ()
+        if self._experiment_started() or not self.allocator.ready:
+            return False
+        logger.info("实验人数已足够, 开始实验")
+
+        # 初始化当前回合参与人
+        self._init_cur_round_participants()
+
+        # 为每个参与人生成独立的 process_result
+        process_result_map = self._process_cur_round()
+
+        await self._start_cur_round(process_result_map)
+        return True
 
     async def _handle_connect(self, websocket: WebSocket, data: str):
         """
@@ -343,60 +728,122 @@ class ExperimentManager:
 
         Args:
             websocket (WebSocket): 当前客户端
-            data (str): 连接数据
+            data (str | dict): 连接数据，旧版客户端为设备uuid，新版客户端为 {"uuid": str, "version": int}
         """
 
-        if self._is_reconnect(data):
+        device_uuid, version = parse_connect(data)
+        encoding, table = ENCODING_JSON, None
+        if version > PROTOCOL_V1:
+            requested, table = parse_connect_encoding(data)
+            encoding = negotiate_encoding(requested)
+        # CONNECT 的回复总是 JSON 文本，之后的消息按协商的编码发送
+        self.connection_manager.set_codec(websocket, self._codecs[ENCODING_JSON])
+        if self._is_reconnect(device_uuid):
             # 设备重连的时候下发设备当前实验信息
-            print(f"设备重连 uuid: {data}")
-            self.experiment_devices[data]["websocket"] = websocket
-            if "cur_message" in self.experiment_devices[data]:
-                await self.connection_manager.send_message(
-                    self.experiment_devices[data]["cur_message"],
+            logger.info("设备重连 uuid: %s, 协议版本: %s", device_uuid, version)
+            self._reconnects.inc()
+            device = self.experiment_devices[device_uuid]
+            device["websocket"] = websocket
+            device["version"] = version
+            device["encoding"] = encoding
+            self._device_sockets[websocket] = device_uuid
+            if encoding != ENCODING_JSON:
+                # 重连的客户端需要知道新连接的编码和解码所需的字典/字符串表
+                self.connection_manager.send_message(
+                    self._connect_message(device_uuid, version, encoding, table).encode(version),
                     websocket,
                 )
+                self.connection_manager.set_codec(websocket, self._codecs[encoding])
+            self.allocator.mark_connected(device_uuid)
+            # 重连后客户端的状态未知，协议v3发送完整快照
+            device["state"] = None
+            if "cur_message" in device:
+                self._send_info(device, device["cur_message"])
+            if await self._start_if_ready():
+                self._save_checkpoint()
             return
         else:
-            role = self._assign_role()
-            if role == ():
-                print(
-                    f"实验人数已足够, 当前实验所需人数: {self._total_participants_num()}, 当前连接人数: {len(self.experiment_devices)}"
+            seat = self._acquire_seat()
+            if seat is None:
+                logger.warning(
+                    "实验人数已足够, 当前实验所需人数: %d, 当前连接人数: %d",
+                    self._total_participants_num(),
+                    len(self.experiment_devices),
                 )
                 return
             uuid = self._generate_uuid()
-            print(f"新设备连接 重新生成uuid: {uuid}")
+            logger.info("新设备连接 重新生成uuid: %s", uuid)
             self.experiment_devices[uuid] = {
                 "websocket": websocket,
-                "role": role,
+                "role": self.allocator.bind(seat, uuid),
+                "version": version,
+                "encoding": encoding,
             }
+            self._device_sockets[websocket] = uuid
 
-            await self.connection_manager.send_json(
-                SocketMessage(cmd=CMD.CONNECT, data=uuid).model_dump(),
+            self.connection_manager.send_message(
+                self._connect_message(uuid, version, encoding, table).encode(version),
                 websocket,
             )
+            self.connection_manager.set_codec(websocket, self._codecs[encoding])
 
             # 设备第一次连接先下发pending信息
             self.experiment_devices[uuid]["cur_message"] = self._exp_pending_msg
-            await self.connection_manager.send_message(self._exp_pending_msg, websocket)
+            self._send_info(self.experiment_devices[uuid], self._exp_pending_msg)
 
-            if self._total_participants_num() == len(self.experiment_devices):
-                print("实验人数已足够, 开始实验")
+            await self._start_if_ready()
+            self._save_checkpoint()
+        logger.info(
+            "当前连接设备: %d/%d", len(self.experiment_devices), self._total_participants_num()
+        )
+        logger.debug("当前连接设备信息: %s", self.experiment_devices)
 
-                # 初始化当前回合参与人
-                self._init_cur_round_participants()
+    def _connect_message(
+        self, uuid: str, version: int, encoding: str, table: str = None
+    ) -> Frame:
+        """
+        构造 CONNECT 的回复
 
-                # 为每个参与人生成独立的 process_result
-                process_result_map = {}
-                for uid in self.cur_round_participants:
-                    process_result_map[uid] = self.algorithm.process(
-                        uuid=uid,
-                        submit_logs=self.submit_logs,
-                        cur_main_round=self.cur_main_round,
-                        cur_sub_round=self.cur_sub_round,
-                    )
+        Args:
+            uuid (str): 设备uuid
+            version (int): 协商后的协议版本
+            encoding (str): 协商后的传输编码，不是 json 时带上编码名称、字符串表摘要和解码所需的字典/字符串表
+            table (str, optional): 客户端已保存的字符串表摘要，与服务端一致时不再附带字典/字符串表. Defaults to None.
 
-                await self._start_cur_round(process_result_map)
-        print(f"当前连接设备信息: {self.experiment_devices}")
+        Returns:
+            Frame: CONNECT 消息
+        """
+
+        if version == PROTOCOL_V1:
+            return Frame(CMD.CONNECT, uuid)
+        data = {"uuid": uuid, "version": version}
+        if encoding != ENCODING_JSON:
+            data["encoding"] = encoding
+            data["table"] = self.string_table.digest
+            if table != self.string_table.digest:
+                if encoding == ENCODING_DEFLATE:
+                    data["dictionary"] = self.string_table.dictionary
+                elif encoding == ENCODING_MSGPACK:
+                    data["strings"] = self.string_table.strings
+        return Frame(CMD.CONNECT, data)
+
+    def _process_cur_round(self) -> dict[str, dict[str, str]]:
+        """
+        调用算法一次性计算当前回合所有参与人的界面数据
+
+        Returns:
+            dict[str, dict[str, str]]: 每个参与者的处理结果 {uuid: process结果}
+        """
+
+        start = time.perf_counter()
+        result = self.algorithm.process_round(
+            uuids=self.cur_round_participants,
+            submit_logs=self.submit_logs,
+            cur_main_round=self.cur_main_round,
+            cur_sub_round=self.cur_sub_round,
+        )
+        self._process_seconds.observe(time.perf_counter() - start)
+        return result
 
     def _generate_pic_url(self, name: str) -> str:
         """
@@ -406,102 +853,219 @@ class ExperimentManager:
             name (str): 图片名称
 
         Returns:
-            str: 图片URL
+            str: 图片URL，图片已预加载时带上内容哈希
         """
-        return f"http://{self.local_ip}:{self.port}/images/{name}"
-
-    async def _start_cur_round(self, process_result_map: dict[str, dict[str, str]]):
+        params = []
+        digest = self.image_store.digest(name)
+        if digest is not None:
+            params.append(f"v={digest}")
+        if self.session_id is not None:
+            params.append(f"session={self.session_id}")
+        url = f"http://{self.local_ip}:{self.port}/images/{name}"
+        return f"{url}?{'&'.join(params)}" if params else url
+
+    async def _start_cur_round(
+        self, process_result_map: dict[str, dict[str, str]]
+    ) -> dict[str, asyncio.Future]:
         """
         开始当前回合 下发实验信息
 
         Args:
             process_result_map (dict[str, dict[str, str]]): 上回合处理结果，每个参与者的结果
+
+        Returns:
+            dict[str, asyncio.Future]: 每个参与者的下发结果
         """
 
         # 初始化当前回合的消息日志
         message_log = {}
-        # 下发实验信息
+        # 帧内容包含回合数，不会跨回合重复
+        self._frame_cache.clear()
+        self._templates.clear()
+        self._info_entries.clear()
+        self._image_entries.clear()
+        self._delta.clear()
+        for codec in self._codecs.values():
+            codec.clear()
         for uuid in self.cur_round_participants:
             # 获取每个人自己的界面数据
             user_result = process_result_map.get(uuid, {})
-            socketMessage = self._generate_exp_info_message(uuid, user_result)
-            self.experiment_devices[uuid][
-                "cur_message"
-            ] = socketMessage.model_dump_json()
+            frame = self._generate_exp_info_message(uuid, user_result)
+            self.experiment_devices[uuid]["cur_message"] = frame
             message_log[uuid] = {
-                "message": socketMessage.model_dump(),
+                "message": frame,
             }
-            await self.connection_manager.send_message(
-                socketMessage.model_dump_json(),
-                self.experiment_devices[uuid]["websocket"],
-            )
         # 记录当前回合的消息日志
-        self.exp_message_logs.append(message_log)
+        self._cur_message_log = message_log
+
+        # 并发下发实验信息（每个连接由各自的发送任务写出），发送失败的设备重连后会收到 cur_message
+        delivery = {
+            uuid: self._send_info(self.experiment_devices[uuid], message_log[uuid]["message"])
+            for uuid in self.cur_round_participants
+        }
+        self._report_delivery(delivery)
+        return delivery
+
+    def _send_info(self, device: dict, frame: Frame) -> asyncio.Future:
+        """
+        向设备发送实验信息消息（仅入队）
+
+        协议v1/v2发送完整消息，可与尚未发送的旧消息合并；
+        协议v3按设备的状态发送增量（没有状态时发送完整快照），增量依赖上一条消息，不能合并，
+        发送失败后清除状态，下次发送完整快照
+
+        Args:
+            device (dict): 设备信息
+            frame (Frame): 实验信息帧
+
+        Returns:
+            asyncio.Future: 发送结果，连接已断开时为 None
+        """
+
+        if device["version"] < PROTOCOL_V3:
+            return self.connection_manager.send_message(
+                frame.encode(device["version"]), device["websocket"], coalesce=True
+            )
+        message, state = self._delta.encode(device.get("state"), frame)
+        future = self.connection_manager.send_message(message, device["websocket"])
+        if future is None:
+            device["state"] = None
+            return None
+
+        def check(f: asyncio.Future):
+            if not f.result():
+                device["state"] = None
+
+        device["state"] = state
+        future.add_done_callback(check)
+        return future
 
-    def _generate_exp_info_message(
-        self, uuid, process_result: dict[str, str]
-    ) -> SocketMessage:
+    def _report_delivery(self, delivery: dict[typing.Hashable, asyncio.Future]):
+        """
+        全部发送完成后打印下发失败的设备（不阻塞当前流程）
+
+        Args:
+            delivery (dict[typing.Hashable, asyncio.Future]): 接收方标识 -> 发送结果
+        """
+
+        futures = {key: f for key, f in delivery.items() if f is not None}
+        failed = [key for key, f in delivery.items() if f is None]
+
+        def report(_):
+            failed.extend(key for key, f in futures.items() if not f.result())
+            if failed:
+                logger.warning("消息下发失败 %d/%d 台设备: %s", len(failed), len(delivery), failed)
+
+        if futures:
+            asyncio.gather(*futures.values()).add_done_callback(report)
+        else:
+            report(None)
+
+    def _observe_transition(
+        self, delivery: dict[typing.Hashable, asyncio.Future], closed_at: float
+    ):
+        """
+        全部发送完成（或失败）后记录从回合结束到下一回合消息发出的时间
+
+        Args:
+            delivery (dict[Hashable, asyncio.Future]): 接收方标识 -> 发送结果
+            closed_at (float): 回合最后一次提交的时间（time.perf_counter）
+        """
+
+        futures = [f for f in delivery.values() if f is not None]
+        if not futures:
+            self._transition_seconds.observe(time.perf_counter() - closed_at)
+            return
+        asyncio.gather(*futures).add_done_callback(
+            lambda _: self._transition_seconds.observe(time.perf_counter() - closed_at)
+        )
+
+    def _generate_exp_info_message(self, uuid, process_result: dict[str, str]) -> Frame:
         """
         生成实验信息消息
 
+        内容相同（同一回合、同一组别角色、算法结果相同）的消息共用同一个 Frame
+
         Args:
             process_result (dict[str, str]): 上回合处理结果
 
         Returns:
-            SocketMessage: 实验信息消息
+            Frame: 实验信息消息
         """
 
-        data = ExperimentInfo(
-            infos=[
-                Info(
-                    hint="#info_group",
-                    value="基本信息",
-                ),
-                Info(
-                    hint="实验轮数",
-                    value=f"{self.cur_main_round+1}/{len(self.main_rounds)}",
-                ),
-                Info(
-                    hint="当前回合数",
-                    value=f"{self.cur_sub_round+1}/{len(self.sub_rounds)}",
-                ),
-                Info(
-                    hint="你的分组",
-                    value=self.experiment_devices[uuid]["role"][0],
-                ),
-                Info(
-                    hint="你的角色",
-                    value=self.experiment_devices[uuid]["role"][1],
-                ),
-            ],
-            images=[
-                Image(imageUrl=self._generate_pic_url(name))
-                for name in self.exp_cfg.hint_pics
-            ],
-            options=Options(
-                options=self.sub_rounds[self.cur_sub_round].decision.options
-            ),
+        role = self.experiment_devices[uuid]["role"]
+        infos = ()
+        images = ()
+        if process_result is not None:
+            infos = tuple(tuple(item) for item in process_result.get("infos", []))
+            images = tuple(process_result.get("images", []))
+        key = (self.cur_main_round, self.cur_sub_round, role, infos, images)
+        return self._frame_cache.get(
+            key, lambda: self._build_exp_info_message(role, infos, images)
         )
-        if process_result is not None and process_result.get("infos", []):
-            data.infos.extend(
-                [
-                    Info(hint=key, value=value)
-                    for key, value in process_result.get("infos", [])
-                ]
-            )
-        if process_result is not None and process_result.get("images", []):
-            data.images.extend(
-                [
-                    Image(imageUrl=self._generate_pic_url(name))
-                    for name in process_result.get("images", [])
-                ]
+
+    def _exp_info_template(self, role: tuple[str, str]) -> FrameTemplate:
+        """
+        获取当前回合某个组别角色的消息模板
+
+        基本信息、配置中的提示图片和决策选项对同一回合、同一组别角色的所有设备相同，只构造和编码一次
+
+        Args:
+            role (tuple[str, str]): 设备的角色 (组别, 角色)
+
+        Returns:
+            FrameTemplate: 消息模板，infos / images 之后追加算法返回的内容
+        """
+
+        key = (self.cur_main_round, self.cur_sub_round, role)
+        template = self._templates.get(key)
+        if template is None:
+            data = {
+                "infos": [
+                    {"hint": "#info_group", "value": "基本信息"},
+                    {
+                        "hint": "实验轮数",
+                        "value": f"{self.cur_main_round+1}/{len(self.main_rounds)}",
+                    },
+                    {
+                        "hint": "当前回合数",
+                        "value": f"{self.cur_sub_round+1}/{len(self.sub_rounds)}",
+                    },
+                    {"hint": "你的分组", "value": role[0]},
+                    {"hint": "你的角色", "value": role[1]},
+                ],
+                "images": [
+                    self._image_entries.entry(name) for name in self.exp_cfg.hint_pics
+                ],
+                "options": {"options": self._cur_round().options},
+                "expStatus": ExperimentStatus.RUNNING,
+            }
+            template = self._templates[key] = FrameTemplate(
+                CMD.UPDATE_EXPERIMENT_INFO,
+                data,
+                {"infos": self._info_entries, "images": self._image_entries},
             )
-        socketMessage = SocketMessage(
-            cmd=CMD.UPDATE_EXPERIMENT_INFO,
-            data=data.model_dump_json(),
-        )
+        return template
 
-        return socketMessage
+    def _build_exp_info_message(
+        self, role: tuple[str, str], infos: tuple, images: tuple
+    ) -> Frame:
+        """
+        构造实验信息消息
+
+        在组别角色的消息模板后追加算法返回的信息和图片，
+        相同的信息和图片条目在本回合中只编码一次，编码时只拼接片段
+
+        Args:
+            role (tuple[str, str]): 设备的角色 (组别, 角色)
+            infos (tuple): 算法返回的 (hint, value) 信息
+            images (tuple): 算法返回的图片名称
+
+        Returns:
+            Frame: 实验信息消息
+        """
+
+        return self._exp_info_template(role).render(infos, images)
 
     async def parse_message(self, message: SocketMessage, websocket: WebSocket):
         """
@@ -512,42 +1076,89 @@ class ExperimentManager:
             websocket (WebSocket): 当前客户端
         """
 
-        print(f"收到消息: {message}")
+        logger.debug("收到消息: %s", message)
         match message.cmd:
             case CMD.CONNECT:
                 await self._handle_connect(websocket, message.data)
             case CMD.SUBMIT_DESITION:
                 await self._handle_submit_decision(websocket, message.data)
+            case CMD.SYNC_EXPERIMENT_INFO:
+                self._handle_sync(websocket, message.data)
             case CMD.UPDATE_EXPERIMENT_INFO:
                 pass
 
-    async def _handle_submit_decision(self, websocket: WebSocket, data: str):
+    def _handle_sync(self, websocket: WebSocket, data: str | dict):
+        """
+        处理客户端的同步请求（协议v3，客户端的状态版本与增量不一致时发送），重新下发完整快照
+
+        Args:
+            websocket (WebSocket): 当前客户端
+            data (str | dict): {"uuid": str, "version": int}
+        """
+
+        if isinstance(data, dict):
+            msg = SyncMessage.model_validate(data)
+        else:
+            msg = SyncMessage.model_validate_json(data)
+        device = self.experiment_devices.get(msg.uuid)
+        if device is None or device["websocket"] is not websocket:
+            logger.warning("同步请求的设备不存在或连接不一致: %s", msg.uuid)
+            return
+        state = device.get("state")
+        logger.info(
+            "设备请求同步 uuid: %s, 客户端版本: %s, 服务端版本: %s",
+            msg.uuid,
+            msg.version,
+            None if state is None else state[1],
+        )
+        device["state"] = None
+        if "cur_message" in device:
+            self._send_info(device, device["cur_message"])
+
+    async def _handle_submit_decision(self, websocket: WebSocket, data: str | dict):
         """
         处理实验决策提交
         """
 
         # 解析消息
-        msg = DecisionMessage.model_validate_json(data)
+        if isinstance(data, dict):
+            msg = DecisionMessage.model_validate(data)
+        else:
+            msg = DecisionMessage.model_validate_json(data)
 
         # 下发消息：请等待其他实验参与者提交与后台处理
-        self.experiment_devices[msg.uuid]["cur_message"] = self._exp_pending_msg
-        await self.connection_manager.send_message(self._exp_pending_msg, websocket)
+        self._send_info(self.experiment_devices[msg.uuid], self._exp_pending_msg)
+
+        # 先写入提交日志，服务重启后可以重放
+        self.checkpoint.append_journal({"uuid": msg.uuid, "decision": msg.decision})
+        await self._record_submit(msg.uuid, msg.decision)
+
+    async def _record_submit(self, uuid: str, decision: str):
+        """
+        记录设备提交的决策，本回合参与者全部提交后推进到下一回合
+
+        Args:
+            uuid (str): 设备uuid
+            decision (str): 决策
+        """
+
+        self.experiment_devices[uuid]["cur_message"] = self._exp_pending_msg
 
         # 记录当前实验设备提交信息
-        self.cur_round_submit_devices[msg.uuid] = {
-            "role": self.experiment_devices[msg.uuid]["role"],
-            "decision": msg.decision,
+        self.cur_round_submit_devices[uuid] = {
+            "role": self.experiment_devices[uuid]["role"],
+            "decision": decision,
         }
 
-        print(f"当前回合提交信息更新: {self.cur_round_submit_devices}")
+        logger.debug("当前回合提交信息更新: %s", self.cur_round_submit_devices)
 
         # 本回合参与对象全部提交之后 调用算法进行处理 并推进下一回合实验展开
         if len(self.cur_round_participants) == len(self.cur_round_submit_devices):
+            closed_at = time.perf_counter()
             # 先保存本回合提交日志
             self.submit_logs.append(copy.deepcopy(self.cur_round_submit_devices))
-
-            # 针对所有下一轮参与者分别计算界面数据
-            process_result_map = {}
+            self.decision_log.append_round(self.cur_round_submit_devices)
+            self._append_round_log(self.submit_logs[-1])
 
             # 回收当前回合提交设备信息
             self.cur_round_submit_devices.clear()
@@ -557,64 +1168,243 @@ class ExperimentManager:
             self._init_cur_round_participants()
 
             if have_next_round > 0:
-                for uid in self.cur_round_participants:
-                    process_result_map[uid] = self.algorithm.process(
-                        uuid=uid,
-                        submit_logs=self.submit_logs,
-                        cur_main_round=self.cur_main_round,
-                        cur_sub_round=self.cur_sub_round,
-                    )
-                await self._start_cur_round(process_result_map)
+                process_result_map = self._process_cur_round()
+                delivery = await self._start_cur_round(process_result_map)
+                # 下一回合的消息全部发送完成后记录回合切换时间
+                self._observe_transition(delivery, closed_at)
+                self._save_checkpoint()
             else:
-                print("===================最后一回合数据处理====================")
+                logger.info("最后一回合数据处理")
                 # 保存实验日志到本地文件
-                self._save_exp_logs()
-                print("===================实验结束====================")
+                await self._save_exp_logs()
+                self.checkpoint.clear()
+                self._finished = True
+                logger.info("实验结束")
                 # 实验结束 广播实验结束消息
+                outgoing = {
+                    connection: (connection, self._exp_end_msg.encode(PROTOCOL_V1))
+                    for connection in self.connection_manager.active_connections
+                }
+                devices = {}
                 for value in self.experiment_devices.values():
                     value["cur_message"] = self._exp_end_msg
-                await self.connection_manager.broadcast(self._exp_end_msg)
+                    if value["websocket"] is None:
+                        # 恢复实验后尚未重连的设备
+                        continue
+                    outgoing.pop(value["websocket"], None)
+                    devices[value["websocket"]] = value
+                delivery = self.connection_manager.fan_out(outgoing, coalesce=True)
+                for websocket, value in devices.items():
+                    delivery[websocket] = self._send_info(value, self._exp_end_msg)
+                self._report_delivery(
+                    {websocket.client: f for websocket, f in delivery.items()}
+                )
+
+    def _checkpoint_dir(self) -> Path:
+        name = self.exp_cfg.lab_exp_name
+        if self.session_id is not None:
+            name += f"_{self.session_id}"
+        return Path("../checkpoint") / name
 
-    def _save_exp_logs(self):
+    def _config_digest(self) -> str:
+        return hashlib.sha256(self.exp_cfg.model_dump_json().encode()).hexdigest()[:16]
+
+    def _save_checkpoint(self):
+        """
+        保存实验状态快照（在事件循环中编码，由检查点的写入线程写入磁盘）
+
+        相同的帧只保存一份，设备和消息日志按序号引用；等待帧和结束帧用名称引用。
+        """
+
+        frames = []
+        frame_index = {}
+
+        def ref(frame: Frame):
+            if frame is None:
+                return None
+            if frame is self._exp_pending_msg:
+                return "pending"
+            if frame is self._exp_end_msg:
+                return "end"
+            idx = frame_index.get(id(frame))
+            if idx is None:
+                idx = frame_index[id(frame)] = len(frames)
+                frames.append({"cmd": frame.cmd, "data": frame.data})
+            return idx
+
+        self.checkpoint.save_snapshot(
+            {
+                "config": self._config_digest(),
+                "cur_main_round": self.cur_main_round,
+                "cur_sub_round": self.cur_sub_round,
+                "devices": {
+                    uuid: {
+                        "role": device["role"],
+                        "version": device["version"],
+                        "cur_message": ref(device.get("cur_message")),
+                    }
+                    for uuid, device in self.experiment_devices.items()
+                },
+                "participants": sorted(self.cur_round_participants),
+                "submit_logs": self.submit_logs,
+                "cur_round_submit_devices": self.cur_round_submit_devices,
+                "cur_message_log": {
+                    uuid: ref(msg["message"])
+                    for uuid, msg in self._cur_message_log.items()
+                },
+                "round_log": (
+                    {
+                        "dir": str(self.round_log.log_dir),
+                        "written": self.round_log.written,
+                        "unconfirmed": self.round_log.unconfirmed(),
+                    }
+                    if self.round_log is not None
+                    else None
+                ),
+                "frames": frames,
+            }
+        )
+
+    async def resume(self) -> bool:
+        """
+        从检查点恢复实验状态
+
+        服务启动时调用；恢复后设备凭保存的uuid重连，按重连处理并重新收到当前回合的消息。
+
+        Returns:
+            bool: 是否恢复了实验
+        """
+
+        state, journal = self.checkpoint.load()
+        if state is None:
+            return False
+        if state["config"] != self._config_digest():
+            logger.warning("实验配置已变化，忽略检查点: %s", self.checkpoint.checkpoint_dir)
+            self.checkpoint.clear()
+            return False
+
+        frames = [Frame(frame["cmd"], frame["data"]) for frame in state["frames"]]
+
+        def deref(ref):
+            if ref == "pending":
+                return self._exp_pending_msg
+            if ref == "end":
+                return self._exp_end_msg
+            return None if ref is None else frames[ref]
+
+        def round_log(round_log: dict) -> dict:
+            return {
+                uuid: {"role": tuple(value["role"]), "decision": value["decision"]}
+                for uuid, value in round_log.items()
+            }
+
+        self.cur_main_round = state["cur_main_round"]
+        self.cur_sub_round = state["cur_sub_round"]
+        self._refresh_sub_rounds_list()
+        for uuid, device in state["devices"].items():
+            self.experiment_devices[uuid] = {
+                "websocket": None,
+                "role": tuple(device["role"]),
+                "version": device["version"],
+                # 传输编码属于连接，重连时重新协商
+                "encoding": ENCODING_JSON,
+            }
+            self.allocator.restore(uuid, self.experiment_devices[uuid]["role"])
+            if device["cur_message"] is not None:
+                self.experiment_devices[uuid]["cur_message"] = deref(
+                    device["cur_message"]
+                )
+        for submit_log in state["submit_logs"]:
+            self.submit_logs.append(round_log(submit_log))
+            self.decision_log.append_round(self.submit_logs[-1])
+        self.cur_round_submit_devices.update(
+            round_log(state["cur_round_submit_devices"])
+        )
+        self.cur_round_participants = frozenset(state["participants"])
+        self._cur_message_log = {
+            uuid: {"message": deref(ref)}
+            for uuid, ref in state["cur_message_log"].items()
+        }
+
+        if state["round_log"] is not None:
+            # 补写快照时尚未确认写入回合日志的记录
+            log_state = state["round_log"]
+            self.round_log = RoundLogWriter(Path(log_state["dir"]))
+            self.round_log.written = repair_round_log(self.round_log.log_dir)
+            missing = log_state["unconfirmed"][
+                self.round_log.written - log_state["written"] :
+            ]
+            for record in missing:
+                self.round_log.append(record)
+            if self.round_log.written + len(missing) < len(self.submit_logs):
+                logger.warning("回合日志不完整: %s", self.round_log.path)
+
+        # 重放快照之后的提交
+        for entry in journal:
+            if entry["uuid"] in self.experiment_devices:
+                await self._record_submit(entry["uuid"], entry["decision"])
+
+        logger.info(
+            "已从检查点恢复实验: 设备 %d 台, 第 %d 轮第 %d 回合, 已完成 %d 个回合, 重放提交 %d 条",
+            len(self.experiment_devices),
+            self.cur_main_round + 1,
+            self.cur_sub_round + 1,
+            len(self.submit_logs),
+            len(journal),
+        )
+        return True
+
+    def _log_dir(self) -> Path:
+        time_stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        if self.session_id is not None:
+            time_stamp += f"_{self.session_id}"
+        return Path("../log") / self.exp_cfg.lab_exp_name / time_stamp
+
+    def _append_round_log(self, decisions: dict = None):
+        """
+        把当前回合的消息和提交信息追加到回合日志（后台写入）
+
+        Args:
+            decisions (dict, optional): 本回合的提交信息，实验结束后的最后一条记录为 None. Defaults to None.
+        """
+
+        if self.round_log is None:
+            self.round_log = RoundLogWriter(self._log_dir())
+        round_idx = len(self.submit_logs) - (1 if decisions is not None else 0)
+        self.round_log.append(
+            encode_round_record(
+                round_idx,
+                self.cur_main_round,
+                self.cur_sub_round,
+                self._cur_message_log,
+                decisions,
+            )
+        )
+
+    async def _save_exp_logs(self):
         """
         保存实验日志
+
+        写入最后一条回合日志，再由回合日志生成 exp_log_message.json 和 exp_log_decision.json
         """
 
         # 初始化最后一个回合的消息日志
         message_log = {}
+        process_result_map = self._process_cur_round()
         for uid in self.cur_round_participants:
-            user_result = self.algorithm.process(
-                uuid=uid,
-                submit_logs=self.submit_logs,
-                cur_main_round=self.cur_main_round,
-                cur_sub_round=self.cur_sub_round,
-            )
-            socketMessage = self._generate_exp_info_message(uid, user_result)
+            user_result = process_result_map.get(uid, {})
             message_log[uid] = {
-                "message": socketMessage.model_dump(),
+                "message": self._generate_exp_info_message(uid, user_result),
             }
         # 记录最后一个回合的消息日志
-        self.exp_message_logs.append(message_log)
+        self._cur_message_log = message_log
+        self._append_round_log()
 
-        # 把其中的str反解到json格式，再保存到本地json文件中，利于分析
-        for log in self.exp_message_logs:
-            log: dict
-            for uid, msg in log.items():
-                msg["message"]["data"] = ExperimentInfo.model_validate_json(
-                    msg["message"]["data"]
-                ).model_dump()
-
-        json_string = json.dumps(self.exp_message_logs, ensure_ascii=False, indent=2)
-        time_stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
-        save_str_to_json(
-            json_string,
-            f"../log/{self.exp_cfg.lab_exp_name}/{time_stamp}/exp_log_message.json",
-        )
-        json_string = json.dumps(self.submit_logs, ensure_ascii=False, indent=2)
-        save_str_to_json(
-            json_string,
-            f"../log/{self.exp_cfg.lab_exp_name}/{time_stamp}/exp_log_decision.json",
-        )
+        await self.round_log.close()
+        log_dir = self.round_log.log_dir
+        await asyncio.to_thread(finalize_round_log, log_dir)
+        # 加入跨实验索引（log 根目录/实验名/时间戳）
+        await asyncio.to_thread(LogIndex(log_dir.parent.parent).index_run, log_dir)
 
 
-__all__ = ["ConnectionManager", "ExperimentManager"]
+__all__ = ["ConnectionManager", "ExperimentManager", "Outbox"]
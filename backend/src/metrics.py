@@ -0,0 +1,390 @@
+"""
+运行指标
+
+不依赖第三方库的 Counter / Gauge / Histogram，按 Prometheus 文本格式输出（/metrics 接口）。
+记录指标只是整数加法和一次二分查找；Gauge 在采集时才调用取值函数，热路径上没有额外开销。
+指标对象全部在事件循环线程中访问，不加锁。
+"""
+
+import bisect
+import math
+import re
+import typing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""Prometheus 文本格式的 Content-Type"""
+
+DEFAULT_SESSION_LABEL = "default"
+"""默认实验场次的 session 标签值"""
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+"""直方图默认的桶上限（秒）"""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    """
+    指标注册表
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric"):
+        """
+        注册指标
+
+        Raises:
+            ValueError: 指标名已存在
+        """
+
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已存在: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        按 Prometheus 文本格式输出全部指标
+        """
+
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+"""默认注册表"""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Registry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], typing.Any] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values: str):
+        """
+        获取一组标签值对应的子指标，热路径上可以保存返回值重复使用
+
+        Args:
+            *values (str): 标签值，顺序与 labelnames 一致
+
+        Returns:
+            子指标
+        """
+
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        # 没有标签的指标直接记录
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """
+    只增不减的计数器
+    """
+
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._children.items()
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function: typing.Callable[[], float] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: typing.Callable[[], float]):
+        """
+        设置取值函数，采集时调用
+        """
+
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(_Metric):
+    """
+    可增可减的当前值
+    """
+
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def set_function(self, function: typing.Callable[[], float]):
+        self._default().set_function(function)
+
+    def remove(self, *values: str):
+        """
+        删除一组标签值对应的子指标
+        """
+
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"
+            for key, child in self._children.items()
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        """每个桶（非累计）的样本数，最后一个为 +Inf"""
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """
+    直方图
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry = REGISTRY,
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def samples(self) -> list[str]:
+        names = self.labelnames + ("le",)
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*self.upper_bounds, math.inf), child.counts):
+                cumulative += count
+                labels = _format_labels(names, (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(.*)$")
+
+
+def merge_expositions(expositions: dict[str, str], label: str = "worker") -> str:
+    """
+    合并多个进程输出的指标，每个样本加上来源标签，同一指标的样本放在一起
+
+    Args:
+        expositions (dict[str, str]): 来源 -> Prometheus 文本格式的指标
+        label (str, optional): 来源标签名. Defaults to "worker".
+
+    Returns:
+        str: 合并后的指标
+    """
+
+    headers: dict[str, list[str]] = {}
+    samples: dict[str, list[str]] = {}
+    for source, text in expositions.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = line.split(" ", 3)[2]
+                if family not in headers:
+                    headers[family] = []
+                    samples[family] = []
+                if len(headers[family]) < 2:
+                    headers[family].append(line)
+                continue
+            match = _SAMPLE_RE.match(line)
+            if match is None or family is None:
+                continue
+            name, labels, value = match.groups()
+            source_label = f'{label}="{_escape(source)}"'
+            labels = f"{{{source_label},{labels[1:]}" if labels else f"{{{source_label}}}"
+            samples[family].append(f"{name}{labels} {value}")
+    lines = []
+    for family, header in headers.items():
+        lines.extend(header)
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n"
+
+
+# 回合与连接健康指标
+
+ROUND_TRANSITION_SECONDS = Histogram(
+    "lab_round_transition_seconds",
+    "回合最后一次提交到下一回合消息全部发送完成的时间",
+    ("session",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+ALGORITHM_PROCESS_SECONDS = Histogram(
+    "lab_algorithm_process_seconds",
+    "每个回合调用算法计算全部参与者界面数据的时间",
+    ("session",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+SEND_SECONDS = Histogram(
+    "lab_send_seconds",
+    "单个连接写出一帧消息的时间",
+)
+CONNECTED_SOCKETS = Gauge(
+    "lab_connected_sockets",
+    "当前连接数",
+    ("session",),
+)
+PENDING_SUBMISSIONS = Gauge(
+    "lab_pending_submissions",
+    "本回合尚未提交决策的参与者数",
+    ("session",),
+)
+MESSAGE_LOG_ENTRIES = Gauge(
+    "lab_message_log_entries",
+    "当前回合消息日志的条数",
+    ("session",),
+)
+VALIDATION_ERRORS = Counter(
+    "lab_validation_errors_total",
+    "格式错误的客户端消息数",
+    ("session",),
+)
+RECONNECTS = Counter(
+    "lab_reconnects_total",
+    "设备重连次数",
+    ("session",),
+)
+DROPPED_FRAMES = Counter(
+    "lab_dropped_frames_total",
+    "发送队列中被丢弃的帧数，coalesced 为被新帧合并，overflow 为队列已满",
+    ("reason",),
+)
+
+# 传输编码指标
+
+ENCODED_PAYLOADS = Counter(
+    "lab_encoded_payloads_total",
+    "按传输编码编码的不同消息数，同一消息发给多个连接时只编码一次",
+    ("encoding",),
+)
+PAYLOAD_BYTES = Counter(
+    "lab_payload_bytes_total",
+    "发送成功的消息编码前的 JSON 字节数",
+    ("encoding",),
+)
+WIRE_BYTES = Counter(
+    "lab_wire_bytes_total",
+    "发送成功的消息按协商的编码写出的字节数（不含 websocket 帧头和传输层压缩）",
+    ("encoding",),
+)
+
+__all__ = [
+    "ALGORITHM_PROCESS_SECONDS",
+    "CONNECTED_SOCKETS",
+    "CONTENT_TYPE",
+    "Counter",
+    "DEFAULT_SESSION_LABEL",
+    "DROPPED_FRAMES",
+    "ENCODED_PAYLOADS",
+    "Gauge",
+    "Histogram",
+    "MESSAGE_LOG_ENTRIES",
+    "PAYLOAD_BYTES",
+    "PENDING_SUBMISSIONS",
+    "RECONNECTS",
+    "REGISTRY",
+    "ROUND_TRANSITION_SECONDS",
+    "Registry",
+    "SEND_SECONDS",
+    "VALIDATION_ERRORS",
+    "WIRE_BYTES",
+    "merge_expositions",
+]
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Literal
 
 from pydantic import BaseModel
 
@@ -9,6 +9,12 @@ class AppConfig(BaseModel):
     """
 
     lab_cfg_path: str
+    sessions: Dict[str, str] = None
+    """同时运行的其他实验场次: 场次id -> 实验配置文件路径"""
+    log_level: str = "INFO"
+    """运行日志级别"""
+    log_levels: Dict[str, str] = None
+    """单独设置某些模块的日志级别: 模块名 -> 级别"""
 
 
 class RoleConfig(BaseModel):
@@ -86,6 +92,10 @@ class LabExpConfig(BaseModel):
     algorithm: AlgorithmConfig
     hint_pics_path: str = None
     hint_pics: List[str] = None
+    role_policy: Literal["sequential", "balanced", "random"] = "sequential"
+    """座位分配策略: sequential 按配置顺序, balanced 在组别之间轮流, random 随机"""
+    slot_reclaim_timeout: float | None = 60
+    """实验开始前设备断开多少秒后其座位可以分配给新设备，null 表示不回收"""
 
 
 __all__ = ["AppConfig", "LabExpConfig"]
@@ -14,6 +14,12 @@ class CMD(StrEnum):
     SUBMIT_DESITION = "SUBMIT_DESITION"
     """提交决策"""
 
+    PATCH_EXPERIMENT_INFO = "PATCH_EXPERIMENT_INFO"
+    """增量更新实验信息（协议v3）"""
+
+    SYNC_EXPERIMENT_INFO = "SYNC_EXPERIMENT_INFO"
+    """客户端请求完整的实验信息（协议v3）"""
+
 
 class ExperimentStatus(StrEnum):
     """实验状态枚举类"""
@@ -30,7 +36,8 @@ class ExperimentStatus(StrEnum):
 
 class SocketMessage(BaseModel):
     cmd: CMD
-    data: str
+    data: str | dict | None = None
+    """协议v1中为JSON字符串，协议v2中为嵌套对象"""
 
 
 class Info(BaseModel):
@@ -53,6 +60,46 @@ class ExperimentInfo(BaseModel):
     expStatus: ExperimentStatus = ExperimentStatus.RUNNING
 
 
+class ListPatch(BaseModel):
+    """列表字段的增量：先把列表截断或补齐到 length，再按下标替换条目"""
+
+    length: int
+    """更新后的列表长度"""
+
+    set: list[tuple[int, dict]] = []
+    """[[下标, 条目], ...]"""
+
+
+class ExperimentInfoPatch(BaseModel):
+    """
+    实验信息的增量（协议v3）
+
+    base 与客户端当前的状态版本一致时才能应用，否则客户端应发送 SYNC_EXPERIMENT_INFO 请求完整的实验信息；
+    未出现的字段没有变化
+    """
+
+    base: int
+    """增量基于的状态版本"""
+
+    version: int
+    """应用后的状态版本"""
+
+    infos: ListPatch = None
+    images: ListPatch = None
+    options: Options = None
+    expStatus: ExperimentStatus = None
+
+
+class SyncMessage(BaseModel):
+    """请求完整实验信息的消息（协议v3）"""
+
+    uuid: str
+    """设备uuid"""
+
+    version: int = None
+    """客户端当前的状态版本"""
+
+
 class DecisionMessage(BaseModel):
     """决策消息"""
 
@@ -0,0 +1,403 @@
+import json
+import typing
+
+from pydantic_core import to_json
+
+from model.message import CMD
+
+PROTOCOL_V1 = 1
+"""旧版协议：SocketMessage.data 为 JSON 字符串（JSON 中嵌套 JSON），现有安卓客户端使用"""
+
+PROTOCOL_V2 = 2
+"""新版协议：SocketMessage.data 为嵌套对象，整帧只编码一次"""
+
+PROTOCOL_V3 = 3
+"""增量协议：消息格式与 v2 相同，实验信息带状态版本，回合之间只下发变化的部分，见 delta 模块"""
+
+PROTOCOL_VERSIONS = (PROTOCOL_V1, PROTOCOL_V2, PROTOCOL_V3)
+"""服务端支持的协议版本"""
+
+LATEST_PROTOCOL_VERSION = PROTOCOL_V3
+
+
+class Frame:
+    """
+    下发给客户端的一帧消息
+
+    data 保存为普通的 dict / str，不再经过 pydantic 模型；
+    每个协议版本的编码结果只生成一次并缓存，发送、cur_message 和消息日志共用同一份编码。
+    由 FrameTemplate 生成的帧用模板预先编码的片段拼接，不再编码公共部分。
+    """
+
+    __slots__ = ("cmd", "data", "_encoded", "_spliced")
+
+    def __init__(self, cmd: CMD, data: typing.Any):
+        self.cmd = cmd
+        self.data = data
+        self._encoded: dict[int, str] = {}
+        self._spliced: tuple["FrameTemplate", tuple[tuple, ...]] = None
+
+    def encode(self, version: int = PROTOCOL_V2) -> str:
+        """
+        按协议版本编码（v3 的完整消息与 v2 相同）
+
+        Args:
+            version (int, optional): 协议版本. Defaults to PROTOCOL_V2.
+
+        Returns:
+            str: 编码后的 JSON 文本
+        """
+
+        if version > PROTOCOL_V2:
+            version = PROTOCOL_V2
+        encoded = self._encoded.get(version)
+        if encoded is None and self._spliced is not None:
+            template, keys = self._spliced
+            encoded = self._encoded[version] = template.encode(version, keys)
+        if encoded is None:
+            data = self.data
+            if version == PROTOCOL_V1 and not isinstance(data, str):
+                data = to_json(data).decode()
+            encoded = to_json({"cmd": self.cmd, "data": data}).decode()
+            self._encoded[version] = encoded
+        return encoded
+
+
+def _escape(fragment: str) -> str:
+    # JSON 字符串转义逐字符进行，片段分别转义后拼接与整体转义的结果相同
+    return to_json(fragment).decode()[1:-1]
+
+
+class EntryCache:
+    """
+    列表条目的编码缓存
+
+    条目由可哈希的键构造，每个条目按协议版本只编码一次；
+    不同消息中相同的条目（同组别角色的公共信息、相同的图片）共用同一个对象和同一份编码。
+    """
+
+    def __init__(self, build: typing.Callable[[typing.Hashable], typing.Any]):
+        """
+        Args:
+            build (Callable[[Hashable], Any]): 由键构造条目
+        """
+
+        self._build = build
+        self._entries: dict[typing.Hashable, typing.Any] = {}
+        self._encoded: dict[int, dict[typing.Hashable, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entry(self, key: typing.Hashable) -> typing.Any:
+        """
+        获取键对应的条目
+        """
+
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = self._build(key)
+        return entry
+
+    def encoded(self, key: typing.Hashable, version: int) -> str:
+        """
+        获取键对应的条目按协议版本编码的片段（协议v1中已按字符串转义）
+        """
+
+        table = self._encoded.setdefault(version, {})
+        fragment = table.get(key)
+        if fragment is None:
+            fragment = to_json(self.entry(key)).decode()
+            if version == PROTOCOL_V1:
+                fragment = _escape(fragment)
+            table[key] = fragment
+        return fragment
+
+    def join(self, keys: typing.Iterable[typing.Hashable], version: int) -> str:
+        """
+        拼接多个条目的编码片段，以逗号分隔
+        """
+
+        table = self._encoded.get(version)
+        if table is not None:
+            try:
+                return ",".join([table[key] for key in keys])
+            except KeyError:
+                pass
+        return ",".join([self.encoded(key, version) for key in keys])
+
+    def clear(self):
+        """
+        清空缓存（已被引用的条目不受影响）
+        """
+
+        self._entries.clear()
+        self._encoded.clear()
+
+
+class FrameTemplate:
+    """
+    帧模板
+
+    data 为所有消息共有的内容，splice 中的列表字段在共有条目之后追加每条消息自己的条目，
+    追加的条目用键表示，由对应的 EntryCache 构造和编码。
+    共有部分按协议版本预先编码成片段，生成的帧编码时只拼接片段和条目的编码，不再调用 JSON 编码；
+    结果与直接编码整帧完全一致。
+    """
+
+    __slots__ = ("cmd", "data", "splice", "_fragments")
+
+    def __init__(self, cmd: CMD, data: dict, splice: dict[str, EntryCache]):
+        """
+        Args:
+            cmd (CMD): 消息类型
+            data (dict): 共有内容
+            splice (dict[str, EntryCache]): 追加条目的列表字段 -> 条目缓存，顺序与 data 中的字段顺序一致
+
+        Raises:
+            ValueError: splice 的字段不在 data 中或顺序不一致
+        """
+
+        if tuple(key for key in data if key in splice) != tuple(splice):
+            raise ValueError(f"模板字段顺序与 data 不一致: {tuple(splice)}")
+        self.cmd = cmd
+        self.data = data
+        self.splice = splice
+        self._fragments: dict[int, tuple[tuple[str, ...], tuple[bool, ...]]] = {}
+
+    def _build_fragments(self, version: int) -> tuple[tuple[str, ...], tuple[bool, ...]]:
+        # data 的 JSON 在每个追加位置（列表的 "]" 之前）切开
+        parts = []
+        current = []
+        for key, value in self.data.items():
+            current.append(("," if current or parts else "") + to_json(key).decode() + ":")
+            encoded = to_json(value).decode()
+            if key in self.splice:
+                current.append(encoded[:-1])
+                parts.append("".join(current))
+                current = ["]"]
+            else:
+                current.append(encoded)
+        parts.append("".join(current) + "}")
+        parts[0] = "{" + parts[0]
+        if version == PROTOCOL_V1:
+            parts = [_escape(part) for part in parts]
+            head = to_json({"cmd": self.cmd, "data": ""}).decode()[:-2]
+            tail = '"}'
+        else:
+            head = to_json({"cmd": self.cmd, "data": None}).decode()[:-5]
+            tail = "}"
+        parts[0] = head + parts[0]
+        parts[-1] += tail
+        return tuple(parts), tuple(bool(self.data[key]) for key in self.splice)
+
+    def encode(self, version: int, keys: tuple[tuple, ...]) -> str:
+        """
+        拼接编码结果
+
+        Args:
+            version (int): 协议版本
+            keys (tuple[tuple, ...]): 每个 splice 字段追加的条目键
+
+        Returns:
+            str: 编码后的 JSON 文本
+        """
+
+        fragments = self._fragments.get(version)
+        if fragments is None:
+            fragments = self._fragments[version] = self._build_fragments(version)
+        parts, has_common = fragments
+        out = [parts[0]]
+        for part, common, cache, entry_keys in zip(
+            parts[1:], has_common, self.splice.values(), keys
+        ):
+            if entry_keys:
+                fragment = cache.join(entry_keys, version)
+                out.append("," + fragment if common else fragment)
+            out.append(part)
+        return "".join(out)
+
+    def render(self, *keys: tuple) -> Frame:
+        """
+        生成一帧消息
+
+        Args:
+            *keys (tuple): 每个 splice 字段追加的条目键，顺序与 splice 一致
+
+        Returns:
+            Frame: 消息帧，data 为共有内容加上追加条目
+        """
+
+        data = dict(self.data)
+        for (field, cache), entry_keys in zip(self.splice.items(), keys):
+            if entry_keys:
+                data[field] = self.data[field] + [cache.entry(key) for key in entry_keys]
+        frame = Frame(self.cmd, data)
+        frame._spliced = (self, keys)
+        return frame
+
+
+class FrameCache:
+    """
+    按内容去重的帧缓存
+
+    以决定消息内容的全部输入（可哈希的元组）作为内容键，内容相同的消息只构造和编码一次，
+    所有接收方、cur_message 和消息日志共用同一个 Frame 对象。
+    """
+
+    def __init__(self):
+        self._frames: dict[typing.Hashable, Frame] = {}
+        self.hits = 0
+        """命中次数"""
+        self.misses = 0
+        """未命中（新建帧）次数"""
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def get(self, key: typing.Hashable, build: typing.Callable[[], Frame]) -> Frame:
+        """
+        获取内容键对应的帧，不存在时调用 build 构造
+
+        Args:
+            key (Hashable): 内容键
+            build (Callable[[], Frame]): 帧构造函数
+
+        Returns:
+            Frame: 共享的帧
+        """
+
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = build()
+            self._frames[key] = frame
+            self.misses += 1
+        else:
+            self.hits += 1
+        return frame
+
+    def clear(self):
+        """
+        清空缓存（已被引用的帧不受影响）
+        """
+
+        self._frames.clear()
+
+
+def parse_connect(data: typing.Any) -> tuple[str, int]:
+    """
+    解析 CONNECT 消息，协商协议版本
+
+    旧版客户端的 data 为设备uuid字符串；
+    新版客户端的 data 为 {"uuid": str, "version": int, "session": str, "encoding": str | list[str]}
+    对象（或其 JSON 字符串），session 可选，见 parse_connect_session；encoding 可选，见 parse_connect_encoding。
+
+    Args:
+        data (Any): CONNECT 消息的 data 字段
+
+    Returns:
+        tuple[str, int]: (设备uuid, 协商后的协议版本)
+    """
+
+    if isinstance(data, str) and data.startswith("{"):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError:
+            pass
+    if not isinstance(data, dict):
+        return data or "", PROTOCOL_V1
+    version = data.get("version", PROTOCOL_V1)
+    if not isinstance(version, int) or version < PROTOCOL_V1:
+        version = PROTOCOL_V1
+    return data.get("uuid") or "", min(version, LATEST_PROTOCOL_VERSION)
+
+
+def parse_connect_session(data: typing.Any) -> str:
+    """
+    获取 CONNECT 消息中指定的实验场次
+
+    Args:
+        data (Any): CONNECT 消息的 data 字段
+
+    Returns:
+        str: 场次id，未指定时返回 None
+    """
+
+    if isinstance(data, str) and data.startswith("{"):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError:
+            return None
+    if isinstance(data, dict):
+        return data.get("session")
+    return None
+
+
+def parse_connect_encoding(data: typing.Any) -> tuple[tuple[str, ...], str]:
+    """
+    获取 CONNECT 消息中客户端希望的传输编码（协议v2及以上），见 transport 模块
+
+    Args:
+        data (Any): CONNECT 消息的 data 字段，"encoding" 为编码名称或按优先顺序排列的列表，
+            "table" 为客户端已保存的字符串表摘要（重连时带上，与服务端一致时回复中不再附带字典/字符串表）
+
+    Returns:
+        tuple[tuple[str, ...], str]: (编码名称，未指定时为空, 字符串表摘要，未指定时为 None)
+    """
+
+    if isinstance(data, str) and data.startswith("{"):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError:
+            return (), None
+    if not isinstance(data, dict):
+        return (), None
+    encoding = data.get("encoding")
+    table = data.get("table")
+    if not isinstance(table, str):
+        table = None
+    if isinstance(encoding, str):
+        return (encoding,), table
+    if isinstance(encoding, list):
+        return tuple(name for name in encoding if isinstance(name, str)), table
+    return (), table
+
+
+def dump_message_logs(exp_message_logs: list[dict]) -> str:
+    """
+    将消息日志拼接为 JSON 文本
+
+    每帧直接复用已有的编码结果，不再重新解析和序列化。
+
+    Args:
+        exp_message_logs (list[dict]): 消息日志 [{uuid: {"message": Frame}}]
+
+    Returns:
+        str: JSON 文本
+    """
+
+    rounds = []
+    for log in exp_message_logs:
+        items = ",\n".join(
+            f'  {json.dumps(uuid)}: {{"message": {msg["message"].encode()}}}'
+            for uuid, msg in log.items()
+        )
+        rounds.append("{\n" + items + "\n}" if items else "{}")
+    return "[\n" + ",\n".join(rounds) + "\n]"
+
+
+__all__ = [
+    "EntryCache",
+    "Frame",
+    "FrameCache",
+    "FrameTemplate",
+    "LATEST_PROTOCOL_VERSION",
+    "PROTOCOL_V1",
+    "PROTOCOL_V2",
+    "PROTOCOL_V3",
+    "PROTOCOL_VERSIONS",
+    "dump_message_logs",
+    "parse_connect",
+    "parse_connect_encoding",
+    "parse_connect_session",
+]
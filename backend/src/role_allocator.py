@@ -0,0 +1,198 @@
+import collections
+import random
+import time
+import typing
+
+from schedule import RoleSlot
+
+POLICIES = ("sequential", "balanced", "random")
+"""
+座位分配策略
+    sequential: 按配置顺序分配，先坐满第一个组别角色再分配下一个
+    balanced: 在组别之间轮流分配，到场过程中各组人数保持均衡
+    random: 随机分配
+"""
+
+
+class RoleAllocator:
+    """
+    角色座位表
+
+    实验配置中的每个人数展开成一个座位，空座位按分配策略的顺序放在队列中，
+    分配和归还都是 O(1)。实验开始前断开且超时未重连的设备占用的座位可以回收给新设备。
+    """
+
+    def __init__(
+        self,
+        slots: tuple[RoleSlot, ...],
+        policy: str = "sequential",
+        reclaim_timeout: float = None,
+        seed: int = None,
+    ):
+        """
+        Args:
+            slots (tuple[RoleSlot, ...]): 按配置顺序排列的组别角色人数
+            policy (str, optional): 分配策略，见 POLICIES. Defaults to "sequential".
+            reclaim_timeout (float, optional): 断开多少秒后座位可以回收，None 表示不回收. Defaults to None.
+            seed (int, optional): random 策略的随机种子. Defaults to None.
+
+        Raises:
+            ValueError: 未知的分配策略
+        """
+
+        if policy not in POLICIES:
+            raise ValueError(f"未知的座位分配策略: {policy}")
+        self.policy = policy
+        self.reclaim_timeout = reclaim_timeout
+
+        self.roles: tuple[tuple[str, str], ...] = tuple(
+            (slot.group, slot.role) for slot in slots for _ in range(slot.num)
+        )
+        """座位号 -> (组别, 角色)"""
+
+        self._free = collections.deque(self._order(slots, random.Random(seed)))
+        """空座位，队首先分配"""
+
+        self._holders: dict[str, int] = {}
+        """设备uuid -> 座位号"""
+
+        self._disconnected: dict[str, float] = {}
+        """已断开的设备uuid -> 断开时间，按断开先后排列"""
+
+    def _order(self, slots: tuple[RoleSlot, ...], rng: random.Random) -> list[int]:
+        seats = list(range(len(self.roles)))
+        if self.policy == "random":
+            rng.shuffle(seats)
+        elif self.policy == "balanced":
+            by_group: dict[str, collections.deque[int]] = {}
+            for seat, (group, _) in enumerate(self.roles):
+                by_group.setdefault(group, collections.deque()).append(seat)
+            queues = list(by_group.values())
+            seats = []
+            while queues:
+                for queue in queues:
+                    seats.append(queue.popleft())
+                queues = [queue for queue in queues if queue]
+        return seats
+
+    def __len__(self) -> int:
+        return len(self.roles)
+
+    @property
+    def full(self) -> bool:
+        """座位是否已全部分配"""
+
+        return not self._free
+
+    @property
+    def ready(self) -> bool:
+        """座位是否已全部分配且所有设备都在线"""
+
+        return not self._free and not self._disconnected
+
+    def acquire(self) -> int | None:
+        """
+        取出下一个空座位，随后用 bind 绑定设备
+
+        Returns:
+            int | None: 座位号，没有空座位时返回 None
+        """
+
+        return self._free.popleft() if self._free else None
+
+    def bind(self, seat: int, uuid: str) -> tuple[str, str]:
+        """
+        把座位绑定到设备
+
+        Args:
+            seat (int): acquire 取出的座位号
+            uuid (str): 设备uuid
+
+        Returns:
+            tuple[str, str]: (组别, 角色)
+        """
+
+        self._holders[uuid] = seat
+        return self.roles[seat]
+
+    def restore(self, uuid: str, role: tuple[str, str]) -> bool:
+        """
+        从检查点恢复设备占用的座位（恢复后视为断开，等待设备重连）
+
+        Args:
+            uuid (str): 设备uuid
+            role (tuple[str, str]): 设备的 (组别, 角色)
+
+        Returns:
+            bool: 是否找到了该角色的空座位
+        """
+
+        for seat in self._free:
+            if self.roles[seat] == role:
+                self._free.remove(seat)
+                self._holders[uuid] = seat
+                self._disconnected[uuid] = time.monotonic()
+                return True
+        return False
+
+    def release(self, uuid: str):
+        """
+        归还设备的座位，顺序分配时归还的座位最先被再次分配
+
+        Args:
+            uuid (str): 设备uuid
+        """
+
+        seat = self._holders.pop(uuid, None)
+        self._disconnected.pop(uuid, None)
+        if seat is None:
+            return
+        if self.policy == "sequential":
+            self._free.appendleft(seat)
+        else:
+            self._free.append(seat)
+
+    def mark_disconnected(self, uuid: str, now: float = None):
+        """
+        记录设备断开
+
+        Args:
+            uuid (str): 设备uuid
+            now (float, optional): 断开时间（time.monotonic）. Defaults to None.
+        """
+
+        if uuid in self._holders:
+            self._disconnected.pop(uuid, None)
+            self._disconnected[uuid] = time.monotonic() if now is None else now
+
+    def mark_connected(self, uuid: str):
+        """
+        记录设备重连
+
+        Args:
+            uuid (str): 设备uuid
+        """
+
+        self._disconnected.pop(uuid, None)
+
+    def reclaimable(self, now: float = None) -> typing.Iterator[str]:
+        """
+        断开超时的设备，按断开先后排列
+
+        Args:
+            now (float, optional): 当前时间（time.monotonic）. Defaults to None.
+
+        Returns:
+            Iterator[str]: 设备uuid
+        """
+
+        if self.reclaim_timeout is None:
+            return
+        deadline = (time.monotonic() if now is None else now) - self.reclaim_timeout
+        for uuid, disconnected_at in self._disconnected.items():
+            if disconnected_at > deadline:
+                return
+            yield uuid
+
+
+__all__ = ["POLICIES", "RoleAllocator"]
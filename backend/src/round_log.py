@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+from pydantic_core import to_json
+
+from event_log import LOG_FORMAT
+from protocol import Frame, dump_message_logs
+from utils.json_to_file import save_str_to_json
+
+logger = logging.getLogger(__name__)
+
+ROUND_LOG_FILE = "exp_log_rounds.jsonl"
+"""逐回合追加的日志文件"""
+
+MESSAGE_LOG_FILE = "exp_log_message.json"
+DECISION_LOG_FILE = "exp_log_decision.json"
+
+
+def encode_round_record(
+    round_idx: int,
+    main_round: int,
+    sub_round: int,
+    message_log: dict,
+    decisions: dict = None,
+) -> str:
+    """
+    将一个回合编码为一行 JSON
+
+    消息直接复用每帧的编码结果；实验结束后的最后一条记录没有提交信息，decisions 为 null。
+
+    Args:
+        round_idx (int): 回合序号（从0开始）
+        main_round (int): 大回合序号
+        sub_round (int): 小回合序号
+        message_log (dict): 本回合的消息日志 {uuid: {"message": Frame}}
+        decisions (dict, optional): 本回合的提交信息 {uuid: {"role", "decision"}}. Defaults to None.
+
+    Returns:
+        str: 一行 JSON（以换行结尾）
+    """
+
+    messages = ",".join(
+        f'{json.dumps(uuid)}:{{"message":{msg["message"].encode()}}}'
+        for uuid, msg in message_log.items()
+    )
+    return (
+        f'{{"round":{round_idx},"main_round":{main_round},"sub_round":{sub_round},'
+        f'"messages":{{{messages}}},"decisions":{to_json(decisions).decode()}}}\n'
+    )
+
+
+class RoundLogWriter:
+    """
+    回合日志后台写入器
+
+    append 只把编码好的记录放入缓冲区，后台任务按批写入文件并 flush/fsync，
+    不阻塞实验流程；进程意外退出时最多丢失最近一个写入间隔内的回合。
+    """
+
+    FLUSH_INTERVAL = 0.5
+    """写入间隔（秒）"""
+
+    MAX_BATCH = 64
+    """缓冲区达到该条数时立即写入"""
+
+    def __init__(self, log_dir: Path):
+        self.log_dir = Path(log_dir)
+        self.path = self.log_dir / ROUND_LOG_FILE
+        self._pending: list[str] = []
+        self._inflight: list[str] = []
+        self._wakeup: asyncio.Event = None
+        self._task: asyncio.Task = None
+        self._closed = False
+        self.written = 0
+        """已写入文件的记录数"""
+
+    def append(self, record: str):
+        """
+        追加一条记录（仅放入缓冲区）
+
+        Args:
+            record (str): encode_round_record 编码的记录
+        """
+
+        if self._closed:
+            raise RuntimeError(f"回合日志已关闭: {self.path}")
+        self._pending.append(record)
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._pending) >= self.MAX_BATCH:
+            self._wakeup.set()
+
+    def unconfirmed(self) -> list[str]:
+        """
+        获取尚未确认写入文件的记录（正在写入的和缓冲区中的）
+
+        Returns:
+            list[str]: 记录列表，按追加顺序
+        """
+
+        return self._inflight + self._pending
+
+    async def close(self):
+        """
+        写入缓冲区中剩余的记录并停止后台任务
+        """
+
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self._pending:
+            await self._flush()
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending:
+                await self._flush()
+
+    async def _flush(self):
+        batch = self._inflight = self._pending
+        self._pending = []
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.written += len(batch)
+        except OSError as e:
+            # 写入失败的记录放回缓冲区，下次重试
+            self._pending[:0] = batch
+            logger.warning("回合日志写入失败: %s, %s", self.path, e)
+        finally:
+            self._inflight = []
+
+    def _write(self, batch: list[str]):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(batch)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def read_round_log(log_dir: Path) -> list[dict]:
+    """
+    读取回合日志，忽略进程意外退出时写了一半的最后一行
+
+    Args:
+        log_dir (Path): 日志目录
+
+    Returns:
+        list[dict]: 回合记录列表
+    """
+
+    records = []
+    with open(Path(log_dir) / ROUND_LOG_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("忽略不完整的回合日志记录: %s", line[:80])
+                break
+    return records
+
+
+def repair_round_log(log_dir: Path) -> int:
+    """
+    截掉进程意外退出时写了一半的最后一行，以便继续追加
+
+    Args:
+        log_dir (Path): 日志目录
+
+    Returns:
+        int: 完整的记录数
+    """
+
+    path = Path(log_dir) / ROUND_LOG_FILE
+    if not path.is_file():
+        return 0
+    content = path.read_bytes()
+    end = content.rfind(b"\n") + 1
+    if end < len(content):
+        logger.warning("截掉不完整的回合日志记录: %s", path)
+        with open(path, "r+b") as f:
+            f.truncate(end)
+    return content.count(b"\n", 0, end)
+
+
+def finalize_round_log(log_dir: Path) -> bool:
+    """
+    由回合日志生成 exp_log_message.json 和 exp_log_decision.json
+
+    Args:
+        log_dir (Path): 日志目录
+
+    Returns:
+        bool: 是否全部保存成功
+    """
+
+    log_dir = Path(log_dir)
+    records = read_round_log(log_dir)
+    message_logs = [
+        {
+            uuid: {"message": Frame(msg["message"]["cmd"], msg["message"]["data"])}
+            for uuid, msg in record["messages"].items()
+        }
+        for record in records
+    ]
+    submit_logs = [
+        record["decisions"] for record in records if record["decisions"] is not None
+    ]
+    saved = save_str_to_json(
+        dump_message_logs(message_logs), log_dir / MESSAGE_LOG_FILE, validate=False
+    )
+    return (
+        save_str_to_json(
+            json.dumps(submit_logs, ensure_ascii=False, indent=2),
+            log_dir / DECISION_LOG_FILE,
+            validate=False,
+        )
+        and saved
+    )
+
+
+__all__ = [
+    "DECISION_LOG_FILE",
+    "MESSAGE_LOG_FILE",
+    "ROUND_LOG_FILE",
+    "RoundLogWriter",
+    "encode_round_record",
+    "finalize_round_log",
+    "read_round_log",
+    "repair_round_log",
+]
+
+
+if __name__ == "__main__":
+    # 由意外中断的实验的回合日志生成 json 日志: python round_log.py ../log/实验名/时间戳
+    if len(sys.argv) != 2:
+        print("用法: python round_log.py <日志目录>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    sys.exit(0 if finalize_round_log(Path(sys.argv[1])) else 1)
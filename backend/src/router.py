@@ -0,0 +1,313 @@
+"""
+多进程部署入口
+
+启动 N 个工作进程（每个进程是一个完整的后端服务，监听本地 Unix socket），
+实验场次按顺序轮流分配给各工作进程；路由进程监听对外端口，
+按场次把 websocket 连接和 HTTP 请求转发给负责该场次的工作进程。
+
+用法: python router.py --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import httpx
+import websockets
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from cfg_parser import load_app_config
+from context import Context
+from metrics import CONTENT_TYPE, merge_expositions
+from model.message import CMD, SocketMessage
+from protocol import parse_connect_session
+from session import DEFAULT_SESSION_ID, WORKER_SESSIONS_ENV, configured_sessions
+
+logger = logging.getLogger(__name__)
+
+SOCKET_DIR = Path(tempfile.gettempdir()) / "labplatform"
+"""工作进程 Unix socket 所在目录"""
+
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "transfer-encoding",
+    "upgrade",
+    "content-length",
+    "content-encoding",
+    "host",
+}
+"""转发 HTTP 请求/响应时不复制的头"""
+
+
+class Worker:
+    """
+    一个工作进程
+    """
+
+    def __init__(self, index: int, session_ids: list[str], port: int):
+        self.index = index
+        self.session_ids = session_ids
+        self.socket_path = SOCKET_DIR / f"worker_{port}_{index}.sock"
+        self.process: subprocess.Popen = None
+        self.client: httpx.AsyncClient = None
+
+    def start(self):
+        """
+        启动工作进程
+        """
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self.socket_path.unlink(missing_ok=True)
+        env = dict(os.environ)
+        env[WORKER_SESSIONS_ENV] = ",".join(self.session_ids)
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "main:app",
+                "--uds",
+                str(self.socket_path),
+                "--log-level",
+                "warning",
+            ],
+            cwd=Path(__file__).parent,
+            env=env,
+        )
+        self.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=str(self.socket_path)),
+            base_url="http://worker",
+            timeout=None,
+        )
+        logger.info(
+            "工作进程 %d 已启动 pid=%d 场次: %s", self.index, self.process.pid, self.session_ids
+        )
+
+    async def wait_ready(self, timeout: float = 30.0):
+        """
+        等待工作进程开始监听
+        """
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.socket_path.exists():
+            if self.process.poll() is not None:
+                raise RuntimeError(f"工作进程 {self.index} 启动失败")
+            if loop.time() > deadline:
+                raise TimeoutError(f"工作进程 {self.index} 启动超时")
+            await asyncio.sleep(0.1)
+
+    async def stop(self):
+        """
+        停止工作进程
+        """
+
+        if self.client is not None:
+            await self.client.aclose()
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                await asyncio.to_thread(self.process.wait, 10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.socket_path.unlink(missing_ok=True)
+
+
+def assign_sessions(session_ids: list[str], num_workers: int) -> list[list[str]]:
+    """
+    把实验场次按顺序轮流分配给工作进程
+
+    Args:
+        session_ids (list[str]): 场次id列表
+        num_workers (int): 工作进程数，超过场次数时按场次数启动
+
+    Returns:
+        list[list[str]]: 每个工作进程负责的场次id
+    """
+
+    num_workers = max(1, min(num_workers, len(session_ids)))
+    assignment = [[] for _ in range(num_workers)]
+    for i, session_id in enumerate(session_ids):
+        assignment[i % num_workers].append(session_id)
+    return assignment
+
+
+class Router:
+    """
+    场次路由：场次id -> 工作进程
+    """
+
+    def __init__(self, num_workers: int, port: int):
+        session_ids = list(configured_sessions(load_app_config()))
+        self.port = port
+        self.workers = [
+            Worker(i, ids, port)
+            for i, ids in enumerate(assign_sessions(session_ids, num_workers))
+        ]
+        self.owners: dict[str, Worker] = {
+            session_id: worker
+            for worker in self.workers
+            for session_id in worker.session_ids
+        }
+
+    def get(self, session_id: str = None) -> Worker:
+        """
+        获取负责场次的工作进程
+
+        Args:
+            session_id (str, optional): 场次id，为空时为默认场次. Defaults to None.
+
+        Returns:
+            Worker: 工作进程，场次不存在时返回 None
+        """
+
+        return self.owners.get(session_id or DEFAULT_SESSION_ID)
+
+    async def start(self):
+        for worker in self.workers:
+            worker.start()
+        await asyncio.gather(*(worker.wait_ready() for worker in self.workers))
+
+    async def stop(self):
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+
+
+router: Router = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await router.start()
+    logger.info("路由进程已启动，端口 %d，工作进程数 %d", router.port, len(router.workers))
+    yield
+    await router.stop()
+    logger.info("应用关闭")
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, session: str = None):
+    if router.get(session) is None:
+        logger.warning("实验场次不存在: %s", session)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    # 第一条消息若为带场次的 CONNECT，以消息中的场次为准
+    try:
+        first = await websocket.receive_text()
+    except WebSocketDisconnect:
+        return
+    try:
+        message = SocketMessage.model_validate_json(first)
+        if message.cmd == CMD.CONNECT:
+            payload_session = parse_connect_session(message.data)
+            if payload_session is not None and router.get(payload_session) is not None:
+                session = payload_session
+    except ValidationError:
+        pass
+    worker = router.get(session)
+
+    query = f"?session={session}" if session else ""
+    # 本机转发不再压缩，客户端连接的 permessage-deflate 由 uvicorn 协商
+    async with websockets.unix_connect(
+        str(worker.socket_path), f"ws://worker/ws{query}", max_size=None, compression=None
+    ) as upstream:
+        await upstream.send(first)
+
+        async def client_to_worker():
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    await upstream.close()
+                    return
+                text = message.get("text")
+                await upstream.send(text if text is not None else message["bytes"])
+
+        async def worker_to_client():
+            # 协商了 deflate / msgpack 传输编码的连接收到的是二进制帧
+            try:
+                async for data in upstream:
+                    if isinstance(data, bytes):
+                        await websocket.send_bytes(data)
+                    else:
+                        await websocket.send_text(data)
+            except websockets.ConnectionClosed:
+                pass
+
+        tasks = [
+            asyncio.create_task(client_to_worker()),
+            asyncio.create_task(worker_to_client()),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+
+
+@app.get("/metrics")
+async def metrics():
+    # 合并全部工作进程的指标，每个样本带上 worker 标签
+    async def fetch(worker: Worker) -> str:
+        try:
+            response = await worker.client.get("/metrics")
+            return response.text
+        except httpx.HTTPError as e:
+            logger.warning("获取工作进程 %d 的指标失败: %r", worker.index, e)
+            return ""
+
+    texts = await asyncio.gather(*(fetch(worker) for worker in router.workers))
+    return Response(
+        content=merge_expositions(
+            {str(worker.index): text for worker, text in zip(router.workers, texts)}
+        ),
+        media_type=CONTENT_TYPE,
+    )
+
+
+@app.api_route("/{path:path}", methods=["GET", "HEAD"])
+async def http_proxy(path: str, request: Request):
+    worker = router.get(request.query_params.get("session"))
+    if worker is None:
+        return Response(status_code=404)
+    headers = {
+        k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS
+    }
+    upstream = await worker.client.request(
+        request.method,
+        f"/{path}",
+        params=request.query_params,
+        headers=headers,
+    )
+    return Response(
+        content=upstream.content,
+        status_code=upstream.status_code,
+        headers={
+            k: v
+            for k, v in upstream.headers.items()
+            if k.lower() not in HOP_BY_HOP_HEADERS
+        },
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="多进程部署：按实验场次分配工作进程")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="工作进程数"
+    )
+    args = parser.parse_args()
+
+    port = Context().port
+    router = Router(args.workers, port)
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
@@ -0,0 +1,220 @@
+import typing
+
+from model.cfg import LabExpConfig, MainRoundConfig, SubRoundConfig
+
+
+class RoleSlot(typing.NamedTuple):
+    """
+    一个组别角色的人数
+    """
+
+    group: str
+    role: str
+    num: int
+
+
+class RoundPlan(typing.NamedTuple):
+    """
+    展平后的一个小回合
+    """
+
+    index: int
+    """展平后的下标，与 submit_logs 的下标一致"""
+
+    main_round: int
+    """大回合下标"""
+
+    sub_round: int
+    """小回合在本大回合中的下标"""
+
+    config: SubRoundConfig
+    """小回合配置"""
+
+    options: tuple[str, ...]
+    """决策选项"""
+
+    makers: tuple[tuple[frozenset[str] | None, frozenset[str] | None], ...] | None
+    """决策者过滤条件 ((组别, 角色), ...)，组别/角色为 None 时不限；整体为 None 时所有设备都参与"""
+
+    num_participants: int
+    """本回合的决策人数"""
+
+    def matches(self, role: tuple[str, str]) -> bool:
+        """
+        判断组别角色是否参与本回合
+
+        Args:
+            role (tuple[str, str]): (组别, 角色)
+
+        Returns:
+            bool: 是否参与
+        """
+
+        if self.makers is None:
+            return True
+        return any(
+            (groups is None or role[0] in groups) and (roles is None or role[1] in roles)
+            for groups, roles in self.makers
+        )
+
+
+class Schedule:
+    """
+    编译后的实验安排
+
+    实验配置在实验开始前展平成不可变的小回合列表，每个小回合的选项、决策者过滤条件和决策人数都预先算好；
+    设备全部到齐后再为每个小回合预先算出参与者集合（过滤条件相同的小回合共用同一个集合），
+    实验进行中切换回合只是下标加一。
+    """
+
+    def __init__(self, exp_cfg: LabExpConfig):
+        self.slots = tuple(
+            RoleSlot(group.name, role.name, role.num)
+            for group in exp_cfg.groups
+            for role in group.roles
+        )
+        """按分配顺序排列的组别角色人数"""
+
+        self.total_participants = sum(slot.num for slot in self.slots)
+        """总实验人数"""
+
+        main_rounds = []
+        sub_round_lists = []
+        offsets = []
+        rounds = []
+        for main_round in exp_cfg.main_rounds:
+            sub_rounds = tuple(
+                sub_round
+                for sub_round in main_round.sub_rounds
+                for _ in range(sub_round.repeat)
+            )
+            for _ in range(main_round.repeat):
+                main_idx = len(main_rounds)
+                main_rounds.append(main_round)
+                sub_round_lists.append(sub_rounds)
+                offsets.append(len(rounds))
+                for sub_idx, sub_round in enumerate(sub_rounds):
+                    rounds.append(self._compile_round(len(rounds), main_idx, sub_idx, sub_round))
+
+        self.main_rounds: tuple[MainRoundConfig, ...] = tuple(main_rounds)
+        """展平后的大回合配置"""
+
+        self.rounds: tuple[RoundPlan, ...] = tuple(rounds)
+        """展平后的小回合"""
+
+        self._sub_rounds = tuple(sub_round_lists)
+        self._offsets = tuple(offsets)
+
+    def _compile_round(
+        self, index: int, main_idx: int, sub_idx: int, sub_round: SubRoundConfig
+    ) -> RoundPlan:
+        makers = sub_round.decision.makers
+        if makers is not None:
+            makers = tuple(
+                (
+                    None if maker.groups is None else frozenset(maker.groups),
+                    None if maker.roles is None else frozenset(maker.roles),
+                )
+                for maker in makers
+            )
+        plan = RoundPlan(
+            index,
+            main_idx,
+            sub_idx,
+            sub_round,
+            tuple(sub_round.decision.options),
+            makers,
+            0,
+        )
+        num = sum(slot.num for slot in self.slots if plan.matches((slot.group, slot.role)))
+        return plan._replace(num_participants=num)
+
+    def __len__(self) -> int:
+        return len(self.rounds)
+
+    def index(self, main_round: int, sub_round: int) -> int:
+        """
+        获取小回合展平后的下标
+
+        Args:
+            main_round (int): 大回合下标
+            sub_round (int): 小回合在本大回合中的下标
+
+        Returns:
+            int: 展平后的下标
+        """
+
+        return self._offsets[main_round] + sub_round
+
+    def round(self, main_round: int, sub_round: int) -> RoundPlan:
+        """
+        获取小回合
+
+        Args:
+            main_round (int): 大回合下标
+            sub_round (int): 小回合在本大回合中的下标
+
+        Returns:
+            RoundPlan: 小回合
+        """
+
+        return self.rounds[self.index(main_round, sub_round)]
+
+    def sub_rounds(self, main_round: int) -> tuple[SubRoundConfig, ...]:
+        """
+        获取大回合展开 repeat 后的小回合配置
+
+        Args:
+            main_round (int): 大回合下标
+
+        Returns:
+            tuple[SubRoundConfig, ...]: 小回合配置
+        """
+
+        return self._sub_rounds[main_round]
+
+    def group_roles_num(self, groups: list[str] = None, roles: list[str] = None) -> int:
+        """
+        获取指定组别角色的实验人数
+
+        Args:
+            groups (list[str], optional): 组别列表. Defaults to None.
+            roles (list[str], optional): 角色列表. Defaults to None.
+
+        Returns:
+            int: 组别角色实验人数
+        """
+
+        return sum(
+            slot.num
+            for slot in self.slots
+            if (groups is None or slot.group in groups)
+            and (roles is None or slot.role in roles)
+        )
+
+    def bind(self, experiment_devices: dict[str, dict]) -> tuple[frozenset[str], ...]:
+        """
+        为每个小回合计算参与者集合
+
+        Args:
+            experiment_devices (dict[str, dict]): 设备信息，value 中的 "role" 为 (组别, 角色)
+
+        Returns:
+            tuple[frozenset[str], ...]: 每个小回合的参与者uuid，下标与 rounds 一致
+        """
+
+        by_makers: dict[typing.Hashable, frozenset[str]] = {}
+        participants = []
+        for plan in self.rounds:
+            uuids = by_makers.get(plan.makers)
+            if uuids is None:
+                uuids = by_makers[plan.makers] = frozenset(
+                    uuid
+                    for uuid, device in experiment_devices.items()
+                    if plan.matches(device["role"])
+                )
+            participants.append(uuids)
+        return tuple(participants)
+
+
+__all__ = ["RoleSlot", "RoundPlan", "Schedule"]
@@ -0,0 +1,173 @@
+import logging
+import os
+from pathlib import Path
+
+from cfg_parser import load_algorithm, load_lab_exp_config
+from image_store import ImageStore
+from manager import ConnectionManager, ExperimentManager
+from model.cfg import AppConfig, LabExpConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_ID = "default"
+"""默认实验场次，未指定场次的客户端（包括现有安卓客户端）连接到该场次"""
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+WORKER_SESSIONS_ENV = "LAB_WORKER_SESSIONS"
+"""多进程部署时，工作进程负责的场次id（逗号分隔），由 router.py 设置；未设置时负责全部场次"""
+
+
+def configured_sessions(app_config: AppConfig) -> dict[str, str]:
+    """
+    获取应用配置中的全部实验场次
+
+    Args:
+        app_config (AppConfig): 应用配置
+
+    Returns:
+        dict[str, str]: 场次id -> 实验配置文件路径，默认场次在最前
+    """
+
+    sessions = {DEFAULT_SESSION_ID: app_config.lab_cfg_path}
+    for session_id, cfg_path in (app_config.sessions or {}).items():
+        if session_id in sessions:
+            raise ValueError(f"实验场次已存在: {session_id}")
+        sessions[session_id] = cfg_path
+    return sessions
+
+
+def worker_sessions() -> set[str]:
+    """
+    获取当前工作进程负责的场次id
+
+    Returns:
+        set[str]: 场次id集合，单进程部署时返回 None（负责全部场次）
+    """
+
+    value = os.environ.get(WORKER_SESSIONS_ENV)
+    if value is None:
+        return None
+    return {session_id for session_id in value.split(",") if session_id}
+
+
+class ExperimentSession:
+    """
+    一个实验场次
+
+    每个场次拥有独立的实验配置、算法实例、连接管理和实验管理，场次之间互不影响；
+    图片目录相同的场次共用同一个图片缓存。
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        exp_config: LabExpConfig,
+        image_store: ImageStore,
+        local_ip: str,
+        port: int,
+    ):
+        self.session_id = session_id
+        self.exp_config = exp_config
+        self.image_store = image_store
+        self.connection_manager = ConnectionManager()
+        self.algorithm = load_algorithm(exp_config.algorithm)
+        self.experiment_manager = ExperimentManager(
+            exp_config,
+            self.connection_manager,
+            self.algorithm,
+            local_ip,
+            port,
+            image_store,
+            None if session_id == DEFAULT_SESSION_ID else session_id,
+        )
+
+
+class SessionRegistry:
+    """
+    实验场次注册表
+    """
+
+    def __init__(self, local_ip: str, port: int):
+        self.local_ip = local_ip
+        self.port = port
+        self.sessions: dict[str, ExperimentSession] = {}
+        self._image_stores: dict[str, ImageStore] = {}
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def create(self, session_id: str, cfg_path: str) -> ExperimentSession:
+        """
+        根据实验配置文件创建实验场次
+
+        Args:
+            session_id (str): 场次id
+            cfg_path (str): 实验配置文件路径
+
+        Returns:
+            ExperimentSession: 实验场次
+
+        Raises:
+            ValueError: 场次id已存在
+        """
+
+        if session_id in self.sessions:
+            raise ValueError(f"实验场次已存在: {session_id}")
+        exp_config = load_lab_exp_config(cfg_path)
+        session = ExperimentSession(
+            session_id,
+            exp_config,
+            self.image_store(exp_config.hint_pics_path),
+            self.local_ip,
+            self.port,
+        )
+        self.sessions[session_id] = session
+        logger.info("实验场次 %s 已创建: %s", session_id, exp_config.lab_exp_name)
+        return session
+
+    def get(self, session_id: str = None) -> ExperimentSession:
+        """
+        获取实验场次
+
+        Args:
+            session_id (str, optional): 场次id，为空时返回默认场次. Defaults to None.
+
+        Returns:
+            ExperimentSession: 实验场次，不存在时返回 None
+        """
+
+        return self.sessions.get(session_id or DEFAULT_SESSION_ID)
+
+    def image_store(self, hint_pics_path: str = None) -> ImageStore:
+        """
+        获取图片目录对应的图片缓存，相同目录的场次共用
+
+        Args:
+            hint_pics_path (str, optional): 图片目录（相对于 assets 目录）. Defaults to None.
+
+        Returns:
+            ImageStore: 图片缓存
+        """
+
+        if hint_pics_path is None:
+            return ImageStore()
+        store = self._image_stores.get(hint_pics_path)
+        if store is None:
+            store = ImageStore(
+                BACKEND_DIR / "assets" / hint_pics_path,
+                BACKEND_DIR / "cache" / "images" / hint_pics_path,
+            )
+            store.load()
+            self._image_stores[hint_pics_path] = store
+        return store
+
+
+__all__ = [
+    "DEFAULT_SESSION_ID",
+    "WORKER_SESSIONS_ENV",
+    "ExperimentSession",
+    "SessionRegistry",
+    "configured_sessions",
+    "worker_sessions",
+]
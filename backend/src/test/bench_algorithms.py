@@ -0,0 +1,403 @@
+"""
+实验算法基准测试
+
+为 algorithm/ 下的每个算法生成合成的 experiment_devices / submit_logs，按实验管理器的回合流程
+（小回合开始时计算参与者的界面数据，全部提交后追加提交日志）把实验完整跑完，分别计时:
+
+- process: 每个回合为每个参与者单独调用 process
+- process_round: 每个回合调用一次 process_round（实验管理器使用的方式）
+- final_pass: 新的算法实例拿到完整的提交日志后计算最后一个回合（与 _save_exp_logs 或恢复后的第一次计算相同）
+
+可以同时指定多个人数倍数和大回合数，得到随人数和回合数变化的曲线。结果写入 JSON，
+并可以与保存的基线比较，总耗时超过基线 (1 + threshold) 倍时以非0状态码退出。
+
+用法（在 src 目录下）:
+    python -m test.bench_algorithms --members 1 5 25 --rounds 5 10 20 --json bench.json
+    python -m test.bench_algorithms --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import contextlib
+import importlib
+import inspect
+import json
+import os
+import pkgutil
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+import algorithm
+from algorithm.base_algo import BaseAlgorithm
+from decision_log import DecisionLog
+from model.cfg import LabExpConfig
+from schedule import Schedule
+from test.load_harness import percentiles
+
+SRC_DIR = Path(__file__).parent.parent
+
+CASES = ("process", "process_round", "final_pass")
+"""计时项目"""
+
+
+def find_algorithms() -> dict[str, type[BaseAlgorithm]]:
+    """
+    查找 algorithm 包下的全部算法类
+
+    Returns:
+        dict[str, type[BaseAlgorithm]]: {类名: 算法类}
+    """
+
+    algorithms = {}
+    for module_info in pkgutil.iter_modules(algorithm.__path__):
+        module = importlib.import_module(f"{algorithm.__name__}.{module_info.name}")
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, BaseAlgorithm) and cls is not BaseAlgorithm:
+                algorithms[name] = cls
+    return algorithms
+
+
+def find_cfgs(cfg_dir: Path) -> dict[str, Path]:
+    """
+    查找每个算法对应的实验配置文件
+
+    Args:
+        cfg_dir (Path): 实验配置目录
+
+    Returns:
+        dict[str, Path]: {算法类名: 实验配置文件}，同一个算法有多个配置时取文件名排序后的第一个
+    """
+
+    cfgs = {}
+    for path in sorted(cfg_dir.glob("*.yml")):
+        with open(path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f)
+        class_name = (cfg or {}).get("algorithm", {}).get("class_name")
+        if class_name:
+            cfgs.setdefault(class_name, path)
+    return cfgs
+
+
+def scale_cfg(cfg_path: Path, members: int, rounds: int) -> LabExpConfig:
+    """
+    放大实验配置
+
+    Args:
+        cfg_path (Path): 实验配置文件
+        members (int): 每个角色人数的倍数
+        rounds (int): 大回合数，按配置中的大回合顺序循环补齐
+
+    Returns:
+        LabExpConfig: 放大后的实验配置
+    """
+
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    cfg.setdefault("lab_exp_name", cfg_path.stem)
+    for group in cfg["groups"]:
+        for role in group["roles"]:
+            role["num"] *= members
+    main_rounds = [
+        main_round for main_round in cfg["main_rounds"] for _ in range(main_round["repeat"])
+    ]
+    cfg["main_rounds"] = [
+        {**main_rounds[i % len(main_rounds)], "repeat": 1} for i in range(rounds)
+    ]
+    return LabExpConfig(**cfg)
+
+
+class SyntheticExperiment:
+    """
+    合成的实验数据：设备、回合安排和每个回合的决策
+    """
+
+    def __init__(self, exp_cfg: LabExpConfig, seed: int = 1):
+        self.exp_cfg = exp_cfg
+        self.experiment_devices = {
+            f"{group.name}-{role.name}-{i}": {"role": (group.name, role.name)}
+            for group in exp_cfg.groups
+            for role in group.roles
+            for i in range(role.num)
+        }
+        """设备信息，结构与 ExperimentManager.experiment_devices 一致"""
+
+        # 与 ExperimentManager 相同的回合安排，参与者按设备顺序排列，保证合成的决策可以复现
+        schedule = Schedule(exp_cfg)
+        participants = schedule.bind(self.experiment_devices)
+        self.schedule = [
+            (
+                plan.main_round,
+                plan.sub_round,
+                schedule.sub_rounds(plan.main_round),
+                [uuid for uuid in self.experiment_devices if uuid in participants[plan.index]],
+            )
+            for plan in schedule.rounds
+        ]
+        """每个小回合的 (大回合, 小回合, 小回合列表, 参与者)"""
+
+        rng = random.Random(seed)
+        self.submit_logs = [
+            {
+                uuid: {
+                    "role": self.experiment_devices[uuid]["role"],
+                    "decision": rng.choice(plan.options),
+                }
+                for uuid in self.schedule[plan.index][3]
+            }
+            for plan in schedule.rounds
+        ]
+        """每个小回合的提交日志，结构与 ExperimentManager.submit_logs 一致"""
+
+    def new_algorithm(self, cls: type[BaseAlgorithm]) -> tuple[BaseAlgorithm, DecisionLog]:
+        """
+        创建算法实例，并按实验管理器的方式注入设备信息和列式决策日志
+        """
+
+        algo = cls()
+        algo.experiment_devices = self.experiment_devices
+        decision_log = DecisionLog(self.exp_cfg)
+        algo.decision_log = decision_log
+        return algo, decision_log
+
+
+def run_incremental(
+    exp: SyntheticExperiment, cls: type[BaseAlgorithm], per_uuid: bool
+) -> list[float]:
+    """
+    按实验管理器的回合流程跑完整个实验
+
+    Args:
+        exp (SyntheticExperiment): 合成的实验数据
+        cls (type[BaseAlgorithm]): 算法类
+        per_uuid (bool): 为每个参与者单独调用 process，否则每个回合调用一次 process_round
+
+    Returns:
+        list[float]: 每个小回合的计算耗时（秒），最后一项为实验结束时对最后一个回合的计算
+    """
+
+    algo, decision_log = exp.new_algorithm(cls)
+    submit_logs = []
+    times = []
+
+    def process(main_idx, sub_idx, participants):
+        start = time.perf_counter()
+        if per_uuid:
+            for uuid in participants:
+                algo.process(uuid, submit_logs, main_idx, sub_idx)
+        else:
+            algo.process_round(participants, submit_logs, main_idx, sub_idx)
+        times.append(time.perf_counter() - start)
+
+    for (main_idx, sub_idx, sub_rounds, participants), round_log in zip(
+        exp.schedule, exp.submit_logs
+    ):
+        algo.sub_rounds = sub_rounds
+        process(main_idx, sub_idx, participants)
+        submit_logs.append(round_log)
+        decision_log.append_round(round_log)
+    # 实验结束时再计算一次最后一个回合（_save_exp_logs）
+    process(*exp.schedule[-1][:2], exp.schedule[-1][3])
+    return times
+
+
+def run_final_pass(exp: SyntheticExperiment, cls: type[BaseAlgorithm]) -> float:
+    """
+    新的算法实例拿到完整的提交日志后计算最后一个回合
+
+    Returns:
+        float: 耗时（秒），包括列式决策日志的重建
+    """
+
+    main_idx, sub_idx, sub_rounds, participants = exp.schedule[-1]
+    start = time.perf_counter()
+    algo, decision_log = exp.new_algorithm(cls)
+    algo.sub_rounds = sub_rounds
+    for round_log in exp.submit_logs:
+        decision_log.append_round(round_log)
+    algo.process_round(participants, exp.submit_logs, main_idx, sub_idx)
+    return time.perf_counter() - start
+
+
+def _summary(runs: list[list[float]]) -> dict:
+    # 多次运行取总耗时最小的一次，减少调度抖动的影响
+    times = min(runs, key=sum)
+    quarter = max(1, len(times) // 4)
+    early = statistics.mean(times[:quarter])
+    late = statistics.mean(times[-quarter - 1 : -1] or times[-1:])
+    return {
+        "total_ms": round(sum(times) * 1000, 3),
+        "per_round_ms": {
+            k: round(v * 1000, 4) for k, v in percentiles(times).items()
+        },
+        # 后四分之一回合与前四分之一回合的平均耗时之比，接近1说明单回合耗时与已进行的回合数无关
+        "growth": round(late / early, 2) if len(times) > 1 and early > 0 else None,
+    }
+
+
+def bench(
+    cls: type[BaseAlgorithm],
+    cfg_path: Path,
+    members: int,
+    rounds: int,
+    repeat: int,
+    seed: int,
+) -> dict:
+    """
+    测试一个算法在一种规模下的耗时
+
+    Args:
+        cls (type[BaseAlgorithm]): 算法类
+        cfg_path (Path): 实验配置文件
+        members (int): 每个角色人数的倍数
+        rounds (int): 大回合数
+        repeat (int): 重复次数，取最快的一次
+        seed (int): 随机种子
+
+    Returns:
+        dict: 测试结果
+    """
+
+    exp = SyntheticExperiment(scale_cfg(cfg_path, members, rounds), seed)
+    result = {
+        "algorithm": cls.__name__,
+        "cfg": cfg_path.relative_to(SRC_DIR).as_posix()
+        if cfg_path.is_relative_to(SRC_DIR)
+        else str(cfg_path),
+        "members": members,
+        "rounds": rounds,
+        "devices": len(exp.experiment_devices),
+        "sub_rounds": len(exp.schedule),
+        "submits": sum(len(round_log) for round_log in exp.submit_logs),
+    }
+    # 算法中的 print 输出到 devnull，不计入终端输出的开销
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result["process"] = _summary(
+            [run_incremental(exp, cls, per_uuid=True) for _ in range(repeat)]
+        )
+        result["process_round"] = _summary(
+            [run_incremental(exp, cls, per_uuid=False) for _ in range(repeat)]
+        )
+        result["final_pass"] = _summary(
+            [[run_final_pass(exp, cls)] for _ in range(repeat)]
+        )
+    return result
+
+
+def _key(result: dict) -> tuple:
+    return result["algorithm"], result["members"], result["rounds"]
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """
+    与基线比较总耗时
+
+    Args:
+        results (list[dict]): 本次结果
+        baseline (list[dict]): 基线结果
+        threshold (float): 允许的相对变慢比例，如 0.2 表示慢 20% 以内不算退化
+
+    Returns:
+        list[str]: 退化项的说明，没有退化时为空
+    """
+
+    base = {_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = base.get(_key(result))
+        if old is None:
+            continue
+        for case in CASES:
+            old_ms = old[case]["total_ms"]
+            new_ms = result[case]["total_ms"]
+            ratio = new_ms / old_ms if old_ms > 0 else 1.0
+            line = (
+                f"{result['algorithm']} members={result['members']} rounds={result['rounds']}"
+                f" {case}: {old_ms:.3f}ms -> {new_ms:.3f}ms ({ratio:.2f}x)"
+            )
+            print(line)
+            if ratio > 1 + threshold:
+                regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实验算法基准测试")
+    parser.add_argument(
+        "--algorithms", nargs="*", default=None, help="只测试这些算法类，默认测试全部"
+    )
+    parser.add_argument("--cfg-dir", default=str(SRC_DIR / "cfg"), help="实验配置目录")
+    parser.add_argument(
+        "--members", type=int, nargs="+", default=[1, 5, 25], help="每个角色人数的倍数"
+    )
+    parser.add_argument(
+        "--rounds", type=int, nargs="+", default=[5, 10, 20], help="大回合数"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每种规模重复次数，取最快的一次")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--json", default=None, help="把结果写入 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="基线结果 JSON 文件")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="相对基线允许变慢的比例"
+    )
+    args = parser.parse_args()
+
+    algorithms = find_algorithms()
+    cfgs = find_cfgs(Path(args.cfg_dir))
+    results = []
+    for name in args.algorithms or sorted(algorithms):
+        if name not in algorithms:
+            print(f"算法不存在: {name}")
+            continue
+        if name not in cfgs:
+            print(f"没有找到算法 {name} 的实验配置，跳过")
+            continue
+        for members in args.members:
+            for rounds in args.rounds:
+                result = bench(
+                    algorithms[name], cfgs[name], members, rounds, args.repeat, args.seed
+                )
+                results.append(result)
+                print(
+                    f"{name} members={members} rounds={rounds} devices={result['devices']}: "
+                    + ", ".join(
+                        f"{case} {result[case]['total_ms']:.3f}ms"
+                        f" (growth {result[case]['growth']})"
+                        for case in CASES
+                    )
+                )
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"以下项目比基线慢 {args.threshold:.0%} 以上:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("没有发现性能退化")
+
+
+__all__ = ["SyntheticExperiment", "bench", "compare", "find_algorithms", "scale_cfg"]
+
+
+if __name__ == "__main__":
+    main()
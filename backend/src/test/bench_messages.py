@@ -0,0 +1,432 @@
+"""
+实验信息消息构造与编码基准测试
+
+按真实的回合规模（若干设备、每人 10~40 条中文提示信息、多张提示图片）构造一个回合的全部下发消息，
+比较几种构造和编码方式，报告每条消息的耗时和内存分配:
+
+- pydantic: 旧的实现，构造 ExperimentInfo / Info / Image 模型后 model_dump_json
+- pydantic_to_json: 同样构造模型，由 pydantic_core.to_json 直接编码
+- dict_json: 构造 dict，由标准库 json 编码
+- frame: 构造完整的 dict，由 Frame 编码（不共享帧）
+- template: 每个 (回合, 组别角色) 的消息模板预先编码公共部分，每条消息只编码算法返回的信息再拼接（不共享帧）
+- shared_frame: 当前 _start_cur_round 的实现，消息模板加上内容相同的消息共用一个 Frame
+
+各方式的输出解码后必须一致，否则报错退出。
+
+用法（在 src 目录下）:
+    python -m test.bench_messages --devices 200 --infos 10 20 40 --images 4 --json messages.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from pydantic_core import to_json
+
+from algorithm.test_algo import TestAlgorithm
+from image_store import ImageStore
+from manager import ConnectionManager, ExperimentManager
+from model.cfg import LabExpConfig
+from model.message import (
+    CMD,
+    ExperimentInfo,
+    ExperimentStatus,
+    Image,
+    Info,
+    Options,
+    SocketMessage,
+)
+from protocol import PROTOCOL_V1, PROTOCOL_V2, Frame
+
+HINTS = (
+    "前一个大回合我军得分",
+    "前一个大回合本统帅得分",
+    "前一个大回合本参谋得分",
+    "我军累计得分",
+    "本统帅累计得分",
+    "本参谋累计得分",
+    "战场1我军人数",
+    "战场1敌军人数",
+    "战场2我军人数",
+    "战场2敌军人数",
+)
+
+
+def build_manager(devices: int, num_images: int, assets_dir: Path) -> ExperimentManager:
+    """
+    构造一个处于第一个回合的实验管理器
+
+    Args:
+        devices (int): 设备数，平均分到 A/B 两组的统帅和参谋
+        num_images (int): 提示图片数，一半为配置中的固定图片，一半由算法返回
+        assets_dir (Path): 写入提示图片的临时目录
+
+    Returns:
+        ExperimentManager: 实验管理器
+    """
+
+    names = [f"提示图片{i}.png" for i in range(num_images)]
+    for name in names:
+        (assets_dir / name).write_bytes(random.randbytes(256))
+    image_store = ImageStore(assets_dir)
+    image_store.load()
+
+    per_role = max(1, devices // 4)
+    role_names = ("统帅", "参谋")
+    exp_cfg = LabExpConfig(
+        lab_exp_name="bench_messages",
+        algorithm={"module": "algorithm.test_algo", "class_name": "TestAlgorithm"},
+        groups=[
+            {"name": group, "roles": [{"name": role, "num": per_role} for role in role_names]}
+            for group in ("A", "B")
+        ],
+        hint_pics=names[: num_images // 2],
+        main_rounds=[
+            {
+                "repeat": 10,
+                "sub_rounds": [
+                    {
+                        "repeat": 1,
+                        "hint": "提示",
+                        "decision": {"options": ["战场1", "战场2"]},
+                    }
+                ],
+            }
+        ],
+    )
+    manager = ExperimentManager(
+        exp_cfg,
+        ConnectionManager(),
+        TestAlgorithm(),
+        "192.168.1.100",
+        8000,
+        image_store,
+    )
+    for group in exp_cfg.groups:
+        for role in group.roles:
+            for i in range(role.num):
+                uuid = f"{group.name}-{role.name}-{i}"
+                manager.experiment_devices[uuid] = {"role": (group.name, role.name)}
+    manager._init_cur_round_participants()
+    return manager
+
+
+def build_results(
+    manager: ExperimentManager, num_infos: int, personal: int, seed: int
+) -> dict[str, dict]:
+    """
+    构造算法返回的结果
+
+    同一组别角色的前 num_infos - personal 条信息相同，后 personal 条为每个人自己的得分
+
+    Args:
+        manager (ExperimentManager): 实验管理器
+        num_infos (int): 每人的信息条数（含 #info_group 分组）
+        personal (int): 每人不同的信息条数
+        seed (int): 随机种子
+
+    Returns:
+        dict[str, dict]: {uuid: process结果}
+    """
+
+    rng = random.Random(seed)
+    names = manager.exp_cfg.hint_pics
+    extra_images = [
+        path.name
+        for path in sorted(manager.image_store.assets_dir.iterdir())
+        if path.name not in names
+    ]
+
+    def info(i: int, value: str) -> tuple[str, str]:
+        if i % 6 == 0:
+            return ("#info_group", "历史信息" if i == 0 else f"统计信息{i // 6}")
+        hint = HINTS[i % len(HINTS)]
+        return (f"{hint}#[解释： {hint}，按本回合全部参与者的决策计算]", value)
+
+    shared = {}
+    results = {}
+    for uuid, device in manager.experiment_devices.items():
+        role = device["role"]
+        if role not in shared:
+            shared[role] = [info(i, str(rng.randint(0, 100))) for i in range(num_infos - personal)]
+        own = [
+            info(i, str(rng.randint(0, 30))) for i in range(num_infos - personal, num_infos)
+        ]
+        results[uuid] = {"infos": shared[role] + own, "images": extra_images}
+    return results
+
+
+def _pydantic_info(manager: ExperimentManager, uuid: str, result: dict) -> ExperimentInfo:
+    # 旧的实现，见 _build_exp_info_message
+    role = manager.experiment_devices[uuid]["role"]
+    return ExperimentInfo(
+        infos=[
+            Info(hint="#info_group", value="基本信息"),
+            Info(
+                hint="实验轮数",
+                value=f"{manager.cur_main_round+1}/{len(manager.main_rounds)}",
+            ),
+            Info(
+                hint="当前回合数",
+                value=f"{manager.cur_sub_round+1}/{len(manager.sub_rounds)}",
+            ),
+            Info(hint="你的分组", value=role[0]),
+            Info(hint="你的角色", value=role[1]),
+        ]
+        + [Info(hint=key, value=value) for key, value in result.get("infos", [])],
+        images=[
+            Image(imageUrl=manager._generate_pic_url(name))
+            for name in manager.exp_cfg.hint_pics
+        ]
+        + [
+            Image(imageUrl=manager._generate_pic_url(name))
+            for name in result.get("images", [])
+        ],
+        options=Options(
+            options=manager.sub_rounds[manager.cur_sub_round].decision.options
+        ),
+        expStatus=ExperimentStatus.RUNNING,
+    )
+
+
+def _build_frame(manager: ExperimentManager, uuid: str, result: dict) -> Frame:
+    # 模板实现之前的实现，每条消息构造完整的 dict
+    role = manager.experiment_devices[uuid]["role"]
+    data = {
+        "infos": [
+            {"hint": "#info_group", "value": "基本信息"},
+            {
+                "hint": "实验轮数",
+                "value": f"{manager.cur_main_round+1}/{len(manager.main_rounds)}",
+            },
+            {
+                "hint": "当前回合数",
+                "value": f"{manager.cur_sub_round+1}/{len(manager.sub_rounds)}",
+            },
+            {"hint": "你的分组", "value": role[0]},
+            {"hint": "你的角色", "value": role[1]},
+        ]
+        + [{"hint": key, "value": value} for key, value in result.get("infos", [])],
+        "images": [
+            {"imageUrl": manager._generate_pic_url(name)}
+            for name in manager.exp_cfg.hint_pics
+        ]
+        + [
+            {"imageUrl": manager._generate_pic_url(name)}
+            for name in result.get("images", [])
+        ],
+        "options": {"options": manager._cur_round().options},
+        "expStatus": ExperimentStatus.RUNNING,
+    }
+    return Frame(CMD.UPDATE_EXPERIMENT_INFO, data)
+
+
+def _build_template_frame(manager: ExperimentManager, uuid: str, result: dict) -> Frame:
+    return manager._build_exp_info_message(
+        manager.experiment_devices[uuid]["role"],
+        tuple(tuple(item) for item in result.get("infos", [])),
+        tuple(result.get("images", [])),
+    )
+
+
+def encode_pydantic(manager, results, version) -> list[str]:
+    out = []
+    for uuid in manager.cur_round_participants:
+        info = _pydantic_info(manager, uuid, results[uuid])
+        data = info.model_dump_json() if version == PROTOCOL_V1 else info.model_dump()
+        out.append(SocketMessage(cmd=CMD.UPDATE_EXPERIMENT_INFO, data=data).model_dump_json())
+    return out
+
+
+def encode_pydantic_to_json(manager, results, version) -> list[str]:
+    out = []
+    for uuid in manager.cur_round_participants:
+        info = _pydantic_info(manager, uuid, results[uuid])
+        data = to_json(info).decode() if version == PROTOCOL_V1 else info
+        out.append(to_json({"cmd": CMD.UPDATE_EXPERIMENT_INFO, "data": data}).decode())
+    return out
+
+
+def encode_dict_json(manager, results, version) -> list[str]:
+    out = []
+    for uuid in manager.cur_round_participants:
+        data = _build_frame(manager, uuid, results[uuid]).data
+        if version == PROTOCOL_V1:
+            data = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        out.append(
+            json.dumps(
+                {"cmd": CMD.UPDATE_EXPERIMENT_INFO, "data": data},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        )
+    return out
+
+
+def encode_frame(manager, results, version) -> list[str]:
+    return [
+        _build_frame(manager, uuid, results[uuid]).encode(version)
+        for uuid in manager.cur_round_participants
+    ]
+
+
+def encode_shared_frame(manager, results, version) -> list[str]:
+    # 与 _start_cur_round 相同
+    manager._frame_cache.clear()
+    manager._templates.clear()
+    manager._info_entries.clear()
+    manager._image_entries.clear()
+    return [
+        manager._generate_exp_info_message(uuid, results[uuid]).encode(version)
+        for uuid in manager.cur_round_participants
+    ]
+
+
+def encode_template(manager, results, version) -> list[str]:
+    manager._templates.clear()
+    manager._info_entries.clear()
+    manager._image_entries.clear()
+    return [
+        _build_template_frame(manager, uuid, results[uuid]).encode(version)
+        for uuid in manager.cur_round_participants
+    ]
+
+
+VARIANTS = {
+    "pydantic": encode_pydantic,
+    "pydantic_to_json": encode_pydantic_to_json,
+    "dict_json": encode_dict_json,
+    "frame": encode_frame,
+    "template": encode_template,
+    "shared_frame": encode_shared_frame,
+}
+"""各构造和编码方式，参数为 (实验管理器, 算法结果, 协议版本)，返回每个参与者的编码结果"""
+
+
+def _decode(message: str) -> dict:
+    frame = json.loads(message)
+    if isinstance(frame["data"], str):
+        frame["data"] = json.loads(frame["data"])
+    return frame
+
+
+def measure(encode, manager, results, version: int, repeat: int) -> dict:
+    """
+    测试一种方式构造并编码一个回合全部消息的耗时和内存分配
+
+    Args:
+        encode (Callable): 构造和编码方式
+        manager (ExperimentManager): 实验管理器
+        results (dict): 算法结果
+        version (int): 协议版本
+        repeat (int): 重复次数，耗时取最快的一次
+
+    Returns:
+        dict: 每条消息的耗时（微秒）、内存分配峰值和保留的字节数
+    """
+
+    num = len(manager.cur_round_participants)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = encode(manager, results, version)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    out = encode(manager, results, version)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "per_message_us": round(best / num * 1e6, 2),
+        "peak_bytes_per_message": round((peak - before) / num),
+        "retained_bytes_per_message": round((current - before) / num),
+        "encoded_bytes": round(sum(len(m.encode()) for m in out) / num),
+        "unique_messages": len({id(m) for m in out}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实验信息消息构造与编码基准测试")
+    parser.add_argument("--devices", type=int, default=200, help="一个回合的参与设备数")
+    parser.add_argument(
+        "--infos", type=int, nargs="+", default=[10, 20, 40], help="每人的信息条数"
+    )
+    parser.add_argument("--personal", type=int, default=2, help="每人不同的信息条数")
+    parser.add_argument("--images", type=int, default=4, help="提示图片数")
+    parser.add_argument(
+        "--versions",
+        type=int,
+        nargs="+",
+        default=[PROTOCOL_V1, PROTOCOL_V2],
+        choices=[PROTOCOL_V1, PROTOCOL_V2],
+        help="协议版本（v3 的完整消息与 v2 相同）",
+    )
+    parser.add_argument(
+        "--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS), help="构造方式"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快的一次")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--json", default=None, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_messages_") as tmp:
+        manager = build_manager(args.devices, args.images, Path(tmp))
+        for num_infos in args.infos:
+            algo_results = build_results(
+                manager, num_infos, min(args.personal, num_infos), args.seed
+            )
+            for version in args.versions:
+                expected = None
+                for name in args.variants:
+                    messages = VARIANTS[name](manager, algo_results, version)
+                    decoded = [_decode(m) for m in messages]
+                    if expected is None:
+                        expected = decoded
+                    elif decoded != expected:
+                        print(f"{name} 的输出与 {args.variants[0]} 不一致")
+                        sys.exit(1)
+                    result = {
+                        "variant": name,
+                        "version": version,
+                        "infos": num_infos,
+                        "devices": len(messages),
+                        **measure(VARIANTS[name], manager, algo_results, version, args.repeat),
+                    }
+                    results.append(result)
+                    print(
+                        f"v{version} infos={num_infos:<3} {name:<17}"
+                        f" {result['per_message_us']:>9.2f} us/条"
+                        f" 峰值 {result['peak_bytes_per_message']:>7} B/条"
+                        f" 保留 {result['retained_bytes_per_message']:>7} B/条"
+                        f" 消息 {result['encoded_bytes']} B"
+                    )
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+        "devices": args.devices,
+        "images": args.images,
+        "personal": args.personal,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json}")
+
+
+__all__ = ["VARIANTS", "build_manager", "build_results", "measure"]
+
+
+if __name__ == "__main__":
+    main()
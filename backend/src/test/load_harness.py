@@ -0,0 +1,474 @@
+"""
+websocket 负载测试
+
+启动一个后端服务（或连接已运行的服务），用 N 个模拟客户端按真实协议（CONNECT / SUBMIT_DESITION）
+把一个实验配置完整跑完：客户端保存服务端分配的 uuid，按配置的概率断线并带 uuid 重连，
+从下发的 options 中随机选择决策，每次决策前等待一段思考时间。
+
+结束后报告回合切换延迟分位数（一个回合最后一次提交 -> 各客户端收到下一回合消息）、
+每秒消息数、收到的字节数以及服务进程的 CPU 和内存占用。
+协议v3的客户端在本地应用增量，版本不一致时请求同步。
+--encoding 指定协商的传输编码（deflate / msgpack，见 transport 模块），客户端解码二进制帧，
+报告中的 bytes_received 为编码后的字节数（websocket 传输层 permessage-deflate 解压后）。
+
+用法（在 src 目录下）:
+    python -m test.load_harness --cfg cfg/corps_fight.yml --scale 25 --think 0.05 0.5
+    python -m test.load_harness --cfg cfg/corps_fight.yml --scale 10 --protocol 3 --encoding msgpack
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import msgpack
+import websockets
+import yaml
+
+LOAD_TEST_CFG_ENV = "LOAD_TEST_CFG"
+"""load_server.py 读取的实验配置文件路径"""
+
+SRC_DIR = Path(__file__).parent.parent
+
+
+def percentiles(values: list[float], qs=(50, 90, 99)) -> dict[str, float]:
+    """
+    计算分位数（最近秩法）
+
+    Args:
+        values (list[float]): 样本
+        qs (tuple, optional): 分位数. Defaults to (50, 90, 99).
+
+    Returns:
+        dict[str, float]: {"p50": ..., "max": ...}，没有样本时为空
+    """
+
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {
+        f"p{q}": ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+        for q in qs
+    }
+    result["max"] = ordered[-1]
+    return result
+
+
+def _round_key(data: dict) -> tuple[int, int]:
+    # 基本信息中的 "实验轮数"/"当前回合数" 形如 "3/10"
+    key = [0, 0]
+    for info in data.get("infos", []):
+        if info["hint"] == "实验轮数":
+            key[0] = int(info["value"].split("/")[0])
+        elif info["hint"] == "当前回合数":
+            key[1] = int(info["value"].split("/")[0])
+    return tuple(key)
+
+
+class LoadStats:
+    """
+    全部模拟客户端共享的统计信息
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.received_bytes = 0
+        self.reconnects = 0
+        self.syncs = 0
+        """协议v3的同步请求次数"""
+        self.round_last_submit: dict[tuple[int, int], float] = {}
+        """每个回合最后一次提交的时间"""
+        self.transition_latencies: list[float] = []
+        """回合切换延迟（秒）"""
+
+    def on_submit(self, key: tuple[int, int]):
+        self.sent += 1
+        self.round_last_submit[key] = time.perf_counter()
+
+    def on_new_round(self, key: tuple[int, int]):
+        # 上一个回合是已有提交的回合中最晚的一个；服务端在该回合全部提交后才会下发新回合
+        previous = [k for k in self.round_last_submit if k < key]
+        if previous:
+            closed_at = self.round_last_submit[max(previous)]
+            self.transition_latencies.append(time.perf_counter() - closed_at)
+
+
+class SimulatedClient:
+    """
+    模拟一个安卓客户端
+    """
+
+    def __init__(
+        self,
+        index: int,
+        url: str,
+        stats: LoadStats,
+        think: tuple[float, float],
+        reconnect_prob: float,
+        version: int,
+        rnd: random.Random,
+        encoding: str = "json",
+    ):
+        self.index = index
+        self.url = url
+        self.stats = stats
+        self.think = think
+        self.reconnect_prob = reconnect_prob
+        self.version = version
+        self.encoding = encoding
+        """希望协商的传输编码"""
+        self.rnd = rnd
+        self.negotiated = "json"
+        """服务端在 CONNECT 回复中确认的编码"""
+        self.dictionary: bytes = None
+        """deflate 的预置字典"""
+        self.strings: list[str] = []
+        """msgpack 的字符串表"""
+        self.table: str = None
+        """已保存的字典/字符串表摘要，重连时带上"""
+        self.uuid = ""
+        """服务端分配的 uuid，重连时带上（相当于安卓端的 saveUUID）"""
+        self.state: dict = None
+        """协议v3：本地保存的实验信息"""
+        self.state_version: int = None
+        self.seen_rounds: set[tuple[int, int]] = set()
+        self.submitted_rounds: set[tuple[int, int]] = set()
+        self.done = False
+
+    def _connect_message(self) -> str:
+        if self.version == 1:
+            data = self.uuid
+        else:
+            data = {"uuid": self.uuid, "version": self.version}
+            if self.encoding != "json":
+                data["encoding"] = self.encoding
+                if self.table is not None:
+                    data["table"] = self.table
+        return json.dumps({"cmd": "CONNECT", "data": data}, ensure_ascii=False)
+
+    def _decode(self, raw: str | bytes) -> dict:
+        if isinstance(raw, str):
+            return json.loads(raw)
+        if self.negotiated == "deflate":
+            inflater = zlib.decompressobj(zdict=self.dictionary)
+            return json.loads(inflater.decompress(raw) + inflater.flush())
+        return msgpack.unpackb(
+            raw, ext_hook=lambda code, data: self.strings[int.from_bytes(data, "big")]
+        )
+
+    def _sync_message(self) -> str:
+        data = {"uuid": self.uuid, "version": self.state_version}
+        return json.dumps({"cmd": "SYNC_EXPERIMENT_INFO", "data": data}, ensure_ascii=False)
+
+    def _apply_patch(self, patch: dict) -> bool:
+        # 与安卓端应用增量的方式相同，版本不一致时返回 False
+        if self.state is None or patch["base"] != self.state_version:
+            return False
+        for key, value in patch.items():
+            if key in ("base", "version"):
+                continue
+            if isinstance(self.state.get(key), list):
+                items = self.state[key][: value["length"]]
+                items.extend([None] * (value["length"] - len(items)))
+                for i, item in value["set"]:
+                    items[i] = item
+                self.state[key] = items
+            else:
+                self.state[key] = value
+        self.state_version = patch["version"]
+        return True
+
+    def _submit_message(self, decision: str) -> str:
+        data = {"uuid": self.uuid, "decision": decision}
+        if self.version == 1:
+            data = json.dumps(data, ensure_ascii=False)
+        return json.dumps({"cmd": "SUBMIT_DESITION", "data": data}, ensure_ascii=False)
+
+    async def run(self):
+        while not self.done:
+            try:
+                async with websockets.connect(self.url, max_size=None) as ws:
+                    await ws.send(self._connect_message())
+                    self.stats.sent += 1
+                    if await self._session(ws) == "reconnect":
+                        self.stats.reconnects += 1
+            except (OSError, websockets.ConnectionClosed) as e:
+                print(f"客户端 {self.index} 连接断开: {e}")
+                await asyncio.sleep(0.2)
+                self.stats.reconnects += 1
+
+    async def _session(self, ws) -> str:
+        self.state = None
+        async for raw in ws:
+            self.stats.received += 1
+            self.stats.received_bytes += len(raw.encode() if isinstance(raw, str) else raw)
+            message = self._decode(raw)
+            data = message["data"]
+            if message["cmd"] == "CONNECT":
+                if isinstance(data, str):
+                    self.uuid = data
+                    continue
+                self.uuid = data["uuid"]
+                self.negotiated = data.get("encoding", "json")
+                if "dictionary" in data:
+                    self.dictionary = data["dictionary"].encode()
+                self.strings = data.get("strings", self.strings)
+                self.table = data.get("table", self.table)
+                continue
+            if isinstance(data, str):
+                data = json.loads(data)
+            if message["cmd"] == "PATCH_EXPERIMENT_INFO":
+                if not self._apply_patch(data):
+                    self.stats.syncs += 1
+                    await ws.send(self._sync_message())
+                    continue
+                data = self.state
+            elif self.version >= 3:
+                self.state = data
+                self.state_version = data.pop("version")
+            status = data.get("expStatus")
+            if status == "END":
+                self.done = True
+                return "end"
+            if status != "RUNNING":
+                continue
+            key = _round_key(data)
+            if key not in self.seen_rounds:
+                self.seen_rounds.add(key)
+                self.stats.on_new_round(key)
+            if key in self.submitted_rounds:
+                continue
+            await asyncio.sleep(self.rnd.uniform(*self.think))
+            if self.rnd.random() < self.reconnect_prob:
+                # 决策前断线重连，服务端应重新下发当前回合消息
+                return "reconnect"
+            decision = self.rnd.choice(data["options"]["options"])
+            self.submitted_rounds.add(key)
+            await ws.send(self._submit_message(decision))
+            self.stats.on_submit(key)
+        return "closed"
+
+
+class ProcessSampler:
+    """
+    采样服务进程的 CPU 时间和常驻内存（读取 /proc，仅 Linux）
+    """
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.rss_peak = 0
+        self.cpu_start = None
+        self.cpu_end = None
+        self._task: asyncio.Task = None
+
+    def _cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def _rss_bytes(self) -> int:
+        with open(f"/proc/{self.pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    def _sample(self):
+        self.cpu_end = self._cpu_seconds()
+        self.rss_peak = max(self.rss_peak, self._rss_bytes())
+
+    async def _run(self):
+        while True:
+            self._sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if not Path(f"/proc/{self.pid}").exists():
+            return
+        self.cpu_start = self._cpu_seconds()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> dict:
+        if self._task is None:
+            return {}
+        self._task.cancel()
+        self._sample()
+        return {
+            "server_cpu_seconds": round(self.cpu_end - self.cpu_start, 3),
+            "server_rss_peak_mb": round(self.rss_peak / 2**20, 1),
+        }
+
+
+def write_scaled_cfg(cfg_path: Path, scale: int, out_dir: Path) -> tuple[Path, int]:
+    """
+    按倍数放大每个角色的人数，写出临时实验配置
+
+    Args:
+        cfg_path (Path): 实验配置文件
+        scale (int): 人数倍数
+        out_dir (Path): 临时目录
+
+    Returns:
+        tuple[Path, int]: (临时配置文件路径, 总人数)
+    """
+
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    cfg["lab_exp_name"] = f"load_{cfg.get('lab_exp_name', cfg_path.stem)}"
+    total = 0
+    for group in cfg["groups"]:
+        for role in group["roles"]:
+            role["num"] *= scale
+            total += role["num"]
+    out_path = out_dir / cfg_path.name
+    with open(out_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(cfg, f, allow_unicode=True, sort_keys=False)
+    return out_path, total
+
+
+async def wait_for_server(port: int, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("后端服务启动失败")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError("后端服务启动超时")
+
+
+async def run_load(args) -> dict:
+    work_dir = Path(tempfile.mkdtemp(prefix="lab_load_"))
+    cfg_path, total = write_scaled_cfg(Path(args.cfg), args.scale, work_dir)
+    print(f"实验配置: {args.cfg} x{args.scale}, 模拟客户端 {total}")
+
+    server = None
+    url = args.url
+    if url is None:
+        # log 和检查点写到临时目录（服务的工作目录为 work_dir/src，../log 即 work_dir/log）
+        (work_dir / "src").mkdir()
+        env = dict(os.environ)
+        env[LOAD_TEST_CFG_ENV] = str(cfg_path)
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "test.load_server:app",
+                "--app-dir",
+                str(SRC_DIR),
+                "--port",
+                str(args.port),
+                "--log-level",
+                "warning",
+            ],
+            cwd=work_dir / "src",
+            env=env,
+            stdout=None if args.server_output else subprocess.DEVNULL,
+        )
+        await wait_for_server(args.port, server)
+        url = f"ws://127.0.0.1:{args.port}/ws"
+
+    stats = LoadStats()
+    sampler = ProcessSampler(server.pid) if server is not None else None
+    rnd = random.Random(args.seed)
+    clients = [
+        SimulatedClient(
+            i,
+            url,
+            stats,
+            tuple(args.think),
+            args.reconnect,
+            args.protocol,
+            random.Random(rnd.random()),
+            args.encoding,
+        )
+        for i in range(total)
+    ]
+    try:
+        if sampler is not None:
+            sampler.start()
+        started = time.perf_counter()
+        await asyncio.wait_for(
+            asyncio.gather(*(client.run() for client in clients)), args.timeout
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        usage = sampler.stop() if sampler is not None else {}
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    report = {
+        "cfg": args.cfg,
+        "participants": total,
+        "protocol": args.protocol,
+        "encoding": args.encoding,
+        "work_dir": str(work_dir),
+        "elapsed_seconds": round(elapsed, 3),
+        "messages_sent": stats.sent,
+        "messages_received": stats.received,
+        "messages_per_second": round((stats.sent + stats.received) / elapsed, 1),
+        "bytes_received": stats.received_bytes,
+        "reconnects": stats.reconnects,
+        "syncs": stats.syncs,
+        "round_transitions": len(stats.transition_latencies),
+        "transition_latency_ms": {
+            k: round(v * 1000, 2)
+            for k, v in percentiles(stats.transition_latencies).items()
+        },
+        **usage,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="websocket 负载测试")
+    parser.add_argument("--cfg", default="cfg/corps_fight.yml", help="实验配置文件")
+    parser.add_argument(
+        "--scale", type=int, default=1, help="每个角色人数的倍数，模拟客户端数等于放大后的实验人数"
+    )
+    parser.add_argument(
+        "--think",
+        type=float,
+        nargs=2,
+        default=(0.0, 0.05),
+        metavar=("MIN", "MAX"),
+        help="决策前的思考时间范围（秒）",
+    )
+    parser.add_argument("--reconnect", type=float, default=0.02, help="决策前断线重连的概率")
+    parser.add_argument("--protocol", type=int, default=1, choices=(1, 2, 3), help="协议版本")
+    parser.add_argument(
+        "--encoding",
+        default="json",
+        choices=("json", "deflate", "msgpack"),
+        help="传输编码（协议v2及以上），msgpack 需要安装 msgpack",
+    )
+    parser.add_argument("--url", default=None, help="连接已运行的服务，如 ws://127.0.0.1:8000/ws")
+    parser.add_argument("--port", type=int, default=8765, help="启动的测试服务端口")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--timeout", type=float, default=600, help="超时时间（秒）")
+    parser.add_argument("--json", default=None, help="把报告写入 JSON 文件")
+    parser.add_argument("--server-output", action="store_true", help="显示服务端输出")
+    args = parser.parse_args()
+    if args.encoding != "json" and args.protocol == 1:
+        parser.error("协议v1不支持协商传输编码")
+
+    report = asyncio.run(run_load(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
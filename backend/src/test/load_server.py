@@ -0,0 +1,17 @@
+"""
+负载测试用的后端服务入口
+
+与 main.py 相同，只是实验配置文件由环境变量 LOAD_TEST_CFG 指定，由 load_harness.py 启动。
+"""
+
+import os
+
+import context
+from model.cfg import AppConfig
+from test.load_harness import LOAD_TEST_CFG_ENV
+
+context.load_app_config = lambda: AppConfig(lab_cfg_path=os.environ[LOAD_TEST_CFG_ENV])
+
+from main import app  # noqa: E402
+
+__all__ = ["app"]
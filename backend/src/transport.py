@@ -0,0 +1,243 @@
+"""
+传输编码
+
+协议v2及以上的客户端可以在 CONNECT 的 data 中用 "encoding" 指定希望的编码（字符串或按优先顺序排列的列表）：
+
+- json: UTF-8 JSON 文本帧（默认）
+- deflate: 二进制帧，zlib 格式压缩的 JSON，使用预置字典（Inflater.setDictionary）
+- msgpack: 二进制帧，MessagePack 编码，结构与 JSON 相同；字符串表中的字符串编码为扩展类型 1，内容为大端序的下标
+
+CONNECT 的回复仍为 JSON 文本帧，协商结果不是 json 时带上 "encoding" 和字符串表摘要 "table"，
+deflate 带上预置字典 "dictionary"（UTF-8 文本），msgpack 带上字符串表 "strings"，之后的消息按协商的编码发送。
+客户端重连时在 CONNECT 中带上保存的 "table"，与服务端一致时回复中不再附带字典/字符串表。
+每种编码按消息文本缓存编码结果，内容相同的消息（同一帧、同一增量）只编码一次，所有连接共用。
+"""
+
+import hashlib
+import json
+import typing
+import zlib
+
+import msgpack
+from pydantic_core import to_json
+
+from metrics import ENCODED_PAYLOADS
+from model.message import CMD, ExperimentStatus
+
+ENCODING_JSON = "json"
+ENCODING_DEFLATE = "deflate"
+ENCODING_MSGPACK = "msgpack"
+
+STRING_EXT_TYPE = 1
+"""MessagePack 中字符串表引用的扩展类型"""
+
+PROTOCOL_STRINGS = (
+    *(cmd.value for cmd in CMD),
+    *(status.value for status in ExperimentStatus),
+    "#info_group",
+    "基本信息",
+    "实验轮数",
+    "当前回合数",
+    "你的分组",
+    "你的角色",
+    "cmd",
+    "data",
+    "uuid",
+    "version",
+    "base",
+    "length",
+    "set",
+    "infos",
+    "hint",
+    "value",
+    "images",
+    "imageUrl",
+    "options",
+    "expStatus",
+)
+"""所有实验都会出现的字符串"""
+
+_SKELETON = (
+    '{"cmd":"PATCH_EXPERIMENT_INFO","data":{"base":1,"version":2,"infos":{"length":9,'
+    '"set":[[5,{"hint":"#info_group","value":""}]]},"expStatus":"PENDING"}}'
+    '{"cmd":"UPDATE_EXPERIMENT_INFO","data":{"infos":[{"hint":"#info_group","value":"基本信息"},'
+    '{"hint":"实验轮数","value":""},{"hint":"当前回合数","value":""},{"hint":"你的分组","value":""},'
+    '{"hint":"你的角色","value":""}],"images":[{"imageUrl":"http://"}],"options":{"options":[]},'
+    '"expStatus":"RUNNING"}}'
+)
+"""放在 deflate 预置字典末尾的消息骨架"""
+
+
+def available_encodings() -> tuple[str, ...]:
+    """
+    获取服务端支持的编码
+
+    Returns:
+        tuple[str, ...]: 编码名称
+    """
+
+    return (ENCODING_JSON, ENCODING_DEFLATE, ENCODING_MSGPACK)
+
+
+def negotiate_encoding(requested: typing.Iterable[str]) -> str:
+    """
+    协商连接的编码
+
+    Args:
+        requested (Iterable[str]): 客户端希望的编码，按优先顺序排列，见 protocol.parse_connect_encoding
+
+    Returns:
+        str: 第一个服务端支持的编码，都不支持或未指定时为 json
+    """
+
+    supported = available_encodings()
+    for encoding in requested:
+        if encoding in supported:
+            return encoding
+    return ENCODING_JSON
+
+
+class StringTable:
+    """
+    字符串表
+
+    由协议字段名、实验配置中的组别/角色/选项和算法声明的信息标签组成，对一个实验固定不变；
+    msgpack 按下标引用其中的字符串，deflate 的预置字典由这些字符串和消息骨架拼成
+    """
+
+    def __init__(self, strings: typing.Iterable[str]):
+        """
+        Args:
+            strings (Iterable[str]): 字符串，重复的只保留第一个
+        """
+
+        self.strings: tuple[str, ...] = tuple(dict.fromkeys(strings))
+        """下标 -> 字符串"""
+
+        self.index: dict[str, int] = {s: i for i, s in enumerate(self.strings)}
+        """字符串 -> 下标"""
+
+        # 距离越近的匹配编码越短，靠前（更常用）的字符串和消息骨架放在字典末尾
+        self.dictionary: str = (
+            "".join(to_json(s).decode() for s in reversed(self.strings)) + _SKELETON
+        )
+        """deflate 的预置字典"""
+
+        self.zdict = self.dictionary.encode()
+
+        self.digest: str = hashlib.sha256(self.zdict).hexdigest()[:16]
+        """字典和字符串表的摘要（字典包含全部字符串）"""
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class Codec:
+    """
+    一种传输编码
+
+    按消息文本缓存编码结果和原始 JSON 的字节数，与帧缓存同时清空
+    """
+
+    name = ENCODING_JSON
+    binary = False
+
+    def __init__(self, table: StringTable):
+        self.table = table
+        self._cache: dict[str, tuple[str | bytes, int]] = {}
+        self._encoded = ENCODED_PAYLOADS.labels(self.name)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def encode(self, message: str) -> tuple[str | bytes, int]:
+        """
+        编码消息
+
+        Args:
+            message (str): JSON 文本
+
+        Returns:
+            tuple[str | bytes, int]: (编码结果, 原始 JSON 的字节数)
+        """
+
+        cached = self._cache.get(message)
+        if cached is None:
+            raw = message.encode()
+            cached = self._cache[message] = (self._encode(message, raw), len(raw))
+            self._encoded.inc()
+        return cached
+
+    def _encode(self, message: str, raw: bytes) -> str | bytes:
+        return message
+
+    def clear(self):
+        """
+        清空缓存
+        """
+
+        self._cache.clear()
+
+
+class DeflateCodec(Codec):
+    name = ENCODING_DEFLATE
+    binary = True
+
+    def _encode(self, message: str, raw: bytes) -> bytes:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS, zdict=self.table.zdict)
+        return compressor.compress(raw) + compressor.flush()
+
+
+class MsgpackCodec(Codec):
+    name = ENCODING_MSGPACK
+    binary = True
+
+    def _refs(self, value: typing.Any) -> typing.Any:
+        # 把字符串表中的字符串换成扩展类型
+        if isinstance(value, str):
+            i = self.table.index.get(value)
+            if i is None:
+                return value
+            return msgpack.ExtType(STRING_EXT_TYPE, i.to_bytes(1 if i < 256 else 2, "big"))
+        if isinstance(value, dict):
+            return {self._refs(k): self._refs(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._refs(item) for item in value]
+        return value
+
+    def _encode(self, message: str, raw: bytes) -> bytes:
+        return msgpack.packb(self._refs(json.loads(raw)), use_bin_type=True)
+
+
+def make_codecs(table: StringTable) -> dict[str, Codec]:
+    """
+    创建服务端支持的全部编码
+
+    Args:
+        table (StringTable): 字符串表
+
+    Returns:
+        dict[str, Codec]: 编码名称 -> 编码
+    """
+
+    return {
+        ENCODING_JSON: Codec(table),
+        ENCODING_DEFLATE: DeflateCodec(table),
+        ENCODING_MSGPACK: MsgpackCodec(table),
+    }
+
+
+__all__ = [
+    "Codec",
+    "DeflateCodec",
+    "ENCODING_DEFLATE",
+    "ENCODING_JSON",
+    "ENCODING_MSGPACK",
+    "MsgpackCodec",
+    "PROTOCOL_STRINGS",
+    "STRING_EXT_TYPE",
+    "StringTable",
+    "available_encodings",
+    "make_codecs",
+    "negotiate_encoding",
+]
@@ -1,7 +1,10 @@
 import json
+import logging
 import os
 import glob
 
+logger = logging.getLogger(__name__)
+
 
 def save_dict_to_json(
     data_dict, file_path, indent=2, ensure_ascii=False, sort_keys=False
@@ -33,20 +36,21 @@ def save_dict_to_json(
                 sort_keys=sort_keys,
             )
 
-        print(f"JSON数据已成功保存到: {file_path}")
+        logger.debug("JSON数据已成功保存到: %s", file_path)
         return True
-    except Exception as e:
-        print(f"保存JSON数据时出错: {e}")
+    except Exception:
+        logger.exception("保存JSON数据时出错: %s", file_path)
         return False
 
 
-def save_str_to_json(json_str, file_path):
+def save_str_to_json(json_str, file_path, validate=True):
     """
     将JSON字符串保存为JSON文件
 
     Args:
         json_str (str): JSON格式的字符串
         file_path (str): JSON文件保存路径
+        validate (bool, optional): 是否先验证JSON字符串，默认为True；字符串由序列化生成时可跳过
 
     Returns:
         bool: 保存是否成功
@@ -56,19 +60,20 @@ def save_str_to_json(json_str, file_path):
         os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
 
         # 先验证JSON字符串是否有效
-        json.loads(json_str)
+        if validate:
+            json.loads(json_str)
 
         # 写入文件
         with open(file_path, "w", encoding="utf-8") as f:
             f.write(json_str)
 
-        print(f"JSON字符串已成功保存到: {file_path}")
+        logger.debug("JSON字符串已成功保存到: %s", file_path)
         return True
     except json.JSONDecodeError:
-        print("提供的字符串不是有效的JSON格式")
+        logger.exception("提供的字符串不是有效的JSON格式: %s", file_path)
         return False
-    except Exception as e:
-        print(f"保存JSON字符串时出错: {e}")
+    except Exception:
+        logger.exception("保存JSON字符串时出错: %s", file_path)
         return False
 
 
@@ -84,15 +89,15 @@ def load_json_from_file(file_path):
     """
     try:
         if not os.path.exists(file_path):
-            print(f"文件不存在: {file_path}")
+            logger.warning("文件不存在: %s", file_path)
             return None
 
         with open(file_path, "r", encoding="utf-8") as f:
             data = json.load(f)
 
         return data
-    except Exception as e:
-        print(f"加载JSON文件时出错: {e}")
+    except Exception:
+        logger.exception("加载JSON文件时出错: %s", file_path)
         return None
 
 
@@ -112,11 +117,11 @@ def get_all_json_files(directory_path, recursive=True, include_hidden=False):
 
     # 确保目录存在
     if not os.path.exists(directory_path):
-        print(f"目录不存在: {directory_path}")
+        logger.warning("目录不存在: %s", directory_path)
         return json_files
 
     if not os.path.isdir(directory_path):
-        print(f"指定路径不是目录: {directory_path}")
+        logger.warning("指定路径不是目录: %s", directory_path)
         return json_files
 
     # 转换为绝对路径
@@ -152,6 +157,8 @@ def get_all_json_files(directory_path, recursive=True, include_hidden=False):
 
 # 示例使用
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+
     # 示例数据，包含中文
     example_data = {
         "name": "测试项目",